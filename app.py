@@ -1,27 +1,35 @@
+import gzip
 import hashlib
 import json
-import random
-import os
-import uuid
-import csv
 import math
+import os
 import jwt
-from collections import defaultdict
+from dataclasses import replace
 from datetime import datetime, timezone, timedelta
-from functools import cache
-from typing import List, Dict
+from functools import wraps
+from typing import List, Dict, Optional, Tuple
 
-import boto3
 import subprocess
 
 from botocore.exceptions import ClientError
-from chalice import Chalice, Response
+from chalice import Chalice, Response, BadRequestError, NotFoundError
 from chalice.app import ConvertToMiddleware, AuthRequest, AuthResponse, UnauthorizedError
 from aws_lambda_powertools import Logger
 from aws_lambda_powertools import Tracer
-import markovify
+import numpy as np
 
 from chalicelib.modules.container import container
+from chalicelib.services.boleros import MAX_SENTENCES
+from chalicelib.services.documents import parse_text
+from chalicelib.services.jobs import jobs_supported
+from chalicelib.services.payload import decode_cities, encode_tour, tour_from_order, COORDINATES
+from chalicelib.services.point_set import generate_point_set, POINT_SETS
+from chalicelib.services.policies import ArmStatistics, order_states, EPSILON_GREEDY
+from chalicelib.services.prefix_index import encode_cursor, decode_cursor
+from chalicelib.services.repair import repair_tour, edit_cities
+from chalicelib.services.solver import select_backend, path_length, Progress, SolveResult, NUMPY_BACKEND, \
+    MULTISTART_BACKEND, LARGE_BACKEND, NUMPY_SOLVER_MAX_CITIES
+from chalicelib.services.tour_cache import tour_key
 
 app = Chalice(app_name='then-backyard')
 logger = Logger()
@@ -35,15 +43,9 @@ app.register_middleware(ConvertToMiddleware(tracer.capture_lambda_handler))
 def jwt_auth(auth_request: AuthRequest) -> AuthResponse:
     token = auth_request.token
     logger.info(f"Evaluating authorization token={token}")
-    try:
-        client = boto3.client(service_name='secretsmanager', region_name='us-east-1')
-        jwt.decode(
-            jwt=token,
-            key=client.get_secret_value(SecretId=os.getenv("JWT_SECRET_NAME")).get('SecretString'),
-            algorithms=["HS256"])
+    if container.token_verifier().verify(token, os.getenv("JWT_SECRET_NAME")):
         return AuthResponse(routes=['*'], principal_id='faunita')
-    except jwt.InvalidTokenError:
-        return AuthResponse(routes=[], principal_id='faunita')
+    return AuthResponse(routes=[], principal_id='faunita')
 
 
 @app.middleware('http')
@@ -52,25 +54,30 @@ def inject_route_info(event, get_response):
     return get_response(event)
 
 
-EPSILON = 0.15
-
-FROM = 0
-TO = 1
-FACTOR = 1000
-ONE_DAY_IN_SECONDS = 86400
-
-es_file = os.path.join(os.path.dirname(__file__), 'chalicelib', 'boleros_es.txt')
-en_file = os.path.join(os.path.dirname(__file__), 'chalicelib', 'boleros_en.txt')
-
+@app.middleware('http')
+def flush_rewards(event, get_response):
+    response = get_response(event)
+    if event.path not in BANDIT_ROUTES:
+        return response
+    # Lambda runs nothing once the response is returned, so the request that finds a flush or sync due waits for it:
+    # one PutMetricData call (a log write in EMF mode) and the checkpoint GET and PUT. Other routes never do.
+    container.reward_metrics().flush_if_due()
+    container.bandit_statistics().sync_if_due()
+    return response
 
-with open(es_file) as f:
-    text = f.read()
-    text_model_es = markovify.Text(text)
 
-with open(en_file) as f:
-    text = f.read()
-    text_model_en = markovify.Text(text)
+BANDIT_POLICY = os.getenv("BANDIT_POLICY", EPSILON_GREEDY)
+BANDIT_ROUTES = ('/metric', '/order')
 
+FACTOR = 1000
+ONE_DAY_IN_SECONDS = 86400
+MAX_TIME_BUDGET = 25.0
+MAX_JOB_TIME_BUDGET = 600.0
+MAX_CITIES = 3000
+MAX_PAGE_SIZE = 1000
+LARGE_INSTANCE_MAX_CITIES = int(os.getenv("LARGE_INSTANCE_MAX_CITIES", 200000))
+FLYER_DEFAULT_COUNTRY = "US"
+FLYER_COUNTRIES = ("MX",)
 
 
 class RankStatistics:
@@ -81,10 +88,8 @@ class RankStatistics:
         self.statistics = self._load()
 
     def _load(self):
-        s3 = boto3.resource('s3')
-
-        content_object = s3.Object("multiarmed-bandit-statistics", "last-month.json")
-        file_content = content_object.get()['Body'].read().decode('utf-8')
+        content_object = container.s3_client().get_object(Bucket="multiarmed-bandit-statistics", Key="last-month.json")
+        file_content = content_object['Body'].read().decode('utf-8')
         return json.loads(file_content)
     @classmethod
     def instance(cls):
@@ -92,188 +97,143 @@ class RankStatistics:
             cls._instance = RankStatistics()
         return cls._instance
 
-    def score(self, name):
-        print(self.statistics)
-        print(name)
-        return self.statistics.get(name)
+    def scores(self, names: List[str]) -> ArmStatistics:
+        return ArmStatistics.from_lookup(container.bandit_statistics().statistics(names),
+                                         [self.statistics.get(name) for name in names])
 
 @app.route('/order', methods=['POST'], cors=True)
 def order():
     request = app.current_request
     body = request.json_body
-    
-    states = body.get("states")
-    logger.info("States available: %s" % states)
 
-    states_with_score = []
-
-    for state in states:
-        score = RankStatistics.instance().score(state[0])
-        if score is not None:
-            states_with_score.append((state, score))
-        else:
-            states_with_score.append((state, 0))
-
-    states_sorted = sorted(states_with_score, key=lambda state: state[1])
-
-    new_order = []
-
-    for count in range(len(states_sorted)):
-        if random.random() < EPSILON:
-            # explore
-            current_choice = random.choice(states_sorted)
-            states_sorted.remove(current_choice)
-        else:
-            # exploit
-            current_choice = states_sorted.pop()
-        new_order.append(current_choice[0])
+    states = body.get("states")
+    policy = body.get("policy") or BANDIT_POLICY
+    logger.info(f"Ordering {len(states)} states with {policy}.")
 
-    logger.info("New order: %s" % new_order)
+    statistics = RankStatistics.instance().scores([state[0] for state in states])
+    try:
+        ordering = order_states(policy, statistics)
+    except ValueError as error:
+        raise BadRequestError(str(error))
+    new_order = [states[i] for i in ordering]
 
     return Response(body={'order': new_order},
                     status_code=200)
 
 
 def write_metric(state, value):
-
-    cloudwatch = boto3.client('cloudwatch')
-    response = cloudwatch.put_metric_data(
-        MetricData=[
-            {
-                'MetricName': state,
-                'Dimensions': [
-                    {
-                        'Name': 'Stage',
-                        'Value': 'dev'
-                    },
-                    {
-                        'Name': 'RetentionLowerBound',
-                        'Value': str(value)
-                    },
-                ],
-                'Unit': 'Count',
-                'Value': 1
-            },
-        ],
-        Namespace='MultiArmedBandit'
-    )
-
-    logger.info(response)
+    container.reward_metrics().record(state, value)
+    container.bandit_statistics().update(state, float(value))
 
 @app.route('/metric', methods=['POST'], cors=True)
 def metric():
     request = app.current_request
-    body = request.json_body
+    body = request.json_body or {}
 
     logger.info("State reward: %s" % body.get("state"))
     logger.info("Total time: %s" % body.get("reward"))
 
-    write_metric(body.get("state"), body.get("reward"))
+    reward = body.get("reward")
+    try:
+        if isinstance(reward, bool) or not math.isfinite(float(reward)):
+            raise ValueError
+    except (TypeError, ValueError):
+        raise BadRequestError("'reward' must be a number.")
+    try:
+        write_metric(body.get("state"), reward)
+    except ValueError as error:
+        raise BadRequestError(str(error))
 
     return Response(body={},
                     status_code=200)
 
-def list_bucket(bucket: str, prefix: str) -> List[str]:
-    s3 = boto3.resource('s3')
-    bucket_list = s3.Bucket(bucket)
+def cached_route(view):
+    """Serves a route from the response cache while the presigned URLs in its body are still fresh."""
+    @wraps(view)
+    def cached_view(**kwargs):
+        response_cache = container.response_cache()
+        query_params = app.current_request.query_params or {}
+        key = (view.__name__, tuple(sorted(kwargs.items())), tuple(sorted(query_params.items())))
+        response = response_cache.get(key)
+        if response is None:
+            response = view(**kwargs)
+            if response.status_code == 200:
+                response_cache.put(key, response, route=view.__name__, body=response.body)
+        return response
 
-    files = [file.key.split("/")[-1] for file in bucket_list.objects.filter(Prefix=prefix) if
-        not file.key.endswith("/")]
+    return cached_view
+
+
+def list_bucket(bucket: str, prefix: str) -> List[str]:
+    files = [key.split("/")[-1] for key in container.prefix_index().list_keys(bucket, prefix)]
 
     return files
-def list_helper(bucket: str, prefix: str) -> List[str]:
-    s3 = boto3.resource('s3')
-    bucket_list = s3.Bucket(bucket)
-    s3_client = boto3.client('s3')
-
-    images = [{"url": s3_client.generate_presigned_url(
-        'get_object',
-        Params={'Bucket': bucket,
-                'Key': file.key},
-        ExpiresIn=60)} for file in bucket_list.objects.filter(Prefix=prefix) if
-        not file.key.endswith("/")]
-    logger.info("Files found: %s" % images)
+def presign(bucket: str, keys: List[str]) -> List[Dict[str, str]]:
+    images = [{"url": url} for url in container.presigner().presign(bucket, keys, expires_in=60)]
+    logger.info("Files found: %s" % len(images))
 
     return images
+def list_helper(bucket: str, prefix: str) -> List[Dict[str, str]]:
+    # concurrent identical listings share one batch of URLs, PrefixIndex shares their manifest read
+    return container.single_flight().do(
+        ("list_helper", bucket, prefix),
+        lambda: presign(bucket, container.prefix_index().list_keys(bucket, prefix)))
+def page_helper(bucket: str, prefix: str) -> Tuple[List[Dict[str, str]], Optional[str]]:
+    """Presigns one page of the keys under `prefix`, as selected by the `limit` and `token` query parameters.
+
+    Without `limit` the page holds every remaining key. The returned token continues after the page, or is None.
+    """
+    query_params = app.current_request.query_params or {}
+    try:
+        limit = query_params.get('limit')
+        limit = None if limit is None else int(limit)
+        start_after = decode_cursor(query_params['token']) if 'token' in query_params else None
+    except ValueError:
+        raise BadRequestError("'limit' must be an integer and 'token' one returned by a previous page.")
+    if limit is not None and not 1 <= limit <= MAX_PAGE_SIZE:
+        raise BadRequestError(f"'limit' must be between 1 and {MAX_PAGE_SIZE}.")
+    if start_after is not None and not start_after.startswith(prefix):
+        raise BadRequestError("'token' belongs to a different listing.")
+    return container.single_flight().do(("page_helper", bucket, prefix, limit, start_after),
+                                        presign_page, bucket, prefix, limit, start_after)
+
+
+def presign_page(bucket: str, prefix: str, limit: Optional[int],
+                 start_after: Optional[str]) -> Tuple[List[Dict[str, str]], Optional[str]]:
+    keys, last = container.prefix_index().list_page(bucket, prefix, limit=limit, start_after=start_after)
+    return presign(bucket, keys), None if last is None else encode_cursor(last)
+
+@app.on_s3_event(bucket=os.getenv("S3_BUCKET_NAME"), events=['s3:ObjectCreated:*', 's3:ObjectRemoved:*'])
+def index_s3_event(event):
+    event_name = event.to_dict()['Records'][0]['eventName']
+    logger.info(f"Indexing {event_name} of {event.key}")
+    changed = container.prefix_index().apply_event(bucket=event.bucket, key=event.key, event_name=event_name)
+    container.photo_counts().apply_event(bucket=event.bucket, key=event.key, event_name=event_name, changed=changed)
 
-@cache
 @app.route('/photography', methods=['GET'], cors=True)
+@cached_route
 def photography():
-    return Response(body={'images': list_helper(bucket=os.getenv("S3_BUCKET_NAME"), prefix="photography")},
+    images, token = page_helper(bucket=os.getenv("S3_BUCKET_NAME"), prefix="photography")
+    return Response(body={'images': images, 'next': token},
                     status_code=200)
 
-@cache
 @app.route('/colors/{project}/{resolution}', methods=['GET'], cors=True)
+@cached_route
 def colors(project: str, resolution: str) -> Response:
     return Response(
         body={'images': list_helper(bucket=os.getenv("S3_BUCKET_NAME"), prefix=f"colors/{project}/{resolution}")},
         status_code=200)
 
 
-def read_color_config(slug: str) -> Dict:
-    try:
-        s3 = boto3.resource('s3')
-        content_object = s3.Object(os.getenv("S3_BUCKET_NAME"), f'colors/{slug}/config.json')
-        return json.loads(content_object.get()['Body'].read().decode('utf-8'))
-    except ClientError:
-        return {
-            "default": None,
-            "description": None
-        }
-
-
-@cache
 @app.route('/colors', methods=['GET'], cors=True)
+@cached_route
 def colors() -> Response:
-    s3_client = boto3.client('s3')
-    s3 = boto3.resource('s3')
-    bucket_list = s3.Bucket(os.getenv("S3_BUCKET_NAME"))
-
-    projects = defaultdict(dict)
-    CUBE = "cube"
-    SQUARE = "square"
-
-    for obj in bucket_list.objects.filter(Prefix='colors/'):
-        if len(url_structure := obj.key.split("/")) == 4:
-            prefix, slug, resolution, file = url_structure
-            if SQUARE in file:
-                signed_url = s3_client.generate_presigned_url(
-                    'get_object',
-                    Params={'Bucket': os.getenv("S3_BUCKET_NAME"),
-                            'Key': obj.key},
-                    ExpiresIn=ONE_DAY_IN_SECONDS)
-                if resolution not in projects[slug]:
-                    projects[slug].update({resolution: {SQUARE: signed_url}})
-                else:
-                    projects[slug][resolution].update({SQUARE: signed_url})
-            if CUBE in file:
-                signed_url = s3_client.generate_presigned_url(
-                    'get_object',
-                    Params={'Bucket': os.getenv("S3_BUCKET_NAME"),
-                            'Key': obj.key},
-                    ExpiresIn=ONE_DAY_IN_SECONDS)
-                if resolution not in projects[slug]:
-                    projects[slug].update({resolution: {CUBE: signed_url}})
-                else:
-                    projects[slug][resolution].update({CUBE: signed_url})
-
     return Response(
-        body={"colors": [
-            {
-                "slug": key,
-                **read_color_config(key),
-                "resolutions": [
-                    {
-                        "resolution": resolution,
-                        "cube": images["cube"],
-                        "square": images["square"],
-                    } for resolution, images in value.items()]
-            } for key, value in projects.items()]
-        },
+        body={"colors": container.colors_service().get_colors(bucket=os.getenv("S3_BUCKET_NAME"))},
         status_code=200)
 
-@cache
 @app.route('/color/{slug}/{resolution}', methods=['GET'], cors=True)
+@cached_route
 def color(slug: str, resolution: str) -> Response:
     images = list_helper(bucket=os.getenv("S3_BUCKET_NAME"), prefix=f"colors/{slug}/{resolution}")
 
@@ -294,39 +254,29 @@ def color(slug: str, resolution: str) -> Response:
         body=reponse,
         status_code=200)
 
-@cache
 @app.route('/posts', methods=['GET'], cors=True)
+@cached_route
 def posts() -> Response:
     return Response(
         body={'posts': list_bucket(bucket=os.getenv("S3_BUCKET_NAME"), prefix=f"blog")},
         status_code=200)
 
-@cache
 @app.route('/post/{filename}', methods=['GET'], cors=True)
+@cached_route
 def post(filename: str) -> Response:
-    s3_client = boto3.client('s3')
-
-    s3 = boto3.resource('s3')
-    markdown = s3.Object(os.getenv("S3_BUCKET_NAME"), f"blog/{filename}").get()['Body'].read().decode('utf-8')
+    markdown = container.documents().get(os.getenv("S3_BUCKET_NAME"), f"blog/{filename}", parse=parse_text)
 
     return Response(
-        body={'url': s3_client.generate_presigned_url(
-            'get_object',
-            Params={'Bucket': os.getenv("S3_BUCKET_NAME"),
-                    'Key': f"blog/{filename}"},
-            ExpiresIn=60),
+        body={'url': container.presigner().presign(os.getenv("S3_BUCKET_NAME"), [f"blog/{filename}"],
+                                                   expires_in=60)[0],
             'markdown': markdown,
             'slug': filename},
         status_code=200)
 
-@cache
 @app.route('/codes', methods=['GET'], cors=True)
+@cached_route
 def codes() -> Response:
-    s3 = boto3.resource('s3')
-
-    content_object = s3.Object(os.getenv("S3_BUCKET_NAME"), 'qr/mappings.json')
-    file_content = content_object.get()['Body'].read().decode('utf-8')
-    mappings = json.loads(file_content)
+    mappings = container.documents().get(os.getenv("S3_BUCKET_NAME"), 'qr/mappings.json')
 
     links = []
     for key, value in mappings.items():
@@ -336,160 +286,127 @@ def codes() -> Response:
         body={'codes': links},
         status_code=200)
 
+def boleros_response(language: str) -> str:
+    count = (app.current_request.query_params or {}).get('count')
+    if count is None:
+        return json.dumps({'sentence': container.boleros().sentences(language)[0]}, ensure_ascii=False)
+    try:
+        count = int(count)
+    except ValueError as error:
+        raise BadRequestError(str(error))
+    if not 1 <= count <= MAX_SENTENCES:
+        raise BadRequestError(f"count must be between 1 and {MAX_SENTENCES}.")
+    return json.dumps({'sentences': container.boleros().sentences(language, count)}, ensure_ascii=False)
+
 @app.route('/boleros/es', cors=True)
 def sentence_es():
-    d = {'sentence': text_model_es.make_short_sentence(100).lower()}
-    return json.dumps(d, ensure_ascii=False)
+    return boleros_response('es')
 
 @app.route('/boleros/en', cors=True)
 def sentence_en():
-    d = {'sentence': text_model_en.make_short_sentence(100).lower()}
-    return json.dumps(d, ensure_ascii=False)
-
-
-def create_instance_3d(filename, n_cities, point_set):
-    cities = []
-    with open(filename, "w+") as file_handle:
-        file_handle.write("%d\n" % n_cities)
-        for i in range(n_cities):
-            if point_set == "moebius":
-                city = generate_random_moebius()
-            elif point_set == "sphere":
-                city = generate_random_sphere()
-            elif point_set == "torus":
-                city = generate_random_torus()
-            elif point_set == "tree_foil":
-                city = generate_random_trefoil()
-            elif point_set == "helix":
-                city = generate_random_helix()
-            elif point_set == "plane":
-                city = generate_random_plane()
-            file_handle.write("%s %s %s\n" % (city[0] * FACTOR, city[1] * FACTOR, city[2] * FACTOR))
-            cities.append(city)
-        file_handle.write("EOF\n")
-    return cities
-
-
-
-
-def create_instance_from_cities_3d(filename, cities):
-    final_cities = []
-    with open(filename, "w+") as file_handle:
-        print(len(cities) / 3)
-        file_handle.write("%d\n" % (len(cities) / 3))
-        for i in range(0, len(cities), 3):
-            city = [cities[i], cities[i + 1], cities[i + 2]]
-            print(city)
-            file_handle.write("%s %s %s\n" % (city[0], city[1], city[2]))
-            final_cities.append(city)
-        file_handle.write("EOF\n")
-    return final_cities
-
-def create_instance_from_cities_2d(filename, cities):
-    final_cities = []
-    with open(filename, "w+") as file_handle:
-        print(len(cities) / 2)
-        file_handle.write("%d\n" % (len(cities) / 2))
-        for i in range(0, len(cities), 2):
-            city = [cities[i], cities[i + 1]]
-            print(city)
-            file_handle.write("%s %s\n" % (city[0], city[1]))
-            final_cities.append(city)
-        file_handle.write("EOF\n")
-    return final_cities
-
-
-def generate_random_moebius():
-    s = random.random() * 2 - 1
-    theta = random.random() * math.pi * 2
-    return from_moebius_coords(2.0, s, theta)
-
-def from_moebius_coords(radius, s, theta):
-    x = (radius + s * math.cos(theta / 2)) * math.cos(theta)
-    y = (radius + s * math.cos(theta / 2)) * math.sin(theta)
-    z = s * math.sin(theta / 2)
-    return [x, y, z]
-
-def generate_random_sphere():
-    radius = 1.0
-    theta = random.random() * math.pi * 2
-    phi = random.random() * math.pi
-    return from_sphere_coords(radius, theta, phi)
-
-def from_sphere_coords(rho, theta, phi):
-    x = rho * math.cos(theta) * math.sin(phi)
-    y = rho * math.sin(theta) * math.sin(phi)
-    z = rho * math.cos(phi)
-    return [x, y, z]
-
-def generate_random_torus():
-    a = 2.0
-    c = 1.0
-    v = random.random() * math.pi * 2
-    u = random.random() * math.pi * 2
-    return from_torus_coords(a, c, u, v)
-
-def from_torus_coords(a, c, u, v):
-    x = (c * a * math.cos(v)) * math.cos(u)
-    y = (c * a * math.cos(v)) * math.sin(u)
-    z = a * math.sin(u)
-    return [x, y, z]
-
-def generate_random_trefoil():
-    u = random.random() * math.pi * 2
-    return from_trefoil_coords(u)
-
-def from_trefoil_coords(u):
-    x = math.sin(u) + 2.0 * math.sin(2.0 * u)
-    y = math.cos(u) - 2.0 * math.cos(2.0 * u)
-    z = - math.sin(3.0 * u)
-    return [x, y, z]
-
-def generate_random_helix():
-    u = random.random() * math.pi * 2
-    v = 2.0
-    return from_helix_coords(u, v)
-
-def from_helix_coords(u, v):
-    x = v * math.cos(u)
-    y = v * math.sin(u)
-    z = u
-    return [x, y, z]
-
-def generate_random_plane():
-    x = random.random() * 2 - 1
-    y = random.random() * 2 - 1
-    z = 0
-    return [x, y, z]
-
-def execute(cmd):
-    logger.info(" ".join(cmd))
-    popen = subprocess.Popen(cmd, stdout=subprocess.PIPE, universal_newlines=True)
-    for stdout_line in iter(popen.stdout.readline, ""):
-        yield stdout_line
-    popen.stdout.close()
-    return_code = popen.wait()
-    if return_code:
-        raise subprocess.CalledProcessError(return_code, cmd)
-
-def call_solver(tsp_file, tour_file, dim=3):
-    cmd = ["./chalicelib/linkern", "-o", tour_file, "-N", "%s" % dim, tsp_file]
-    for line in execute(cmd):
-        logger.info(line)
-
-def implement_tour(tour_file, cities):
-    final_tour = []
-    with open(tour_file, 'r') as file_handle:
-        csv_reader = csv.reader(file_handle, delimiter=' ')
-        next(csv_reader)  # skip the first row which do not contain any city
-        first = None
-        for edge in csv_reader:
-            logger.info("edge %s" % edge)
-            if first is None:
-                first = cities[int(edge[FROM])]
-            final_tour += cities[int(edge[FROM])]
-        final_tour += first
-    return final_tour
+    return boleros_response('en')
+
+
+def tour_response(cities: np.ndarray, result: SolveResult, headers: Optional[Dict[str, str]] = None) -> Response:
+    request = app.current_request
+    order = result.order
+    headers = {
+        'X-Tour-Length': '%.6f' % path_length(cities, order),
+        'X-Tour-Cache': 'hit' if result.cached else 'miss',
+        'X-Runs': str(result.runs),
+        'X-Runs-Completed': str(result.completed),
+        **(headers or {}),
+    }
+    if result.key is not None:
+        headers['X-Tour-Key'] = result.key
+    if result.timings is not None:
+        headers['X-Phase-Timings'] = json.dumps(result.timings)
+    if 'application/octet-stream' not in request.headers.get('accept', ''):
+        return Response(body=tour_from_order(cities, order), headers=headers, status_code=200)
+
+    query_params = request.query_params or {}
+    fmt = query_params.get('format', COORDINATES)
+    delta = query_params.get('delta', 'false').lower() in ('1', 'true')
+    try:
+        body = encode_tour(cities, order, fmt=fmt, delta=delta)
+    except ValueError as error:
+        raise BadRequestError(str(error))
+    headers.update({
+        'Content-Type': 'application/octet-stream',
+        'X-Tour-Format': fmt,
+        'X-Tour-Delta': str(delta).lower(),
+        'X-Count': str(len(order)),
+        'X-Dimension': str(cities.shape[1]),
+        'X-Dtype': 'float32' if fmt == COORDINATES else 'int32',
+    })
+    if 'gzip' in request.headers.get('accept-encoding', ''):
+        body = gzip.compress(body, compresslevel=6)
+        headers['Content-Encoding'] = 'gzip'
+    return Response(body=body, headers=headers, status_code=200)
+
+
+def solver_options(params: Dict, max_time_budget: float = MAX_TIME_BUDGET) -> Dict:
+    options = {}
+    try:
+        if params.get('runs') is not None:
+            options['runs'] = int(params['runs'])
+        if params.get('time_budget') is not None:
+            options['time_budget'] = min(float(params['time_budget']), max_time_budget)
+    except ValueError as error:
+        raise BadRequestError(str(error))
+    return options
+
+
+def select_solver_backend(n_cities: int, backend: Optional[str] = None) -> str:
+    try:
+        return select_backend(n_cities, backend)
+    except ValueError as error:
+        raise BadRequestError(str(error))
+
+
+def solve_cities(cities: np.ndarray, backend: Optional[str] = None, progress: Optional[Progress] = None,
+                 **options) -> SolveResult:
+    name = select_solver_backend(len(cities), backend)
+
+    tour_cache = container.tour_cache()
+    key = tour_key(cities)
+    order = tour_cache.get(key)
+    logger.info("Tour cache %s" % ("hit" if order is not None else "miss"), extra={"data": tour_cache.stats()})
+    cached = None if order is None else path_length(cities, order)
+    # a multi-start solve may beat the cached tour, so it runs anyway and only replaces it when shorter
+    if order is not None and name != MULTISTART_BACKEND:
+        return SolveResult(order=order, length=cached, runs=0, completed=0, cached=True, key=key)
+
+    if progress is not None:
+        # a job reports its own progress, which callers joining its solve would not see
+        return run_solver(cities, key, name, progress, options, cached)
+    # solving again would only double the load that made the first solve slow, so callers wait for it however long
+    return container.single_flight().do(("solve", key, name, tuple(sorted(options.items()))),
+                                        run_solver, cities, key, name, None, options, cached, timeout=math.inf)
+
+
+def run_solver(cities: np.ndarray, key: str, name: str, progress: Optional[Progress], options: Dict,
+               cached: Optional[float] = None) -> SolveResult:
+    solver = container.solvers()[name]
+    if name == MULTISTART_BACKEND and options:
+        solver = replace(solver, **options)
+    try:
+        result = solver.solve_result(cities, progress=progress)
+    except (OSError, subprocess.SubprocessError):
+        if name == NUMPY_BACKEND:
+            raise
+        if len(cities) <= NUMPY_SOLVER_MAX_CITIES:
+            logger.exception("Solver %s failed, falling back to %s." % (name, NUMPY_BACKEND))
+            result = container.solvers()[NUMPY_BACKEND].solve_result(cities, progress=progress)
+        else:
+            # a single NumPy solve needs an N x N x D temporary, which does not fit in memory at these sizes
+            logger.exception("Solver %s failed, falling back to %s partitions." % (name, NUMPY_BACKEND))
+            result = container.fallback_solver().solve_result(cities, progress=progress)
+    if cached is None or result.length < cached:
+        container.tour_cache().put(key, result.order)
+    result.key = key
+    return result
+
 
 @app.route('/', methods=['POST'], cors=True)
 def index():
@@ -504,47 +421,134 @@ def index():
     logger.info("to_dict: %s", app.current_request.to_dict)
     logger.info("uri_params: %s", app.current_request.uri_params)
     point_set = body['point_set']
-    n_cities = min(int(body['n_cities']), 3000)
-
-    tsp_file = "/tmp/%s.tsp" % uuid.uuid4()
-    tour_file = "/tmp/%s.tour" % uuid.uuid4()
+    max_cities = LARGE_INSTANCE_MAX_CITIES if body.get('solver') == LARGE_BACKEND else MAX_CITIES
+    n_cities = min(int(body['n_cities']), max_cities)
+    if point_set not in POINT_SETS:
+        raise BadRequestError(f"Unknown point set: {point_set}")
 
-    cities = create_instance_3d(tsp_file, n_cities, point_set)
-    call_solver(tsp_file, tour_file)
-    tour = implement_tour(tour_file, cities)
+    cities = generate_point_set(point_set, n_cities, seed=body.get('seed'))
+    result = solve_cities(cities * FACTOR, backend=body.get('solver'), **solver_options(body))
 
-
-    return tour
+    return tour_response(cities, result)
 
 @app.route('/solve', methods=['GET'], cors=True)
 def solver():
     cities = json.loads(app.current_request.query_params.get('cities'))
     dim = int(app.current_request.query_params.get('dimension', 2))
     logger.info(dim)
-    tsp_file = "/tmp/%s.tsp" % uuid.uuid4()
-    tour_file = "/tmp/%s.tour" % uuid.uuid4()
 
-    if dim == 3:
+    if dim not in (2, 3):
+        return {"status": 500}
 
-        final_cities = create_instance_from_cities_3d(tsp_file, cities)
-        call_solver(tsp_file, tour_file, dim=3)
-    elif dim == 2:
-        final_cities = create_instance_from_cities_2d(tsp_file, cities)
-        call_solver(tsp_file, tour_file, dim=2)
+    cities = np.asarray(cities, dtype=float).reshape(-1, dim)
+    query_params = app.current_request.query_params
+    result = solve_cities(cities, backend=query_params.get('solver'), **solver_options(query_params))
 
-    else:
-        return {"status": 500}
+    return tour_response(cities, result)
 
-    tour = implement_tour(tour_file, final_cities)
+def request_cities() -> np.ndarray:
+    request = app.current_request
+    try:
+        if request.headers.get('content-type', '').startswith('application/json'):
+            envelope = request.json_body
+            if 'cities' in envelope:
+                dimension = int(envelope.get('dimension', 2))
+                return decode_cities(np.asarray(envelope['cities'], dtype='<f8').tobytes(), dimension=dimension)
+            return decode_cities(envelope['data'],
+                                 dimension=int(envelope.get('dimension', 2)),
+                                 dtype=envelope.get('dtype', 'float64'),
+                                 count=envelope.get('count'),
+                                 encoded=True)
+        count = request.headers.get('x-count')
+        return decode_cities(request.raw_body,
+                             dimension=int(request.headers.get('x-dimension', 2)),
+                             dtype=request.headers.get('x-dtype', 'float64'),
+                             count=int(count) if count is not None else None,
+                             encoded=request.headers.get('x-encoding') == 'base64')
+    except (KeyError, TypeError, ValueError) as error:
+        raise BadRequestError(str(error))
+
+
+@app.route('/solve', methods=['POST'], cors=True, content_types=['application/octet-stream', 'application/json'])
+def binary_solver():
+    query_params = app.current_request.query_params or {}
+    cities = request_cities()
+    logger.info("Solving %d cities in %d dimensions." % cities.shape)
+
+    result = solve_cities(cities, backend=query_params.get('solver'), **solver_options(query_params))
+
+    return tour_response(cities, result)
+
+@app.route('/solve/jobs', methods=['POST'], cors=True, content_types=['application/octet-stream', 'application/json'])
+def create_solve_job():
+    if not jobs_supported():
+        return Response(body={'Code': 'NotImplemented',
+                              'Message': "Solve jobs only run locally, use POST /solve when deployed."},
+                        status_code=501)
+    query_params = app.current_request.query_params or {}
+    cities = request_cities()
+    backend = query_params.get('solver')
+    options = solver_options(query_params, max_time_budget=MAX_JOB_TIME_BUDGET)
+    select_solver_backend(len(cities), backend)
+
+    job = container.job_runner().submit(
+        cities, lambda job_cities, progress: solve_cities(job_cities, backend=backend, progress=progress, **options))
+    logger.info(f"Submitted solve job {job.id} for {job.n_cities} cities.")
+
+    return Response(body=job.to_dict(),
+                    headers={'Location': f'/solve/jobs/{job.id}'},
+                    status_code=202)
+
+@app.route('/solve/jobs/{job_id}', methods=['GET'], cors=True)
+def solve_job(job_id: str):
+    job = container.job_store().get(job_id)
+    if job is None:
+        raise NotFoundError(f"Unknown solve job: {job_id}")
+    return Response(body=job.to_dict(), status_code=200)
+
+@app.route('/solve/repair', methods=['POST'], cors=True)
+def repair_solver():
+    body = app.current_request.json_body
+    query_params = app.current_request.query_params or {}
+    cities = request_cities()
+    try:
+        inserted = np.asarray(body.get('insert', []), dtype=float).reshape(-1, cities.shape[1])
+        removed = sorted(set(int(city) for city in body.get('remove', [])))
+        if body.get('tour') is not None:
+            order = np.asarray(body['tour'], dtype=np.int64)
+        elif body.get('key') is not None:
+            if body['key'] != tour_key(cities):
+                raise BadRequestError("The key is not the tour key of these cities.")
+            order = container.tour_cache().get(body['key'])
+        else:
+            order = None
+    except (TypeError, ValueError) as error:
+        raise BadRequestError(str(error))
+    if order is not None and not np.array_equal(np.sort(order), np.arange(len(cities))):
+        raise BadRequestError("The tour must visit every city exactly once.")
+    if removed and (removed[0] < 0 or removed[-1] >= len(cities)):
+        raise BadRequestError("Removed cities must be indices into the previous cities.")
+
+    repaired = None
+    if order is not None:
+        repair = repair_tour(cities, order, inserted, removed)
+        edited, repaired = repair.cities, repair.result
+    else:
+        edited = edit_cities(cities, inserted, removed)
+    if repaired is None:
+        logger.info("Re-solving %d cities from scratch." % len(edited))
+        result = solve_cities(edited, backend=query_params.get('solver'), **solver_options(query_params))
+    else:
+        result = repaired
+        result.key = tour_key(edited)
+        container.tour_cache().put(result.key, result.order)
 
-    return tour
+    return tour_response(edited, result, headers={'X-Tour-Repaired': str(repaired is not None).lower()})
 
 @app.route('/names', methods=['GET'], cors=True)
 def get_names():
     try:
-        s3 = boto3.resource('s3')
-        content_object = s3.Object(os.getenv("S3_BUCKET_NAME"), 'names.json')
-        return {"names": json.loads(content_object.get()['Body'].read().decode('utf-8'))}
+        return {"names": container.documents().get(os.getenv("S3_BUCKET_NAME"), 'names.json')}
     except ClientError:
         return {
             "default": None,
@@ -555,9 +559,8 @@ def get_names():
 def update_names():
     try:
         names = json.loads(app.current_request.query_params.get('names'))
-        s3 = boto3.resource('s3')
-        content_object = s3.Object(os.getenv("S3_BUCKET_NAME"), 'names.json')
-        content_object.put(Body=(bytes(json.dumps(names).encode('UTF-8'))))
+        container.documents().put(os.getenv("S3_BUCKET_NAME"), 'names.json',
+                                  body=(bytes(json.dumps(names).encode('UTF-8'))), value=names)
         return {"names": names}
     except ClientError:
         return {
@@ -566,8 +569,26 @@ def update_names():
         }
 
 
-@cache
+def date_range() -> Dict[str, Optional[str]]:
+    """Reads the optional `from` and `to` days, as 2023-01-23 or 2023/01/23, of the calendar routes."""
+    query_params = app.current_request.query_params or {}
+    bounds = {}
+    for bound, param in (("start", "from"), ("end", "to")):
+        day = query_params.get(param)
+        if day is not None:
+            day = day.replace('-', '/')
+            try:
+                if len(day) != len("2023/01/23"):
+                    raise ValueError(day)
+                datetime.strptime(day, "%Y/%m/%d")
+            except ValueError:
+                raise BadRequestError(f"'{param}' must be a date like 2023-01-23.")
+        bounds[bound] = day
+    return bounds
+
+
 @app.route('/calendar/{user}', methods=['GET'], authorizer=jwt_auth, cors=True)
+@cached_route
 def calendar(user: str) -> Response:
     logger.info(
         "Route authorized for user.",
@@ -581,24 +602,25 @@ def calendar(user: str) -> Response:
             },
             'photos': container.photo_service().get_photo_counts_by_date(
                 prefix=f"calendar/{user}",
-                bucket=os.getenv("S3_BUCKET_NAME"))
+                bucket=os.getenv("S3_BUCKET_NAME"),
+                **date_range())
         },
         status_code=200)
 
 
-@cache
 @app.route('/calendars/{user}/{key}', methods=['GET'], authorizer=jwt_auth, cors=True)
+@cached_route
 def calendars(user: str, key: str) -> Response:
     logger.info(
         "Route authorized for user.",
         extra={"data": {"context": app.current_request.context}})
-    photos = list_helper(bucket=os.getenv("S3_BUCKET_NAME"), prefix=f"calendar/{user}/{key.replace('-', '/')}")
+    photos, token = page_helper(bucket=os.getenv("S3_BUCKET_NAME"), prefix=f"calendar/{user}/{key.replace('-', '/')}")
     return Response(
-        body={'photos': [photo.get("url") for photo in photos]},
+        body={'photos': [photo.get("url") for photo in photos], 'next': token},
         status_code=200)
 
-@cache
 @app.route('/no-cors-calendar/{user}', authorizer=jwt_auth)
+@cached_route
 def no_cors_calendar(user: str) -> Response:
     logger.info(
         "Route authorized for user.",
@@ -612,52 +634,56 @@ def no_cors_calendar(user: str) -> Response:
             },
             'photos': container.photo_service().get_photo_counts_by_date(
                 prefix=f"calendar/{user}",
-                bucket=os.getenv("S3_BUCKET_NAME"))
+                bucket=os.getenv("S3_BUCKET_NAME"),
+                **date_range())
         },
         status_code=200)
 
-@cache
 @app.route('/no-cors-calendars/{user}/{key}', authorizer=jwt_auth)
+@cached_route
 def no_cors_calendars(user: str, key: str) -> Response:
     logger.info(
         "Route authorized for user.",
         extra={"data": {"context": app.current_request.context}})
-    photos = list_helper(bucket=os.getenv("S3_BUCKET_NAME"), prefix=f"calendar/{user}/{key.replace('-', '/')}")
+    photos, token = page_helper(bucket=os.getenv("S3_BUCKET_NAME"), prefix=f"calendar/{user}/{key.replace('-', '/')}")
     return Response(
-        body={'photos': [photo.get("url") for photo in photos]},
+        body={'photos': [photo.get("url") for photo in photos], 'next': token},
         status_code=200)
 
 
+def flyer_projection(body: bytes) -> Dict[str, str]:
+    """The serialized flyer of every country that has its own, kept alongside the cached flyer.json."""
+    data = json.loads(body.decode('utf-8'))
+    return {country: json.dumps(data[country], separators=(',', ':'))
+            for country in (FLYER_DEFAULT_COUNTRY, *FLYER_COUNTRIES) if country in data}
+
 @app.route('/flyer', methods=['GET'], cors=True)
 def flyer() -> Response:
-    s3 = boto3.resource('s3')
-    content_object = s3.Object(os.getenv("S3_BUCKET_NAME"), f'flyer.json')
-    data = json.loads(content_object.get()['Body'].read().decode('utf-8'))
+    projection = container.documents().get(os.getenv("S3_BUCKET_NAME"), 'flyer.json', parse=flyer_projection)
     country = None
     if 'cloudfront-viewer-country' in app.current_request.headers:
         country = app.current_request.headers['cloudfront-viewer-country']
         logger.info(f"Country from headers is: {country}")
-    if country and country == "MX":
-        info = data[country]
-    else:
-        info = data["US"]
+    if country not in projection:
+        country = FLYER_DEFAULT_COUNTRY
     return Response(
-        body=info,
+        body=projection[country],
+        headers={'Content-Type': 'application/json'},
         status_code=200)
 
 @app.route('/login', methods=['POST'], cors=True)
 def login():
-    client = boto3.client(service_name='secretsmanager', region_name='us-east-1')
+    secrets = container.secret_cache()
     request = app.current_request
     body = request.json_body
     password = body.get("password")
     hashed_password = hashlib.md5(password.encode()).hexdigest()
     logger.info(f"Hashed requested password: {hashed_password}")
-    if hashed_password != client.get_secret_value(
-            SecretId=os.getenv("HASHED_PASSWORD_SECRET_NAME")).get('SecretString'):
+    if hashed_password != secrets.get(os.getenv("HASHED_PASSWORD_SECRET_NAME")) and \
+            hashed_password != secrets.get(os.getenv("HASHED_PASSWORD_SECRET_NAME"), refresh=True):
         logger.info(f"Incorrect password.")
         raise UnauthorizedError("Incorrect password.")
-    secret = client.get_secret_value(SecretId=os.getenv("JWT_SECRET_NAME")).get('SecretString')
+    secret = secrets.get(os.getenv("JWT_SECRET_NAME"))
     token = jwt.encode({"exp": datetime.now(tz=timezone.utc) + timedelta(hours=1)}, secret, algorithm="HS256")
     return Response(
         body={'token': token},
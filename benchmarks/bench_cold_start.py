@@ -0,0 +1,45 @@
+"""Cold-start cost of the Lambda module and of the first /boleros request per language.
+
+    python -m chalicelib.services.boleros  # compile the chains first, as the build does
+    python -m benchmarks.bench_cold_start --repeat 10
+"""
+import argparse
+import json
+import subprocess
+import sys
+
+IMPORT_APP = """
+import json, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter() - start
+from chalicelib.services.boleros import load_model, build_model
+start = time.perf_counter()
+load_model("{language}")
+loaded = time.perf_counter() - start
+start = time.perf_counter()
+build_model("{language}")
+built = time.perf_counter() - start
+print(json.dumps({{"import": imported, "load_compiled": loaded, "build_from_corpus": built}}))
+"""
+
+
+def measure(language):
+    output = subprocess.run([sys.executable, "-c", IMPORT_APP.format(language=language)],
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--language", default="es")
+    args = parser.parse_args()
+
+    runs = [measure(args.language) for _ in range(args.repeat)]
+    for stage in runs[0]:
+        print(f"{stage}: {min(run[stage] for run in runs) * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""Time of the /order policies over growing state catalogs, against the previous sort-and-remove loop.
+
+    python -m benchmarks.bench_order --sizes 10 1000 10000
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+
+from chalicelib.services.policies import ArmStatistics, POLICIES, EPSILON
+
+DEFAULT_SIZES = [10, 100, 1000, 10000]
+
+
+def legacy_order(states, scores):
+    states_sorted = sorted(zip(states, scores), key=lambda state: state[1])
+    new_order = []
+    for _ in range(len(states_sorted)):
+        if random.random() < EPSILON:
+            current_choice = random.choice(states_sorted)
+            states_sorted.remove(current_choice)
+        else:
+            current_choice = states_sorted.pop()
+        new_order.append(current_choice[0])
+    return new_order
+
+
+def median_seconds(run, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng()
+    for n_states in args.sizes:
+        statistics = ArmStatistics(means=rng.normal(300, 50, n_states), counts=rng.integers(0, 100, n_states) * 1.0,
+                                   variances=rng.uniform(100, 2500, n_states))
+        states = [f"PAGE_{i}" for i in range(n_states)]
+        timings = {"legacy": median_seconds(lambda: legacy_order(states, statistics.means.tolist()), args.repeat)}
+        for name, policy in POLICIES.items():
+            timings[name] = median_seconds(lambda: policy(statistics, rng), args.repeat)
+        print(f"n={n_states}: " + ", ".join(f"{name} {seconds * 1e6:.0f}us" for name, seconds in timings.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""Per-stage timings of the TSP pipeline behind / and /solve.
+
+Every case runs in a fresh interpreter, so its peak RSS (and linkern's, under "children") is its own.
+
+    python -m benchmarks.bench_pipeline --sizes 100 1000 3000 --output bench.json
+    python -m benchmarks.bench_pipeline --baseline bench.json --output bench-new.json
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from contextlib import contextmanager
+
+import numpy as np
+from chalice.config import Config
+from chalice.local import LocalGateway
+
+from app import app, FACTOR
+from chalicelib.modules.container import container
+from chalicelib.services.payload import tour_from_order
+from chalicelib.services.point_set import generate_point_set, POINT_SETS
+from chalicelib.services.solver import write_instance, read_tour, path_length, LINKERN_BACKEND
+
+DEFAULT_SIZES = [10, 100, 1000, 3000]
+
+
+@contextmanager
+def timed(timings, stage):
+    start = time.perf_counter()
+    yield
+    timings[stage] = time.perf_counter() - start
+
+
+def peak_rss_kb():
+    # ru_maxrss is reported in kilobytes on Linux and in bytes on macOS
+    scale = 1024 if platform.system() == "Darwin" else 1
+    return {
+        "self": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // scale,
+        "children": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss // scale,
+    }
+
+
+def spawn_time(tmp_dir):
+    """Wall time of a linkern run on a trivial instance, i.e. process start-up and teardown."""
+    tsp_file = os.path.join(tmp_dir, "spawn.tsp")
+    with open(tsp_file, "w") as file_handle:
+        write_instance(file_handle, np.array([[0.0, 0.0], [0.0, 1.0], [1.0, 1.0], [1.0, 0.0]]))
+    start = time.perf_counter()
+    container.linkern_solver().run(tsp_file, os.path.join(tmp_dir, "spawn.tour"), dim=2)
+    return time.perf_counter() - start
+
+
+def run_pipeline(cities, solved_cities, tmp_dir, spawn):
+    timings = {}
+    tsp_file = os.path.join(tmp_dir, "%s.tsp" % uuid.uuid4())
+    tour_file = os.path.join(tmp_dir, "%s.tour" % uuid.uuid4())
+    with timed(timings, "write"):
+        with open(tsp_file, "w+") as file_handle:
+            write_instance(file_handle, solved_cities)
+    with timed(timings, "linkern"):
+        container.linkern_solver().run(tsp_file, tour_file, dim=solved_cities.shape[1])
+    timings["spawn"] = min(spawn, timings["linkern"])
+    timings["solve"] = timings["linkern"] - timings["spawn"]
+    with timed(timings, "parse"):
+        order = read_tour(tour_file)
+    with timed(timings, "serialize"):
+        json.dumps(tour_from_order(cities, order))
+    os.remove(tsp_file)
+    os.remove(tour_file)
+    return timings, path_length(cities, order)
+
+
+def bench_index(point_set, n_cities, tmp_dir, spawn, gateway):
+    timings = {}
+    with timed(timings, "generate"):
+        cities = generate_point_set(point_set, n_cities)
+    stages, length = run_pipeline(cities, cities * FACTOR, tmp_dir, spawn)
+    timings.update(stages)
+    body = json.dumps({"point_set": point_set, "n_cities": n_cities, "solver": LINKERN_BACKEND})
+    with timed(timings, "gateway"):
+        response = gateway.handle_request(method="POST", path="/", headers={"Content-Type": "application/json"},
+                                          body=body)
+    assert response["statusCode"] == 200, response
+    return {"route": "/", "point_set": point_set, "n_cities": n_cities, "timings": timings, "length": length}
+
+
+def bench_solve(dimension, n_cities, tmp_dir, spawn, gateway):
+    cities = np.random.default_rng().random((n_cities, dimension)) * FACTOR
+    timings, length = run_pipeline(cities, cities, tmp_dir, spawn)
+    with timed(timings, "gateway"):
+        response = gateway.handle_request(method="POST", path=f"/solve?solver={LINKERN_BACKEND}",
+                                          headers={"Content-Type": "application/octet-stream",
+                                                   "X-Dimension": str(dimension)},
+                                          body=cities.astype("<f8").tobytes())
+    assert response["statusCode"] == 200, response
+    return {"route": "/solve", "dimension": dimension, "n_cities": n_cities, "timings": timings, "length": length}
+
+
+def case_name(result):
+    variant = result.get("point_set") or "%dd" % result.get("dimension")
+    return f"{result['route']} {variant} n={result['n_cities']}"
+
+
+def compare(results, baseline):
+    previous = {case_name(result): result for result in baseline["results"]}
+    for result in results:
+        before = previous.get(case_name(result))
+        if before is None:
+            continue
+        changes = ", ".join(f"{stage} {before['timings'][stage] * 1000:.1f}->{seconds * 1000:.1f}ms"
+                            for stage, seconds in result["timings"].items() if stage in before["timings"])
+        print(f"{case_name(result)}: {changes}")
+
+
+BENCHES = {"index": bench_index, "solve": bench_solve}
+
+
+def run_case(bench, variant, n_cities, repeat, spawn, tmp_dir):
+    gateway = LocalGateway(app, Config())
+    # the first request pays for lazy container and logger set-up
+    gateway.handle_request(method="POST", path="/", headers={"Content-Type": "application/json"},
+                           body=json.dumps({"point_set": "plane", "n_cities": 5}))
+    runs = [BENCHES[bench](variant, n_cities, tmp_dir, spawn, gateway) for _ in range(repeat)]
+    result = runs[0]
+    result["timings"] = {stage: float(np.median([run["timings"][stage] for run in runs]))
+                         for stage in result["timings"]}
+    result["length"] = float(np.median([run["length"] for run in runs]))
+    result["peak_rss_kb"] = peak_rss_kb()
+    return result
+
+
+def case_in_subprocess(bench, variant, n_cities, repeat, spawn, tmp_dir):
+    """Runs one case in a new interpreter, since ru_maxrss only ever grows within a process."""
+    output = os.path.join(tmp_dir, "%s.json" % uuid.uuid4())
+    subprocess.run([sys.executable, "-m", "benchmarks.bench_pipeline", "--case", bench, str(variant), str(n_cities),
+                    "--repeat", str(repeat), "--spawn", str(spawn), "--output", output],
+                   stdout=subprocess.DEVNULL, check=True)
+    with open(output) as file_handle:
+        return json.load(file_handle)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--point-sets", nargs="+", default=list(POINT_SETS))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default="bench.json")
+    parser.add_argument("--baseline")
+    parser.add_argument("--case", nargs=3, metavar=("BENCH", "VARIANT", "N_CITIES"), help=argparse.SUPPRESS)
+    parser.add_argument("--spawn", type=float, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        bench, variant, n_cities = args.case
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            result = run_case(bench, int(variant) if bench == "solve" else variant, int(n_cities), args.repeat,
+                              args.spawn, tmp_dir)
+        with open(args.output, "w") as file_handle:
+            json.dump(result, file_handle)
+        return
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        spawn = min(spawn_time(tmp_dir) for _ in range(args.repeat))
+        for n_cities in args.sizes:
+            cases = [("index", point_set) for point_set in args.point_sets] + \
+                    [("solve", dimension) for dimension in (2, 3)]
+            for bench, variant in cases:
+                result = case_in_subprocess(bench, variant, n_cities, args.repeat, spawn, tmp_dir)
+                results.append(result)
+                print(f"{case_name(result)}: " +
+                      ", ".join(f"{stage} {seconds * 1000:.1f}ms" for stage, seconds in result["timings"].items()) +
+                      f", peak RSS {result['peak_rss_kb']['self']} kB")
+
+    with open(args.output, "w") as file_handle:
+        json.dump({"python": platform.python_version(), "machine": platform.machine(), "cpus": os.cpu_count(),
+                   "spawn": spawn, "results": results}, file_handle, indent=2)
+    if args.baseline:
+        with open(args.baseline) as file_handle:
+            compare(results, json.load(file_handle))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,199 @@
-import boto3
+import os
+
 from dependency_injector import containers
 from dependency_injector import providers
 
+from chalicelib.services.auth import SecretCache, TokenCache, TokenVerifier
+from chalicelib.services.bandit import BanditStatistics, create_checkpoint
+from chalicelib.services.boleros import Boleros
+from chalicelib.services.clients import ClientPool, client_config
+from chalicelib.services.colors import Colors
+from chalicelib.services.documents import DocumentCache
+from chalicelib.services.jobs import JobRunner, create_job_store
+from chalicelib.services.metrics import RewardMetrics
+from chalicelib.services.partition import PartitionSolver
 from chalicelib.services.photo import Photo
+from chalicelib.services.photo_counts import PhotoCounts
+from chalicelib.services.prefix_index import PrefixIndex
+from chalicelib.services.presigner import BatchPresigner
+from chalicelib.services.response_cache import ResponseCache
+from chalicelib.services.single_flight import SingleFlight
+from chalicelib.services.solver import LinkernSolver, MultiStartLinkernSolver, NumpySolver, LINKERN_BACKEND, \
+    MULTISTART_BACKEND, NUMPY_BACKEND, LARGE_BACKEND, NUMPY_SOLVER_MAX_CITIES
+from chalicelib.services.tour_cache import TourCache, create_store
 from boto3.resources.base import ServiceResource
+from botocore.client import BaseClient
 
 
 class Container(containers.DeclarativeContainer):
 
-    s3_resource: providers.Singleton[ServiceResource] = providers.Singleton(
-        boto3.resource,
-        service_name="s3"
+    client_pool: providers.Singleton[ClientPool] = providers.ThreadSafeSingleton(
+        ClientPool,
+        config=providers.Singleton(
+            client_config,
+            max_pool_connections=int(os.getenv("AWS_MAX_POOL_CONNECTIONS", 50)),
+            connect_timeout=float(os.getenv("AWS_CONNECT_TIMEOUT", 5)),
+            read_timeout=float(os.getenv("AWS_READ_TIMEOUT", 30)),
+            max_attempts=int(os.getenv("AWS_CLIENT_MAX_ATTEMPTS", 3)),
+        ),
+    )
+
+    s3_resource: providers.Singleton[ServiceResource] = providers.ThreadSafeSingleton(
+        ClientPool.resource,
+        client_pool,
+        "s3",
+    )
+
+    s3_client: providers.Singleton[BaseClient] = providers.ThreadSafeSingleton(
+        ClientPool.client,
+        client_pool,
+        "s3",
+        signature_version="s3v4",
+    )
+
+    single_flight: providers.Singleton[SingleFlight] = providers.ThreadSafeSingleton(
+        SingleFlight,
+        timeout=float(os.getenv("SINGLE_FLIGHT_TIMEOUT", 60)),
+    )
+
+    presigner: providers.Singleton[BatchPresigner] = providers.Singleton(
+        BatchPresigner,
+        s3_client=s3_client,
+    )
+
+    prefix_index: providers.Singleton[PrefixIndex] = providers.Singleton(
+        PrefixIndex,
+        s3_client=s3_client,
+        max_age=float(os.getenv("PREFIX_INDEX_MAX_AGE", 24 * 60 * 60)),
+        single_flight=single_flight,
+    )
+
+    photo_counts: providers.Singleton[PhotoCounts] = providers.Singleton(
+        PhotoCounts,
+        s3_client=s3_client,
+        prefix_index=prefix_index,
+        max_workers=int(os.getenv("PHOTO_COUNTS_WORKERS", 8)),
+        max_age=float(os.getenv("PREFIX_INDEX_MAX_AGE", 24 * 60 * 60)),
     )
 
     photo_service: providers.Singleton[Photo] = providers.Singleton(
         Photo,
         s3_resource=s3_resource,
+        index=prefix_index,
+        counts=photo_counts,
+        single_flight=single_flight,
+    )
+
+    response_cache: providers.Singleton[ResponseCache] = providers.Singleton(
+        ResponseCache,
+        maxsize=int(os.getenv("RESPONSE_CACHE_SIZE", 128)),
+        ttl=float(os.getenv("RESPONSE_CACHE_TTL", 300)),
+    )
+
+    documents: providers.Singleton[DocumentCache] = providers.ThreadSafeSingleton(
+        DocumentCache,
+        s3_client=s3_client,
+        freshness=float(os.getenv("DOCUMENT_FRESHNESS", 60)),
+        maxsize=int(os.getenv("DOCUMENT_CACHE_SIZE", 256)),
+        single_flight=single_flight,
+        response_cache=response_cache,
+    )
+
+    colors_service: providers.Singleton[Colors] = providers.Singleton(
+        Colors,
+        s3_client=s3_client,
+        max_workers=int(os.getenv("COLORS_WORKERS", 8)),
+        index=prefix_index,
+        presigner=presigner,
+        documents=documents,
+    )
+
+    cloudwatch_client: providers.Singleton[BaseClient] = providers.ThreadSafeSingleton(
+        ClientPool.client,
+        client_pool,
+        "cloudwatch",
+    )
+
+    reward_metrics: providers.Singleton[RewardMetrics] = providers.Singleton(
+        RewardMetrics,
+        client_factory=cloudwatch_client.provider,
+        stage=os.getenv("METRICS_STAGE", "dev"),
+        mode=os.getenv("METRICS_MODE", "api"),
+        max_pending=int(os.getenv("METRICS_MAX_PENDING", 100)),
+        max_age=float(os.getenv("METRICS_MAX_AGE", 60)),
+    )
+
+    bandit_statistics: providers.Singleton[BanditStatistics] = providers.Singleton(
+        BanditStatistics,
+        checkpoint=providers.Singleton(create_checkpoint, s3_client=s3_client),
+        half_life=float(os.getenv("BANDIT_HALF_LIFE", 0)) or None,
+        sync_interval=float(os.getenv("BANDIT_SYNC_INTERVAL", 60)),
+    )
+
+    secretsmanager_client: providers.Singleton[BaseClient] = providers.ThreadSafeSingleton(
+        ClientPool.client,
+        client_pool,
+        "secretsmanager",
+        region_name="us-east-1",
+    )
+
+    secret_cache: providers.Singleton[SecretCache] = providers.Singleton(
+        SecretCache,
+        client=secretsmanager_client,
+        ttl=float(os.getenv("SECRET_TTL", 300)),
+        min_refresh_interval=float(os.getenv("SECRET_MIN_REFRESH_INTERVAL", 30)),
+    )
+
+    token_verifier: providers.Singleton[TokenVerifier] = providers.Singleton(
+        TokenVerifier,
+        secrets=secret_cache,
+        tokens=providers.Singleton(TokenCache, maxsize=int(os.getenv("TOKEN_CACHE_SIZE", 1024))),
+    )
+
+    boleros: providers.Singleton[Boleros] = providers.Singleton(Boleros)
+
+    linkern_solver: providers.Singleton[LinkernSolver] = providers.Singleton(LinkernSolver)
+
+    multistart_solver: providers.Singleton[MultiStartLinkernSolver] = providers.Singleton(
+        MultiStartLinkernSolver,
+        runs=int(os.getenv("MULTISTART_RUNS", 4)),
+        time_budget=float(os.getenv("MULTISTART_TIME_BUDGET", 10.0)),
+    )
+
+    numpy_solver: providers.Singleton[NumpySolver] = providers.Singleton(NumpySolver)
+
+    large_solver: providers.Singleton[PartitionSolver] = providers.Singleton(
+        PartitionSolver,
+        partition_solver=linkern_solver,
+        partition_size=int(os.getenv("PARTITION_SIZE", 1000)),
+    )
+
+    # what the linkern backends fall back to when the binary cannot run: NumPy only ever sees small partitions
+    fallback_solver: providers.Singleton[PartitionSolver] = providers.Singleton(
+        PartitionSolver,
+        partition_solver=numpy_solver,
+        partition_size=NUMPY_SOLVER_MAX_CITIES,
+    )
+
+    solvers = providers.Dict({
+        LINKERN_BACKEND: linkern_solver,
+        MULTISTART_BACKEND: multistart_solver,
+        NUMPY_BACKEND: numpy_solver,
+        LARGE_BACKEND: large_solver,
+    })
+
+    tour_cache: providers.Singleton[TourCache] = providers.Singleton(
+        TourCache,
+        maxsize=int(os.getenv("TOUR_CACHE_SIZE", 256)),
+        store=providers.Singleton(create_store, s3_resource=s3_resource),
+    )
+
+    job_store = providers.Singleton(create_job_store)
+
+    job_runner: providers.Singleton[JobRunner] = providers.Singleton(
+        JobRunner,
+        store=job_store,
+        max_workers=int(os.getenv("SOLVE_JOBS_WORKERS", 2)),
     )
 
 
@@ -0,0 +1,107 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Tuple
+
+import jwt
+from aws_lambda_powertools import Logger
+from botocore.client import BaseClient
+
+logger = Logger()
+
+@dataclass
+class SecretCache:
+    """Secret values kept for `ttl` seconds.
+
+    Forced refreshes are triggered by bad tokens and wrong passwords, so anyone can ask for them. At most one per
+    secret is made every `min_refresh_interval` seconds; the others get the cached value.
+    """
+    client: BaseClient
+    ttl: float = 300.0
+    min_refresh_interval: float = 30.0
+    _values: Dict[str, Tuple[str, float]] = field(default_factory=dict, repr=False)
+    _refreshed: Dict[str, float] = field(default_factory=dict, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def get(self, secret_id: str, refresh: bool = False) -> str:
+        now = time.monotonic()
+        with self._lock:
+            cached = self._values.get(secret_id)
+            if refresh and cached is not None:
+                if now - self._refreshed.get(secret_id, float("-inf")) < self.min_refresh_interval:
+                    return cached[0]
+                self._refreshed[secret_id] = now
+            elif cached is not None and cached[1] > now:
+                return cached[0]
+        value = self.client.get_secret_value(SecretId=secret_id).get('SecretString')
+        with self._lock:
+            self._values[secret_id] = (value, time.monotonic() + self.ttl)
+        return value
+
+
+@dataclass
+class TokenCache:
+    maxsize: int = 1024
+    _expirations: OrderedDict = field(default_factory=OrderedDict, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def contains(self, token: str) -> bool:
+        key = self._key(token)
+        with self._lock:
+            expiration = self._expirations.get(key)
+            if expiration is None:
+                return False
+            if expiration <= time.time():
+                del self._expirations[key]
+                return False
+            self._expirations.move_to_end(key)
+            return True
+
+    def put(self, token: str, expiration: float):
+        with self._lock:
+            self._expirations[self._key(token)] = expiration
+            while len(self._expirations) > self.maxsize:
+                self._expirations.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._expirations.clear()
+
+
+@dataclass
+class TokenVerifier:
+    secrets: SecretCache
+    tokens: TokenCache
+
+    def verify(self, token: str, secret_name: str) -> bool:
+        if self.tokens.contains(token):
+            return True
+        try:
+            claims = self._decode(token, self.secrets.get(secret_name))
+        except jwt.InvalidSignatureError:
+            # the secret may have been rotated since it was cached
+            previous = self.secrets.get(secret_name)
+            secret = self.secrets.get(secret_name, refresh=True)
+            if secret == previous:
+                return False
+            logger.info("JWT secret was rotated, dropping verified tokens.")
+            self.tokens.clear()
+            try:
+                claims = self._decode(token, secret)
+            except jwt.InvalidTokenError:
+                return False
+        except jwt.InvalidTokenError:
+            return False
+        if claims.get("exp") is not None:
+            self.tokens.put(token, claims["exp"])
+        return True
+
+    @staticmethod
+    def _decode(token: str, secret: str) -> Dict:
+        return jwt.decode(jwt=token, key=secret, algorithms=["HS256"])
@@ -0,0 +1,213 @@
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from aws_lambda_powertools import Logger
+from botocore.client import BaseClient
+from botocore.exceptions import BotoCoreError, ClientError
+
+from chalicelib.services.prefix_index import read_document, write_document, is_conflict
+
+logger = Logger()
+
+WRITE_RETRIES = 3
+CHECKPOINT_ERRORS = (OSError, ValueError, BotoCoreError, ClientError)
+
+
+class CheckpointConflict(Exception):
+    pass
+
+
+@dataclass
+class RunningStatistics:
+    """Count, mean and sum of squared deviations of a state's rewards, with weights decaying over time."""
+    count: float = 0.0
+    mean: float = 0.0
+    m2: float = 0.0
+    updated: float = 0.0
+
+    @property
+    def variance(self) -> float:
+        return self.m2 / self.count if self.count > 0 else 0.0
+
+    def decay(self, now: float, half_life: Optional[float]):
+        if half_life and now > self.updated:
+            factor = 0.5 ** ((now - self.updated) / half_life)
+            self.count *= factor
+            self.m2 *= factor
+        self.updated = max(self.updated, now)
+
+    def add(self, reward: float, now: float, half_life: Optional[float] = None):
+        # Welford's update with a unit weight
+        self.decay(now, half_life)
+        self.count += 1
+        delta = reward - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (reward - self.mean)
+
+    def merge(self, other: "RunningStatistics", now: float, half_life: Optional[float] = None):
+        # Chan et al.'s pairwise combination, after decaying both sides to `now`
+        other = RunningStatistics(*other.to_list())
+        self.decay(now, half_life)
+        other.decay(now, half_life)
+        count = self.count + other.count
+        if count == 0:
+            return
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+
+    def to_list(self) -> List[float]:
+        return [self.count, self.mean, self.m2, self.updated]
+
+
+def merge_all(base: Dict[str, RunningStatistics], updates: Dict[str, RunningStatistics], now: float,
+              half_life: Optional[float]) -> Dict[str, RunningStatistics]:
+    merged = {state: RunningStatistics(*statistics.to_list()) for state, statistics in base.items()}
+    for state, statistics in updates.items():
+        merged.setdefault(state, RunningStatistics(updated=statistics.updated)).merge(statistics, now, half_life)
+    return merged
+
+
+def encode(states: Dict[str, RunningStatistics]) -> Dict:
+    return {"states": {state: statistics.to_list() for state, statistics in states.items()}}
+
+
+def decode(document: Optional[Dict]) -> Dict[str, RunningStatistics]:
+    if document is None:
+        return {}
+    return {state: RunningStatistics(*values) for state, values in document["states"].items()}
+
+
+@dataclass
+class FileCheckpoint:
+    path: str
+
+    def read(self) -> Tuple[Optional[Dict], Optional[int]]:
+        if not os.path.exists(self.path):
+            return None, None
+        with open(self.path) as file_handle:
+            return json.load(file_handle), os.stat(self.path).st_mtime_ns
+
+    def write(self, document: Dict, version: Optional[int]):
+        current = os.stat(self.path).st_mtime_ns if os.path.exists(self.path) else None
+        if current != version:
+            raise CheckpointConflict(self.path)
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path + ".part", "w") as file_handle:
+            json.dump(document, file_handle, separators=(",", ":"))
+        os.replace(self.path + ".part", self.path)
+
+
+@dataclass
+class S3Checkpoint:
+    s3_client: BaseClient
+    bucket: str
+    key: str
+
+    def read(self) -> Tuple[Optional[Dict], Optional[str]]:
+        return read_document(self.s3_client, self.bucket, self.key)
+
+    def write(self, document: Dict, version: Optional[str]):
+        try:
+            write_document(self.s3_client, self.bucket, self.key, document, etag=version)
+        except ClientError as error:
+            if is_conflict(error):
+                raise CheckpointConflict(self.key)
+            raise
+
+
+@dataclass
+class BanditStatistics:
+    """Online reward statistics per state, shared between containers through a checkpoint.
+
+    Rewards are added to a local delta. Syncing merges the delta into the latest checkpoint, which holds every
+    container's rewards, writes it back conditionally and makes the result the new local baseline.
+    """
+    checkpoint: Optional[object] = None
+    half_life: Optional[float] = None
+    sync_interval: float = 60.0
+    _base: Dict[str, RunningStatistics] = field(default_factory=dict, repr=False)
+    _pending: Dict[str, RunningStatistics] = field(default_factory=dict, repr=False)
+    _synced: Optional[float] = field(default=None, repr=False)
+    _read: bool = field(default=False, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def update(self, state: str, reward: float, now: Optional[float] = None):
+        now = time.time() if now is None else now
+        with self._lock:
+            self._pending.setdefault(state, RunningStatistics(updated=now)).add(reward, now, self.half_life)
+
+    def statistics(self, states: Iterable[str]) -> List[Optional[RunningStatistics]]:
+        states = list(states)
+        if self._synced is None:
+            self.sync()
+        now = time.time()
+        with self._lock:
+            self._read = True
+            merged = merge_all({state: self._base[state] for state in states if state in self._base},
+                               {state: self._pending[state] for state in states if state in self._pending},
+                               now, self.half_life)
+        return [merged.get(state) for state in states]
+
+    def mean(self, state: str) -> Optional[float]:
+        statistics, = self.statistics([state])
+        return None if statistics is None else statistics.mean
+
+    def due(self) -> bool:
+        with self._lock:
+            return (bool(self._pending) or self._read) and \
+                (self._synced is None or time.time() - self._synced >= self.sync_interval)
+
+    def sync_if_due(self):
+        if self.due():
+            self.sync()
+
+    def sync(self):
+        now = time.time()
+        with self._lock:
+            pending, self._pending, self._read = self._pending, {}, False
+            base = self._base
+        if self.checkpoint is None:
+            merged = merge_all(base, pending, now, self.half_life)
+        else:
+            merged = self._merge_checkpoint(pending, now)
+        with self._lock:
+            self._synced = now
+            if merged is None:
+                # keep the rewards for the next sync
+                self._pending = merge_all(pending, self._pending, now, self.half_life)
+            else:
+                self._base = merged
+        logger.info(f"Synced bandit statistics of {len(pending)} updated states.")
+
+    def _merge_checkpoint(self, pending: Dict[str, RunningStatistics],
+                          now: float) -> Optional[Dict[str, RunningStatistics]]:
+        for _ in range(WRITE_RETRIES):
+            try:
+                document, version = self.checkpoint.read()
+                merged = merge_all(decode(document), pending, now, self.half_life)
+                if pending:
+                    self.checkpoint.write(encode(merged), version)
+                return merged
+            except CheckpointConflict:
+                continue
+            except CHECKPOINT_ERRORS:
+                logger.exception("Could not sync bandit statistics.")
+                return None
+        logger.warning("Bandit statistics kept changing while syncing, retrying on the next sync.")
+        return None
+
+
+def create_checkpoint(s3_client: BaseClient):
+    if os.getenv("BANDIT_STATISTICS_PATH"):
+        return FileCheckpoint(path=os.getenv("BANDIT_STATISTICS_PATH"))
+    if os.getenv("BANDIT_STATISTICS_S3_KEY"):
+        return S3Checkpoint(s3_client=s3_client,
+                            bucket=os.getenv("BANDIT_STATISTICS_BUCKET", "multiarmed-bandit-statistics"),
+                            key=os.getenv("BANDIT_STATISTICS_S3_KEY"))
+    return None
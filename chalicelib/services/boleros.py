@@ -0,0 +1,163 @@
+import bisect
+import os
+import random
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+import markovify
+from aws_lambda_powertools import Logger
+from markovify.chain import BEGIN, END
+from markovify.text import DEFAULT_MAX_OVERLAP_RATIO, DEFAULT_MAX_OVERLAP_TOTAL
+
+logger = Logger()
+
+BOLEROS_DIR = os.path.dirname(os.path.dirname(__file__))
+LANGUAGES = ("es", "en")
+MAX_CHARS = 100
+TRIES = 100
+POOL_SIZE = int(os.getenv("BOLEROS_POOL_SIZE", 64))
+MAX_SENTENCES = 50
+
+
+def text_path(language: str) -> str:
+    return os.path.join(BOLEROS_DIR, f"boleros_{language}.txt")
+
+
+def model_path(language: str) -> str:
+    return os.path.join(BOLEROS_DIR, f"boleros_{language}.json")
+
+
+def build_model(language: str) -> markovify.Text:
+    with open(text_path(language)) as file_handle:
+        return markovify.Text(file_handle.read()).compile()
+
+
+def write_model(language: str):
+    with open(model_path(language), "w") as file_handle:
+        file_handle.write(build_model(language).to_json())
+
+
+def load_model(language: str) -> markovify.Text:
+    if not os.path.exists(model_path(language)):
+        logger.warning(f"No compiled model for {language}, building it from the corpus.")
+        return build_model(language)
+    with open(model_path(language)) as file_handle:
+        return markovify.Text.from_json(file_handle.read())
+
+
+class SentenceEngine:
+    """Walks a markovify chain re-encoded as flat integer arrays.
+
+    Every state gets an id and its transitions a contiguous slice of `words`, `cumulative` and `next_states`, so a
+    step is one random number and a binary search over the slice instead of tuple hashing and list building.
+    """
+
+    def __init__(self, model: markovify.Text, max_chars: int = MAX_CHARS):
+        self.model = model
+        self.max_chars = max_chars
+        chain = model.chain.compile() if not model.chain.compiled else model.chain
+        states = {state: index for index, state in enumerate(chain.model)}
+        self.vocabulary: List[str] = []
+        word_ids: Dict[str, int] = {}
+        self.starts: List[int] = []
+        self.ends: List[int] = []
+        self.words: List[int] = []
+        self.cumulative: List[int] = []
+        self.next_states: List[int] = []
+        for state, (words, cumulative) in chain.model.items():
+            self.starts.append(len(self.words))
+            for word, weight in zip(words, cumulative):
+                if word not in word_ids:
+                    word_ids[word] = len(self.vocabulary)
+                    self.vocabulary.append(word)
+                self.words.append(word_ids[word])
+                self.cumulative.append(weight)
+                self.next_states.append(-1 if word == END else states.get(state[1:] + (word,), -1))
+            self.ends.append(len(self.words))
+        self.begin = states[(BEGIN,) * chain.state_size]
+        self.fallback = [sentence for sentence in (" ".join(words) for words in model.parsed_sentences)
+                         if len(sentence) <= max_chars]
+
+    def walk(self, rng: random.Random) -> List[str]:
+        words = []
+        state = self.begin
+        while state >= 0:
+            start, end = self.starts[state], self.ends[state]
+            index = bisect.bisect(self.cumulative, rng.random() * self.cumulative[end - 1], start, end)
+            word = self.vocabulary[self.words[index]]
+            if word == END:
+                break
+            words.append(word)
+            state = self.next_states[index]
+        return words
+
+    def sentence(self, rng: random.Random = random) -> str:
+        for _ in range(TRIES):
+            words = self.walk(rng)
+            sentence = self.model.word_join(words)
+            if words and len(sentence) <= self.max_chars and self.model.test_sentence_output(
+                    words, DEFAULT_MAX_OVERLAP_RATIO, DEFAULT_MAX_OVERLAP_TOTAL):
+                return sentence.lower()
+        return rng.choice(self.fallback).lower()
+
+
+@dataclass
+class Boleros:
+    pool_size: int = POOL_SIZE
+    _models: Dict[str, markovify.Text] = field(default_factory=dict, repr=False)
+    _engines: Dict[str, SentenceEngine] = field(default_factory=dict, repr=False)
+    _pools: Dict[str, deque] = field(default_factory=dict, repr=False)
+    _refilling: set = field(default_factory=set, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def model(self, language: str) -> markovify.Text:
+        if language not in self._models:
+            with self._lock:
+                if language not in self._models:
+                    self._models[language] = load_model(language)
+        return self._models[language]
+
+    def engine(self, language: str) -> SentenceEngine:
+        if language not in self._engines:
+            model = self.model(language)
+            with self._lock:
+                if language not in self._engines:
+                    self._engines[language] = SentenceEngine(model)
+                    self._pools[language] = deque(maxlen=self.pool_size)
+        return self._engines[language]
+
+    def sentences(self, language: str, count: int = 1) -> List[str]:
+        engine = self.engine(language)
+        pool = self._pools[language]
+        sentences = []
+        while len(sentences) < count:
+            try:
+                sentences.append(pool.popleft())
+            except IndexError:
+                sentences.append(engine.sentence())
+        self._refill(language)
+        return sentences
+
+    def _refill(self, language: str):
+        with self._lock:
+            if language in self._refilling or len(self._pools[language]) > self.pool_size // 2:
+                return
+            self._refilling.add(language)
+        threading.Thread(target=self._fill, args=(language,), daemon=True).start()
+
+    def _fill(self, language: str):
+        try:
+            engine, pool = self._engines[language], self._pools[language]
+            while len(pool) < self.pool_size:
+                pool.append(engine.sentence())
+        finally:
+            with self._lock:
+                self._refilling.discard(language)
+
+
+if __name__ == "__main__":
+    # run at build time, before `chalice deploy`, so cold starts load the compiled chains instead of the corpus
+    for corpus_language in LANGUAGES:
+        write_model(corpus_language)
@@ -0,0 +1,54 @@
+import threading
+from dataclasses import dataclass, field
+from typing import Optional
+
+import boto3
+from aws_lambda_powertools import Logger
+from boto3.resources.base import ServiceResource
+from botocore.client import BaseClient
+from botocore.config import Config
+
+logger = Logger()
+
+
+def client_config(max_pool_connections: int = 50, connect_timeout: float = 5.0, read_timeout: float = 30.0,
+                  max_attempts: int = 3) -> Config:
+    """Shared settings of every client: a pool large enough for the thread pools fanning out S3 calls, kept-alive
+    connections and standard retries."""
+    return Config(
+        max_pool_connections=max_pool_connections,
+        tcp_keepalive=True,
+        connect_timeout=connect_timeout,
+        read_timeout=read_timeout,
+        retries={"mode": "standard", "max_attempts": max_attempts},
+    )
+
+
+@dataclass
+class ClientPool:
+    """Builds boto3 clients and resources from one session.
+
+    boto3 sessions are not thread-safe, so constructions are serialized. The container keeps each client as a
+    singleton, so a warm container builds every client once, on its first use.
+    """
+    config: Config = field(default_factory=client_config)
+    session: Optional[boto3.session.Session] = None
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def client(self, service_name: str, region_name: Optional[str] = None, **settings) -> BaseClient:
+        with self._lock:
+            logger.info(f"Creating {service_name} client.")
+            return self._session().client(service_name, region_name=region_name, config=self._config(settings))
+
+    def resource(self, service_name: str, region_name: Optional[str] = None, **settings) -> ServiceResource:
+        with self._lock:
+            logger.info(f"Creating {service_name} resource.")
+            return self._session().resource(service_name, region_name=region_name, config=self._config(settings))
+
+    def _session(self) -> boto3.session.Session:
+        if self.session is None:
+            self.session = boto3.session.Session()
+        return self.session
+
+    def _config(self, settings) -> Config:
+        return self.config.merge(Config(**settings)) if settings else self.config
@@ -0,0 +1,92 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+
+from aws_lambda_powertools import Logger
+from botocore.client import BaseClient
+from botocore.exceptions import ClientError
+
+from chalicelib.services.documents import DocumentCache
+from chalicelib.services.prefix_index import PrefixIndex
+from chalicelib.services.presigner import BatchPresigner
+
+logger = Logger()
+
+PREFIX = "colors/"
+CONFIG_FILE = "config.json"
+CUBE = "cube"
+SQUARE = "square"
+ONE_DAY_IN_SECONDS = 24 * 60 * 60
+
+
+def default_config() -> Dict:
+    return {
+        "default": None,
+        "description": None
+    }
+
+
+@dataclass
+class Colors:
+    s3_client: BaseClient
+    max_workers: int = 8
+    expires_in: int = ONE_DAY_IN_SECONDS
+    index: Optional[PrefixIndex] = None
+    presigner: Optional[BatchPresigner] = None
+    documents: Optional[DocumentCache] = None
+
+    def read_config(self, bucket: str, key: str) -> Dict:
+        try:
+            if self.documents is not None:
+                return self.documents.get(bucket, key)
+            return json.loads(self.s3_client.get_object(Bucket=bucket, Key=key)['Body'].read().decode('utf-8'))
+        except ClientError:
+            # the config was listed, so this is a race with a delete or a permissions problem
+            logger.warning(f"Could not read {key}.")
+            return default_config()
+
+    def keys(self, bucket: str) -> Iterable[str]:
+        if self.index is not None:
+            yield from self.index.list_keys(bucket, PREFIX)
+            return
+        for page in self.s3_client.get_paginator("list_objects_v2").paginate(Bucket=bucket, Prefix=PREFIX):
+            for obj in page.get("Contents", []):
+                yield obj["Key"]
+
+    def presign(self, bucket: str, keys: List[str]) -> List[str]:
+        if self.presigner is not None:
+            return self.presigner.presign(bucket, keys, expires_in=self.expires_in)
+        return [self.s3_client.generate_presigned_url(
+            'get_object', Params={'Bucket': bucket, 'Key': key}, ExpiresIn=self.expires_in) for key in keys]
+
+    def get_colors(self, bucket: str) -> List[Dict]:
+        """Walks the keys under `colors/` once, reading every project config on a thread pool while it pages."""
+        projects: Dict[str, Dict[str, Dict[str, str]]] = {}
+        configs = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for key in self.keys(bucket):
+                url_structure = key.split("/")
+                if len(url_structure) == 3 and url_structure[2] == CONFIG_FILE:
+                    configs[url_structure[1]] = executor.submit(self.read_config, bucket, key)
+                elif len(url_structure) == 4:
+                    _, slug, resolution, file = url_structure
+                    for kind in (SQUARE, CUBE):
+                        if kind in file:
+                            projects.setdefault(slug, {}).setdefault(resolution, {})[kind] = key
+
+            image_keys = [key for resolutions in projects.values() for images in resolutions.values()
+                          for key in images.values()]
+            urls = dict(zip(image_keys, self.presign(bucket, image_keys)))
+            logger.info(f"Found {len(projects)} color projects and {len(configs)} configs.")
+            return [
+                {
+                    "slug": slug,
+                    **(configs[slug].result() if slug in configs else default_config()),
+                    "resolutions": [
+                        {
+                            "resolution": resolution,
+                            CUBE: urls.get(images.get(CUBE)),
+                            SQUARE: urls.get(images.get(SQUARE)),
+                        } for resolution, images in resolutions.items()]
+                } for slug, resolutions in projects.items()]
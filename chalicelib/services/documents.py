@@ -0,0 +1,107 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional
+
+from aws_lambda_powertools import Logger
+from botocore.client import BaseClient
+from botocore.exceptions import ClientError
+
+from chalicelib.services.response_cache import ResponseCache
+from chalicelib.services.single_flight import SingleFlight
+
+logger = Logger()
+
+NOT_MODIFIED = 304
+
+
+def parse_json(body: bytes) -> Any:
+    return json.loads(body.decode('utf-8'))
+
+
+def parse_text(body: bytes) -> str:
+    return body.decode('utf-8')
+
+
+def not_modified(error: ClientError) -> bool:
+    return error.response.get('ResponseMetadata', {}).get('HTTPStatusCode') == NOT_MODIFIED or \
+        error.response.get('Error', {}).get('Code') in ('304', 'NotModified')
+
+
+@dataclass
+class Document:
+    value: Any
+    etag: str
+    checked: float
+
+
+@dataclass
+class DocumentCache:
+    """Parsed small S3 objects with their ETags.
+
+    A document is served from memory for `freshness` seconds after it was fetched or last revalidated. After that
+    it is revalidated with `If-None-Match`, which costs a round trip but no transfer or parsing while the object is
+    unchanged. Entries are keyed by bucket, key and parser, so a parser can hold a projection of the object.
+    Writes through `put` also clear `response_cache`, whose bodies may have been rendered from the old document.
+    """
+    s3_client: BaseClient
+    freshness: float = 60.0
+    maxsize: int = 256
+    single_flight: Optional[SingleFlight] = None
+    response_cache: Optional[ResponseCache] = None
+    _entries: OrderedDict = field(default_factory=OrderedDict, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def get(self, bucket: str, key: str, parse: Callable[[bytes], Any] = parse_json) -> Any:
+        cache_key = (bucket, key, parse)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is not None and now - entry.checked < self.freshness:
+                self._entries.move_to_end(cache_key)
+                return entry.value
+
+        if self.single_flight is not None:
+            return self.single_flight.do(("document",) + cache_key, self._fetch, cache_key, entry, now)
+        return self._fetch(cache_key, entry, now)
+
+    def _fetch(self, cache_key, entry: Optional[Document], now: float) -> Any:
+        bucket, key, parse = cache_key
+        conditions = {} if entry is None else {'IfNoneMatch': entry.etag}
+        try:
+            response = self.s3_client.get_object(Bucket=bucket, Key=key, **conditions)
+        except ClientError as error:
+            if entry is None or not not_modified(error):
+                raise
+            response = None
+
+        if response is None:
+            document = Document(value=entry.value, etag=entry.etag, checked=now)
+        else:
+            document = Document(value=parse(response['Body'].read()), etag=response['ETag'], checked=now)
+        self._store(cache_key, document)
+        return document.value
+
+    def put(self, bucket: str, key: str, body: bytes, value: Any = None, parse: Callable[[bytes], Any] = parse_json):
+        """Writes the object and drops its cached documents and responses, keeping `value` as the document of `parse`
+        if given."""
+        response = self.s3_client.put_object(Bucket=bucket, Key=key, Body=body)
+        self.invalidate(bucket, key)
+        if self.response_cache is not None:
+            self.response_cache.invalidate()
+        if value is not None and response.get('ETag'):
+            self._store((bucket, key, parse), Document(value=value, etag=response['ETag'], checked=time.monotonic()))
+
+    def invalidate(self, bucket: str, key: str):
+        with self._lock:
+            for cache_key in [cache_key for cache_key in self._entries if cache_key[:2] == (bucket, key)]:
+                del self._entries[cache_key]
+
+    def _store(self, cache_key, document: Document):
+        with self._lock:
+            self._entries[cache_key] = document
+            self._entries.move_to_end(cache_key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
@@ -0,0 +1,139 @@
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, asdict
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+from aws_lambda_powertools import Logger
+
+from chalicelib.services.payload import tour_from_order
+from chalicelib.services.solver import SolveResult, Progress, path_length
+
+logger = Logger()
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+@dataclass
+class Job:
+    id: str
+    n_cities: int
+    dimension: int
+    status: str = QUEUED
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    length: Optional[float] = None
+    improvements: int = 0
+    order: Optional[List[int]] = None
+    tour: Optional[List[float]] = None
+    error: Optional[str] = None
+
+    def elapsed(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.time()) - self.started_at
+
+    def to_dict(self) -> Dict:
+        return {**asdict(self), "elapsed": self.elapsed()}
+
+
+@dataclass
+class InMemoryJobStore:
+    max_jobs: int = 1000
+    _jobs: OrderedDict = field(default_factory=OrderedDict, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def save(self, job: Job):
+        with self._lock:
+            self._jobs[job.id] = Job(**asdict(job))
+            while len(self._jobs) > self.max_jobs:
+                self._jobs.popitem(last=False)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return Job(**asdict(job)) if job is not None else None
+
+
+@dataclass
+class FileJobStore:
+    path: str
+
+    def save(self, job: Job):
+        os.makedirs(self.path, exist_ok=True)
+        filename = os.path.join(self.path, f"{job.id}.json")
+        with open(filename + ".part", "w") as file_handle:
+            json.dump(asdict(job), file_handle)
+        os.replace(filename + ".part", filename)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        filename = os.path.join(self.path, f"{os.path.basename(job_id)}.json")
+        if not os.path.exists(filename):
+            return None
+        with open(filename) as file_handle:
+            return Job(**json.load(file_handle))
+
+
+def jobs_supported() -> bool:
+    """Jobs run on a thread of the process that accepted them, which a Lambda freezes once it has responded."""
+    return os.getenv("AWS_LAMBDA_FUNCTION_NAME") is None
+
+
+def create_job_store():
+    if os.getenv("SOLVE_JOBS_DIR"):
+        return FileJobStore(path=os.getenv("SOLVE_JOBS_DIR"))
+    return InMemoryJobStore()
+
+
+@dataclass
+class JobRunner:
+    store: object
+    max_workers: int = 2
+    _executor: Optional[ThreadPoolExecutor] = field(default=None, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def submit(self, cities: np.ndarray, solve: Callable[[np.ndarray, Progress], SolveResult]) -> Job:
+        job = Job(id=uuid.uuid4().hex, n_cities=len(cities), dimension=cities.shape[1])
+        self.store.save(job)
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="solve-job")
+        self._executor.submit(self._run, job, cities, solve)
+        return job
+
+    def _run(self, job: Job, cities: np.ndarray, solve: Callable[[np.ndarray, Progress], SolveResult]):
+        job.status = RUNNING
+        job.started_at = time.time()
+        self.store.save(job)
+        try:
+            result = solve(cities, lambda order: self._improve(job, cities, order))
+            self._improve(job, cities, result.order, status=DONE)
+        except Exception as error:
+            logger.exception(f"Solve job {job.id} failed.")
+            with self._lock:
+                job.status = FAILED
+                job.error = str(error)
+                job.finished_at = time.time()
+                self.store.save(job)
+
+    def _improve(self, job: Job, cities: np.ndarray, order: np.ndarray, status: Optional[str] = None):
+        length = path_length(cities, order)
+        with self._lock:
+            if job.length is None or length < job.length:
+                job.length = length
+                job.order = np.asarray(order).tolist()
+                job.tour = tour_from_order(cities, order)
+                job.improvements += 1
+            if status is not None:
+                job.status = status
+                job.finished_at = time.time()
+            self.store.save(job)
@@ -0,0 +1,144 @@
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Optional, Tuple
+
+from aws_lambda_powertools import Logger
+from aws_lambda_powertools.metrics import single_metric, MetricUnit
+from botocore.client import BaseClient
+from botocore.exceptions import BotoCoreError, ClientError, HTTPClientError, \
+    ConnectionError as BotoConnectionError
+
+logger = Logger()
+
+NAMESPACE = "MultiArmedBandit"
+API_MODE = "api"
+EMF_MODE = "emf"
+MODES = (API_MODE, EMF_MODE)
+MAX_DATUMS_PER_CALL = 1000
+MAX_METRIC_NAME_LENGTH = 255
+MAX_DIMENSION_VALUE_LENGTH = 1024
+THROTTLING_CODES = ("Throttling", "ThrottlingException", "RequestLimitExceeded")
+
+
+def is_transient(error: Exception) -> bool:
+    """Whether a failed PutMetricData call may succeed later, rather than being rejected for what it sent."""
+    if isinstance(error, (BotoConnectionError, HTTPClientError)):
+        return True
+    if isinstance(error, ClientError):
+        return error.response.get('Error', {}).get('Code') in THROTTLING_CODES or \
+            error.response.get('ResponseMetadata', {}).get('HTTPStatusCode', 0) >= 500
+    return False
+
+
+@dataclass
+class RewardMetrics:
+    """Counts bandit rewards per (state, retention bucket) in memory and publishes them in batches.
+
+    In `api` mode every flush is a PutMetricData call with one statistic set per pair, so SampleCount and Sum match
+    what one datum per reward used to produce. In `emf` mode the counts are written as Embedded Metric Format log
+    lines and CloudWatch extracts them from the logs, without any API call.
+
+    `client_factory` is only called on the first API flush, so checking whether a flush is due costs nothing. Rewards
+    are only kept in memory until then, so up to `max_pending` of them are lost when the container is recycled.
+    """
+    client_factory: Optional[Callable[[], BaseClient]] = None
+    stage: str = "dev"
+    mode: str = API_MODE
+    max_pending: int = 100
+    max_age: float = 60.0
+    _counts: Counter = field(default_factory=Counter, repr=False)
+    _oldest: Optional[float] = field(default=None, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def __post_init__(self):
+        if self.mode not in MODES:
+            raise ValueError(f"Unsupported metrics mode: {self.mode}")
+
+    def record(self, state: str, value):
+        """Counts one reward, raising ValueError for what CloudWatch would reject as a metric name or dimension."""
+        if not isinstance(state, str) or not 1 <= len(state) <= MAX_METRIC_NAME_LENGTH:
+            raise ValueError(f"The state must be a string of 1 to {MAX_METRIC_NAME_LENGTH} characters.")
+        if not 1 <= len(str(value)) <= MAX_DIMENSION_VALUE_LENGTH:
+            raise ValueError(f"The reward must be 1 to {MAX_DIMENSION_VALUE_LENGTH} characters long.")
+        with self._lock:
+            self._counts[(state, str(value))] += 1
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+
+    def due(self) -> bool:
+        with self._lock:
+            if not self._counts:
+                return False
+            return self.mode == EMF_MODE or sum(self._counts.values()) >= self.max_pending or \
+                time.monotonic() - self._oldest >= self.max_age
+
+    def flush_if_due(self):
+        if self.due():
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            counts, self._counts, self._oldest = self._counts, Counter(), None
+        if not counts:
+            return
+        if self.mode == EMF_MODE:
+            self._write_emf(counts)
+        else:
+            unsent = self._put_metric_data(counts)
+            if unsent:
+                with self._lock:
+                    self._counts.update(unsent)
+                    self._oldest = self._oldest or time.monotonic()
+                return
+        logger.info(f"Flushed {sum(counts.values())} rewards as {len(counts)} metrics.")
+
+    def _write_emf(self, counts: Dict[Tuple[str, str], int]):
+        for (state, bucket), count in counts.items():
+            with single_metric(name=state, unit=MetricUnit.Count, value=count, namespace=NAMESPACE) as metric:
+                metric.add_dimension(name="Stage", value=self.stage)
+                metric.add_dimension(name="RetentionLowerBound", value=bucket)
+
+    def _put_metric_data(self, counts: Dict[Tuple[str, str], int]) -> Counter:
+        """Publishes the counts and returns those to retry: the calls not made yet once one fails transiently.
+
+        Calls rejected for what they sent would fail every time, so their counts are logged and dropped.
+        """
+        items = list(counts.items())
+        cloudwatch_client = self.client_factory()
+        for start in range(0, len(items), MAX_DATUMS_PER_CALL):
+            chunk = items[start:start + MAX_DATUMS_PER_CALL]
+            try:
+                cloudwatch_client.put_metric_data(
+                    MetricData=[self._datum(state, bucket, count) for (state, bucket), count in chunk],
+                    Namespace=NAMESPACE)
+            except (BotoCoreError, ClientError) as error:
+                if is_transient(error):
+                    logger.exception("Could not publish rewards, keeping them for the next flush.")
+                    return Counter(dict(items[start:]))
+                logger.exception(f"Dropping {sum(count for _, count in chunk)} rewards that were rejected.",
+                                 extra={"data": {f"{state}/{bucket}": count for (state, bucket), count in chunk}})
+        return Counter()
+
+    def _datum(self, state: str, bucket: str, count: int) -> Dict:
+        return {
+            'MetricName': state,
+            'Dimensions': [
+                {
+                    'Name': 'Stage',
+                    'Value': self.stage
+                },
+                {
+                    'Name': 'RetentionLowerBound',
+                    'Value': bucket
+                },
+            ],
+            'Unit': 'Count',
+            'StatisticValues': {
+                'SampleCount': count,
+                'Sum': count,
+                'Minimum': 1,
+                'Maximum': 1
+            }
+        }
@@ -0,0 +1,122 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import List, Optional
+
+import numpy as np
+from aws_lambda_powertools import Logger
+
+from chalicelib.services.repair import local_two_opt, distances
+from chalicelib.services.solver import Solver, SolveResult, Progress, path_length
+
+logger = Logger()
+
+HILBERT_BITS = 16
+SEAM_RADIUS = 8
+SEAM_WINDOW = 64
+SEAM_PASSES = 10
+
+
+def hilbert_keys(cities: np.ndarray, bits: int = HILBERT_BITS) -> np.ndarray:
+    """Position of every city along a Hilbert curve through its bounding box (Skilling's transpose algorithm)."""
+    n_cities, dims = cities.shape
+    low = cities.min(axis=0)
+    span = max(float((cities.max(axis=0) - low).max()), np.finfo(float).tiny)
+    x = np.round((cities - low) / span * ((1 << bits) - 1)).astype(np.uint64)
+
+    q = 1 << (bits - 1)
+    while q > 1:
+        p = np.uint64(q - 1)
+        for i in range(dims):
+            flip = (x[:, i] & np.uint64(q)) != 0
+            x[flip, 0] ^= p
+            swap = ~flip
+            t = (x[swap, 0] ^ x[swap, i]) & p
+            x[swap, 0] ^= t
+            x[swap, i] ^= t
+        q >>= 1
+    for i in range(1, dims):
+        x[:, i] ^= x[:, i - 1]
+    t = np.zeros(n_cities, dtype=np.uint64)
+    q = 1 << (bits - 1)
+    while q > 1:
+        t[(x[:, dims - 1] & np.uint64(q)) != 0] ^= np.uint64(q - 1)
+        q >>= 1
+    x ^= t[:, np.newaxis]
+
+    keys = np.zeros(n_cities, dtype=np.uint64)
+    for bit in range(bits - 1, -1, -1):
+        for i in range(dims):
+            keys = (keys << np.uint64(1)) | ((x[:, i] >> np.uint64(bit)) & np.uint64(1))
+    return keys
+
+
+def partition(cities: np.ndarray, partition_size: int) -> List[np.ndarray]:
+    ordering = np.argsort(hilbert_keys(cities), kind="stable")
+    n_partitions = max(1, -(-len(cities) // partition_size))
+    return np.array_split(ordering, n_partitions)
+
+
+def open_cycle(cities: np.ndarray, cycle: np.ndarray, entry: np.ndarray, target: np.ndarray) -> np.ndarray:
+    """Cuts a solved cycle into the path that best connects `entry` to `target`, in either direction."""
+    following = np.roll(cycle, -1)
+    saved = distances(cities, cycle, following)
+    forward = np.linalg.norm(cities[following] - entry, axis=-1) + np.linalg.norm(cities[cycle] - target, axis=-1)
+    backward = np.linalg.norm(cities[cycle] - entry, axis=-1) + np.linalg.norm(cities[following] - target, axis=-1)
+    forward_cut, backward_cut = int(np.argmin(forward - saved)), int(np.argmin(backward - saved))
+    if forward[forward_cut] - saved[forward_cut] <= backward[backward_cut] - saved[backward_cut]:
+        return np.roll(cycle, -(forward_cut + 1))
+    return np.roll(cycle, -(backward_cut + 1))[::-1]
+
+
+def stitch(cities: np.ndarray, cycles: List[np.ndarray]) -> np.ndarray:
+    paths = []
+    entry = cities[cycles[-1]].mean(axis=0)
+    for k, cycle in enumerate(cycles):
+        target = cities[cycles[k + 1]].mean(axis=0) if k + 1 < len(cycles) else cities[paths[0][0]] if paths else entry
+        path = open_cycle(cities, cycle, entry, target)
+        paths.append(path)
+        entry = cities[path[-1]]
+    return np.concatenate(paths)
+
+
+@dataclass
+class PartitionSolver(Solver):
+    partition_solver: Solver
+    partition_size: int = 1000
+    max_workers: Optional[int] = None
+
+    def solve(self, cities: np.ndarray, progress: Optional[Progress] = None) -> np.ndarray:
+        return self.solve_result(cities, progress=progress).order
+
+    def solve_result(self, cities: np.ndarray, progress: Optional[Progress] = None) -> SolveResult:
+        timings = {}
+        start = time.perf_counter()
+        parts = partition(cities, self.partition_size)
+        timings["partition"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.max_workers or os.cpu_count() or 1) as executor:
+            orders = list(executor.map(lambda part: self.partition_solver.solve(cities[part]), parts))
+        cycles = [part[order] for part, order in zip(parts, orders)]
+        timings["solve"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        order = stitch(cities, cycles)
+        timings["stitch"] = time.perf_counter() - start
+        if progress is not None:
+            progress(order.copy())
+
+        start = time.perf_counter()
+        seams = np.cumsum([len(part) for part in parts])
+        positions = {(seam + offset) % len(order) for seam in seams for offset in range(-SEAM_RADIUS, SEAM_RADIUS)}
+        for _ in range(SEAM_PASSES):
+            if not local_two_opt(cities, order, positions, window=SEAM_WINDOW):
+                break
+        timings["repair"] = time.perf_counter() - start
+
+        logger.info(f"Solved {len(cities)} cities in {len(parts)} partitions.", extra={"data": timings})
+        order = np.roll(order, -int(np.argmin(order)))
+        return SolveResult(order=order, length=path_length(cities, order), runs=len(parts), completed=len(parts),
+                           timings=timings)
@@ -0,0 +1,58 @@
+import base64
+import binascii
+from typing import List, Optional, Union
+
+import numpy as np
+
+DTYPES = {
+    "float32": np.dtype("<f4"),
+    "float64": np.dtype("<f8"),
+}
+DIMENSIONS = (2, 3)
+COORDINATES = "coordinates"
+INDICES = "indices"
+
+
+def decode_cities(data: Union[bytes, str], dimension: int, dtype: str = "float64", count: Optional[int] = None,
+                  encoded: bool = False) -> np.ndarray:
+    """Reads a packed little-endian buffer of city coordinates as an (N, dimension) array without copying it."""
+    if dimension not in DIMENSIONS:
+        raise ValueError(f"Unsupported dimension: {dimension}")
+    if dtype not in DTYPES:
+        raise ValueError(f"Unsupported dtype: {dtype}")
+    if encoded:
+        try:
+            data = base64.b64decode(data, validate=True)
+        except (binascii.Error, ValueError):
+            raise ValueError("Body is not valid base64.")
+    item_size = DTYPES[dtype].itemsize * dimension
+    if len(data) % item_size:
+        raise ValueError(f"Body length {len(data)} is not a multiple of {item_size} bytes.")
+    cities = np.frombuffer(data, dtype=DTYPES[dtype]).reshape(-1, dimension)
+    if count is not None and count != len(cities):
+        raise ValueError(f"Expected {count} cities, got {len(cities)}.")
+    if not np.isfinite(cities).all():
+        raise ValueError("Coordinates must be finite.")
+    return cities
+
+
+def tour_from_order(cities: np.ndarray, order: np.ndarray) -> List[float]:
+    closed = np.append(order, order[:1])
+    return cities[closed].ravel().tolist()
+
+
+def encode_tour(cities: np.ndarray, order: np.ndarray, fmt: str = COORDINATES, delta: bool = False) -> bytes:
+    """Packs a tour as little-endian float32 coordinates of the closed tour or as int32 city indices.
+
+    With `delta` every entry after the first is stored as the difference to the previous one; indices round-trip
+    exactly, coordinates up to float32 rounding accumulated along the tour.
+    """
+    if fmt == COORDINATES:
+        values = cities[np.append(order, order[:1])].astype("<f4")
+    elif fmt == INDICES:
+        values = np.asarray(order, dtype="<i4")
+    else:
+        raise ValueError(f"Unsupported format: {fmt}")
+    if delta:
+        values = np.concatenate([values[:1], np.diff(values, axis=0)])
+    return values.tobytes()
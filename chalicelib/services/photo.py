@@ -1,22 +1,43 @@
 from collections import Counter
 from dataclasses import dataclass
 from aws_lambda_powertools import Logger
-from typing import List, Union
+from typing import List, Optional, Union
 
 from botocore.client import BaseClient
 
+from chalicelib.services.photo_counts import PhotoCounts
+from chalicelib.services.prefix_index import PrefixIndex
+from chalicelib.services.single_flight import SingleFlight
+
 logger = Logger()
 
 
 @dataclass
 class Photo:
     s3_resource: BaseClient
+    index: Optional[PrefixIndex] = None
+    counts: Optional[PhotoCounts] = None
+    single_flight: Optional[SingleFlight] = None
 
-    def get_photo_counts_by_date(self, prefix: str, bucket: str) -> List[List[Union[str, int]]]:
-        bucket_list = self.s3_resource.Bucket(bucket)
-        files = [file.key[len(prefix) + 1: len(prefix) + 11] for file in bucket_list.objects.filter(Prefix=prefix) if
-                 not file.key.endswith("/")]
+    def get_photo_counts_by_date(self, prefix: str, bucket: str, start: Optional[str] = None,
+                                 end: Optional[str] = None) -> List[List[Union[str, int]]]:
+        """Photos per `YYYY/MM/DD` day, optionally only between the `start` and `end` days inclusive."""
+        if self.single_flight is not None:
+            return self.single_flight.do(("photo_counts", prefix, bucket, start, end), self._count_by_date,
+                                         prefix, bucket, start, end)
+        return self._count_by_date(prefix, bucket, start, end)
 
+    def _count_by_date(self, prefix: str, bucket: str, start: Optional[str],
+                       end: Optional[str]) -> List[List[Union[str, int]]]:
         logger.info(f"Processing {bucket} bucket to count photos.")
+        if self.counts is not None:
+            counts = sorted(self.counts.counts(bucket, prefix).items())
+        else:
+            if self.index is not None:
+                keys = self.index.list_keys(bucket, prefix)
+            else:
+                keys = [file.key for file in self.s3_resource.Bucket(bucket).objects.filter(Prefix=prefix)]
+            counts = Counter(key[len(prefix) + 1: len(prefix) + 11] for key in keys if not key.endswith("/")).items()
 
-        return [[key, count] for key, count in Counter(files).items()]
+        return [[day, count] for day, count in counts
+                if (start is None or day >= start) and (end is None or day <= end)]
@@ -0,0 +1,142 @@
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+
+from aws_lambda_powertools import Logger
+from botocore.client import BaseClient
+from botocore.exceptions import BotoCoreError, ClientError
+
+from chalicelib.services.prefix_index import MANIFEST_PREFIX, USER_PREFIX, CREATED, WRITE_RETRIES, PrefixIndex, \
+    index_root, read_document, write_document, is_conflict, backoff
+
+logger = Logger()
+
+COUNTS_PREFIX = f"{MANIFEST_PREFIX}/counts"
+DATE_LENGTH = len("2023/01/23")
+
+
+def counts_key(prefix: str) -> str:
+    return f"{COUNTS_PREFIX}/{prefix.strip('/')}.json"
+
+
+def photo_date(prefix: str, key: str) -> str:
+    return key[len(prefix) + 1: len(prefix) + 1 + DATE_LENGTH]
+
+
+def count_by_day(prefix: str, keys: Iterable[str], counts: Optional[Dict[str, int]] = None) -> Dict[str, int]:
+    by_day = Counter(counts or {})
+    by_day.update(photo_date(prefix, key) for key in keys)
+    return dict(by_day)
+
+
+def is_current(document: Optional[Dict]) -> bool:
+    return document is not None and "counts" in document
+
+
+@dataclass
+class PhotoCounts:
+    """Per-day photo counts of a calendar prefix, persisted next to the manifests and caught up incrementally.
+
+    Keys are date ordered, so new photos are found by listing after the highest key counted so far. Photos uploaded
+    for earlier dates and deletions are applied by `apply_event`, and the counts are rebuilt once `max_age` old.
+    Only counts are kept: an event is counted only if it changed the prefix's manifest, and keys found by the
+    catch-up listing are added to the manifest first, so overwrites and late events change nothing.
+    """
+    s3_client: BaseClient
+    prefix_index: Optional[PrefixIndex] = None
+    max_workers: int = 8
+    max_age: float = 24 * 60 * 60
+
+    def list_keys(self, bucket: str, prefix: str, start_after: Optional[str] = None) -> List[str]:
+        paginator = self.s3_client.get_paginator("list_objects_v2")
+        options = {"StartAfter": start_after} if start_after else {}
+        return [obj["Key"] for page in paginator.paginate(Bucket=bucket, Prefix=prefix, **options)
+                for obj in page.get("Contents", []) if not obj["Key"].endswith("/")]
+
+    def build(self, bucket: str, prefix: str) -> Dict:
+        """Counts every photo, listing each year under `prefix` in parallel."""
+        paginator = self.s3_client.get_paginator("list_objects_v2")
+        shards, keys = [], []
+        for page in paginator.paginate(Bucket=bucket, Prefix=f"{prefix}/", Delimiter="/"):
+            shards.extend(common_prefix["Prefix"] for common_prefix in page.get("CommonPrefixes", []))
+            keys.extend(obj["Key"] for obj in page.get("Contents", []) if not obj["Key"].endswith("/"))
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for shard_keys in executor.map(lambda shard: self.list_keys(bucket, shard), shards):
+                keys.extend(shard_keys)
+        logger.info(f"Counted {len(keys)} photos under {prefix} in {len(shards)} shards.")
+        self.add_to_manifest(bucket, prefix, keys)
+        return {
+            "built": time.time(),
+            "high_water": max(keys, default=None),
+            "counts": count_by_day(prefix, keys),
+        }
+
+    def counts(self, bucket: str, prefix: str) -> Dict[str, int]:
+        document, etag = read_document(self.s3_client, bucket, counts_key(prefix))
+        if not is_current(document) or document["built"] + self.max_age < time.time():
+            document = self.build(bucket, prefix)
+        else:
+            keys = self.list_keys(bucket, f"{prefix}/", start_after=document["high_water"])
+            if not keys:
+                return document["counts"]
+            self.add_to_manifest(bucket, prefix, keys)
+            document.update(counts=count_by_day(prefix, keys, document["counts"]), high_water=keys[-1])
+        self.write(bucket, prefix, document, etag)
+        return document["counts"]
+
+    def add_to_manifest(self, bucket: str, prefix: str, keys: List[str]):
+        """Records counted keys in the manifest before the counts are written, so their late events are not counted
+        again."""
+        if self.prefix_index is not None and keys:
+            self.prefix_index.add_keys(bucket, f"{prefix}/", keys)
+
+    def write(self, bucket: str, prefix: str, document: Dict, etag: Optional[str]):
+        try:
+            write_document(self.s3_client, bucket, counts_key(prefix), document, etag=etag)
+        except ClientError as error:
+            if not is_conflict(error):
+                raise
+            logger.info(f"Photo counts of {prefix} were updated concurrently.")
+        except BotoCoreError:
+            # e.g. a botocore without conditional writes, the counts are still right for this read
+            logger.exception(f"Could not write the photo counts of {prefix}.")
+
+    def apply_event(self, bucket: str, key: str, event_name: str, changed: Optional[bool] = None):
+        """Applies photos uploaded for dates already counted past, and deletions, to the persisted counts.
+
+        `changed` is whether the event added or removed the key in the prefix's manifest. Events that did not are
+        overwrites or already counted, and when it is unknown the counts are rebuilt from a listing made after the
+        event. Missing counts are built the same way, with `If-None-Match`, so a concurrent build cannot hide it.
+        """
+        root = index_root(key)
+        if changed is False or root is None or not root.startswith(f"{USER_PREFIX}/") or key.endswith("/"):
+            return
+        prefix = root.rstrip("/")
+        for attempt in range(WRITE_RETRIES):
+            backoff(attempt)
+            document, etag = read_document(self.s3_client, bucket, counts_key(prefix))
+            if is_current(document) and (document["high_water"] is None or key > document["high_water"]):
+                # not counted yet, the next catch-up listing will see it (or not, if it was deleted)
+                return
+            if not is_current(document) or changed is None:
+                document = self.build(bucket, prefix)
+            else:
+                date = photo_date(prefix, key)
+                count = document["counts"].get(date, 0) + (1 if event_name.startswith(CREATED) else -1)
+                if count > 0:
+                    document["counts"][date] = count
+                else:
+                    document["counts"].pop(date, None)
+            try:
+                write_document(self.s3_client, bucket, counts_key(prefix), document, etag=etag)
+                return
+            except ClientError as error:
+                if not is_conflict(error):
+                    raise
+            except BotoCoreError:
+                logger.exception(f"Could not update the photo counts of {prefix}.")
+                break
+        logger.warning(f"Gave up updating the photo counts of {prefix}, dropping them so the next read rebuilds them.")
+        self.s3_client.delete_object(Bucket=bucket, Key=counts_key(prefix))
@@ -0,0 +1,87 @@
+import math
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+
+def from_moebius_coords(radius, s, theta) -> np.ndarray:
+    x = (radius + s * np.cos(theta / 2)) * np.cos(theta)
+    y = (radius + s * np.cos(theta / 2)) * np.sin(theta)
+    z = s * np.sin(theta / 2)
+    return np.stack([x, y, z], axis=-1)
+
+
+def from_sphere_coords(rho, theta, phi) -> np.ndarray:
+    x = rho * np.cos(theta) * np.sin(phi)
+    y = rho * np.sin(theta) * np.sin(phi)
+    z = rho * np.cos(phi)
+    return np.stack([x, y, z], axis=-1)
+
+
+def from_torus_coords(a, c, u, v) -> np.ndarray:
+    x = (c * a * np.cos(v)) * np.cos(u)
+    y = (c * a * np.cos(v)) * np.sin(u)
+    z = a * np.sin(u)
+    return np.stack([x, y, z], axis=-1)
+
+
+def from_trefoil_coords(u) -> np.ndarray:
+    x = np.sin(u) + 2.0 * np.sin(2.0 * u)
+    y = np.cos(u) - 2.0 * np.cos(2.0 * u)
+    z = - np.sin(3.0 * u)
+    return np.stack([x, y, z], axis=-1)
+
+
+def from_helix_coords(u, v) -> np.ndarray:
+    x = v * np.cos(u)
+    y = v * np.sin(u)
+    z = u
+    return np.stack([x, y, z], axis=-1)
+
+
+def random_moebius(n_cities: int, rng: np.random.Generator) -> np.ndarray:
+    s = rng.random(n_cities) * 2 - 1
+    theta = rng.random(n_cities) * math.pi * 2
+    return from_moebius_coords(2.0, s, theta)
+
+
+def random_sphere(n_cities: int, rng: np.random.Generator) -> np.ndarray:
+    theta = rng.random(n_cities) * math.pi * 2
+    phi = rng.random(n_cities) * math.pi
+    return from_sphere_coords(1.0, theta, phi)
+
+
+def random_torus(n_cities: int, rng: np.random.Generator) -> np.ndarray:
+    v = rng.random(n_cities) * math.pi * 2
+    u = rng.random(n_cities) * math.pi * 2
+    return from_torus_coords(2.0, 1.0, u, v)
+
+
+def random_trefoil(n_cities: int, rng: np.random.Generator) -> np.ndarray:
+    return from_trefoil_coords(rng.random(n_cities) * math.pi * 2)
+
+
+def random_helix(n_cities: int, rng: np.random.Generator) -> np.ndarray:
+    return from_helix_coords(rng.random(n_cities) * math.pi * 2, 2.0)
+
+
+def random_plane(n_cities: int, rng: np.random.Generator) -> np.ndarray:
+    cities = np.zeros((n_cities, 3))
+    cities[:, :2] = rng.random((n_cities, 2)) * 2 - 1
+    return cities
+
+
+POINT_SETS: Dict[str, Callable[[int, np.random.Generator], np.ndarray]] = {
+    "moebius": random_moebius,
+    "sphere": random_sphere,
+    "torus": random_torus,
+    "tree_foil": random_trefoil,
+    "helix": random_helix,
+    "plane": random_plane,
+}
+
+
+def generate_point_set(point_set: str, n_cities: int, seed: Optional[int] = None) -> np.ndarray:
+    if point_set not in POINT_SETS:
+        raise ValueError(f"Unknown point set: {point_set}")
+    return POINT_SETS[point_set](n_cities, np.random.default_rng(seed))
@@ -0,0 +1,97 @@
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from chalicelib.services.bandit import RunningStatistics
+
+EPSILON_GREEDY = "epsilon_greedy"
+UCB1 = "ucb1"
+THOMPSON = "thompson"
+EPSILON = 0.15
+
+
+@dataclass
+class ArmStatistics:
+    means: np.ndarray
+    counts: np.ndarray
+    variances: np.ndarray
+
+    @classmethod
+    def from_lookup(cls, online: Sequence[Optional[RunningStatistics]], prior: Sequence[Optional[float]]):
+        """Online statistics where a state has rewards, else its batch score as a single pseudo-reward."""
+        n_states = len(online)
+        means, counts, variances = np.zeros(n_states), np.zeros(n_states), np.zeros(n_states)
+        for i, (statistics, score) in enumerate(zip(online, prior)):
+            if statistics is not None and statistics.count > 0:
+                means[i], counts[i], variances[i] = statistics.mean, statistics.count, statistics.variance
+            elif score is not None:
+                means[i], counts[i] = score, 1
+        return cls(means=means, counts=counts, variances=variances)
+
+    def pooled_variance(self) -> float:
+        """Variance of all rewards pooled together, from the per-state moments."""
+        total = self.counts.sum()
+        if total <= 0:
+            return 1.0
+        mean = (self.means * self.counts).sum() / total
+        pooled = ((self.variances + (self.means - mean) ** 2) * self.counts).sum() / total
+        return max(float(pooled), np.finfo(float).eps)
+
+
+def by_descending(keys: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    # the random secondary key breaks ties in any order
+    return np.lexsort((rng.random(len(keys)), -keys))
+
+
+def epsilon_greedy(statistics: ArmStatistics, rng: np.random.Generator, epsilon: float = EPSILON) -> np.ndarray:
+    """Every slot is explored with probability `epsilon`: a uniformly drawn state fills it, the rest by mean."""
+    n_states = len(statistics.means)
+    explore = rng.random(n_states) < epsilon
+    explored = rng.permutation(n_states)[:int(explore.sum())]
+    taken = np.zeros(n_states, dtype=bool)
+    taken[explored] = True
+    exploited = by_descending(statistics.means, rng)
+    exploited = exploited[~taken[exploited]]
+    order = np.empty(n_states, dtype=np.int64)
+    order[explore] = explored
+    order[~explore] = exploited
+    return order
+
+
+def ucb1(statistics: ArmStatistics, rng: np.random.Generator) -> np.ndarray:
+    """Orders by mean plus the UCB1 bonus, scaled by the reward spread since rewards are not in [0, 1]."""
+    total = max(float(statistics.counts.sum()), 1.0)
+    # unseen states divide by zero, and by zero again when no state has been seen yet; they are ranked first below
+    with np.errstate(divide="ignore", invalid="ignore"):
+        bonus = np.sqrt(2 * np.log(total) / statistics.counts)
+    keys = statistics.means + np.sqrt(statistics.pooled_variance()) * bonus
+    keys[statistics.counts == 0] = np.inf
+    return by_descending(keys, rng)
+
+
+def thompson(statistics: ArmStatistics, rng: np.random.Generator) -> np.ndarray:
+    """Orders by a draw from each state's normal posterior of its mean; unseen states draw from all of them."""
+    pooled = statistics.pooled_variance()
+    seen = statistics.counts > 0
+    variances = np.where(statistics.counts > 1, statistics.variances, pooled)
+    scales = np.sqrt(variances / np.maximum(statistics.counts, 1))
+    centers = statistics.means.copy()
+    if not seen.all():
+        total = statistics.counts.sum()
+        centers[~seen] = (statistics.means * statistics.counts).sum() / total if total > 0 else 0.0
+        scales[~seen] = np.sqrt(pooled)
+    return by_descending(rng.normal(centers, scales), rng)
+
+
+POLICIES: Dict[str, Callable[[ArmStatistics, np.random.Generator], np.ndarray]] = {
+    EPSILON_GREEDY: epsilon_greedy,
+    UCB1: ucb1,
+    THOMPSON: thompson,
+}
+
+
+def order_states(policy: str, statistics: ArmStatistics, rng: Optional[np.random.Generator] = None) -> List[int]:
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown policy '{policy}', expected one of {', '.join(POLICIES)}.")
+    return POLICIES[policy](statistics, rng or np.random.default_rng()).tolist()
@@ -0,0 +1,188 @@
+import base64
+import binascii
+import bisect
+import json
+import random
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from aws_lambda_powertools import Logger
+from botocore.client import BaseClient
+from botocore.exceptions import BotoCoreError, ClientError
+
+from chalicelib.services.single_flight import SingleFlight
+
+logger = Logger()
+
+MANIFEST_PREFIX = "_index"
+INDEXED_PREFIXES = ("photography", "colors", "blog")
+USER_PREFIX = "calendar"
+CREATED = "ObjectCreated"
+REMOVED = "ObjectRemoved"
+WRITE_RETRIES = 3
+WRITE_BACKOFF = 0.05
+
+
+def index_root(prefix: str) -> Optional[str]:
+    """Top-level indexed prefix a key or listing prefix belongs to, e.g. `calendar/ana/` for `calendar/ana/2023`."""
+    url_structure = prefix.split("/")
+    if url_structure[0] in INDEXED_PREFIXES:
+        return f"{url_structure[0]}/"
+    if url_structure[0] == USER_PREFIX and len(url_structure) > 1 and url_structure[1]:
+        return f"{USER_PREFIX}/{url_structure[1]}/"
+    return None
+
+
+def manifest_key(root: str) -> str:
+    return f"{MANIFEST_PREFIX}/{root.rstrip('/')}.json"
+
+
+def encode_cursor(key: str) -> str:
+    return base64.urlsafe_b64encode(key.encode('utf-8')).decode('ascii').rstrip("=")
+
+
+def decode_cursor(token: str) -> str:
+    try:
+        return base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode('utf-8')
+    except (binascii.Error, ValueError):
+        raise ValueError("Invalid continuation token.")
+
+
+def error_code(error: ClientError) -> str:
+    return error.response.get('Error', {}).get('Code')
+
+
+def read_document(s3_client: BaseClient, bucket: str, key: str) -> Tuple[Optional[Dict], Optional[str]]:
+    """Reads a JSON document and its ETag, or (None, None) if it does not exist."""
+    try:
+        response = s3_client.get_object(Bucket=bucket, Key=key)
+    except ClientError as error:
+        if error_code(error) in ("NoSuchKey", "404"):
+            return None, None
+        raise
+    return json.loads(response['Body'].read().decode('utf-8')), response.get('ETag')
+
+
+def write_document(s3_client: BaseClient, bucket: str, key: str, document: Dict, etag: Optional[str] = None):
+    """Writes a JSON document, failing with PreconditionFailed if someone else wrote it since `etag` was read."""
+    condition = {"IfMatch": etag} if etag else {"IfNoneMatch": "*"}
+    s3_client.put_object(Bucket=bucket, Key=key, Body=json.dumps(document, separators=(",", ":")).encode('utf-8'),
+                         ContentType="application/json", **condition)
+
+
+def is_conflict(error: ClientError) -> bool:
+    return error_code(error) in ("PreconditionFailed", "ConditionalRequestConflict")
+
+
+def backoff(attempt: int):
+    """Sleeps a random fraction of an exponentially growing delay, so writers that conflicted do not meet again."""
+    if attempt:
+        time.sleep(random.uniform(0, WRITE_BACKOFF * 2 ** attempt))
+
+
+@dataclass
+class PrefixIndex:
+    """Keeps one manifest of the keys under each indexed prefix, so listing a prefix costs a single GET."""
+    s3_client: BaseClient
+    max_age: float = 24 * 60 * 60
+    single_flight: Optional[SingleFlight] = None
+
+    def read_manifest(self, bucket: str, root: str) -> Tuple[Optional[Dict], Optional[str]]:
+        return read_document(self.s3_client, bucket, manifest_key(root))
+
+    def write_manifest(self, bucket: str, root: str, keys: Iterable[str], built: float, etag: Optional[str] = None):
+        write_document(self.s3_client, bucket, manifest_key(root),
+                       {"root": root, "built": built, "keys": sorted(key[len(root):] for key in keys)}, etag=etag)
+
+    def live_keys(self, bucket: str, prefix: str) -> List[str]:
+        paginator = self.s3_client.get_paginator("list_objects_v2")
+        return [obj["Key"] for page in paginator.paginate(Bucket=bucket, Prefix=prefix)
+                for obj in page.get("Contents", []) if not obj["Key"].endswith("/")]
+
+    def rebuild(self, bucket: str, root: str, etag: Optional[str] = None) -> List[str]:
+        keys = self.live_keys(bucket, root)
+        try:
+            self.write_manifest(bucket, root, keys, built=time.time(), etag=etag)
+        except ClientError as error:
+            # another container rebuilt or updated it in the meantime, which is just as good
+            logger.warning(f"Could not write the {root} manifest: {error_code(error)}")
+        except BotoCoreError:
+            # e.g. a botocore without conditional writes, the listing still works without a manifest
+            logger.exception(f"Could not write the {root} manifest.")
+        logger.info(f"Rebuilt the {root} manifest with {len(keys)} keys.")
+        return keys
+
+    def list_keys(self, bucket: str, prefix: str) -> List[str]:
+        """Keys under `prefix` from its manifest, falling back to a live listing when it is missing or stale."""
+        if self.single_flight is not None:
+            return self.single_flight.do(("list_keys", bucket, prefix), self._list_keys, bucket, prefix)
+        return self._list_keys(bucket, prefix)
+
+    def _list_keys(self, bucket: str, prefix: str) -> List[str]:
+        root = index_root(prefix)
+        if root is None:
+            return self.live_keys(bucket, prefix)
+        manifest, etag = self.read_manifest(bucket, root)
+        if manifest is None or manifest.get("built", 0) + self.max_age < time.time():
+            keys = self.rebuild(bucket, root, etag=etag)
+        else:
+            keys = [root + key for key in manifest["keys"]]
+        return [key for key in keys if key.startswith(prefix)]
+
+    def list_page(self, bucket: str, prefix: str, limit: Optional[int] = None,
+                  start_after: Optional[str] = None) -> Tuple[List[str], Optional[str]]:
+        """At most `limit` keys after `start_after`, and the key to continue after when there are more."""
+        keys = self.list_keys(bucket, prefix)
+        start = bisect.bisect_right(keys, start_after) if start_after else 0
+        end = len(keys) if limit is None else start + limit
+        return keys[start:end], keys[end - 1] if end < len(keys) else None
+
+    def apply_event(self, bucket: str, key: str, event_name: str) -> Optional[bool]:
+        """Adds or removes one key from its manifest, building the manifest from a live listing if it is missing.
+
+        A missing manifest is created with `If-None-Match`, so when a rebuild that listed before the event wins the
+        race, the event is applied to the winner's manifest on the next attempt instead of being lost. Returns
+        whether the key was added or removed, or None when that is unknown because the manifest had to be built or
+        could not be written.
+        """
+        root = index_root(key)
+        if root is None or key.endswith("/") or not event_name.startswith((CREATED, REMOVED)):
+            return False
+        if event_name.startswith(CREATED):
+            return self._update(bucket, root, added=[key])
+        return self._update(bucket, root, removed=[key])
+
+    def add_keys(self, bucket: str, root: str, keys: Iterable[str]) -> Optional[bool]:
+        """Adds keys found by another listing to an existing manifest, so their late events change nothing."""
+        return self._update(bucket, root, added=keys, build=False)
+
+    def _update(self, bucket: str, root: str, added: Iterable[str] = (), removed: Iterable[str] = (),
+                build: bool = True) -> Optional[bool]:
+        added, removed = set(added), set(removed)
+        for attempt in range(WRITE_RETRIES):
+            backoff(attempt)
+            manifest, etag = self.read_manifest(bucket, root)
+            if manifest is None and not build:
+                return None
+            if manifest is None:
+                # listed after the change, so the listing already reflects it
+                keys, built, changed = set(self.live_keys(bucket, root)), time.time(), None
+            else:
+                before = {root + suffix for suffix in manifest["keys"]}
+                keys, built = (before | added) - removed, manifest["built"]
+                changed = keys != before
+                if not changed:
+                    return False
+            try:
+                self.write_manifest(bucket, root, keys, built=built, etag=etag)
+                return changed
+            except ClientError as error:
+                if not is_conflict(error):
+                    raise
+            except BotoCoreError:
+                logger.exception(f"Could not update the {root} manifest.")
+                break
+        logger.warning(f"Gave up updating the {root} manifest, dropping it so the next read rebuilds it.")
+        self.s3_client.delete_object(Bucket=bucket, Key=manifest_key(root))
+        return None
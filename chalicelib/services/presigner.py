@@ -0,0 +1,74 @@
+import hashlib
+import hmac
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote, urlsplit
+
+from botocore.client import BaseClient
+
+ALGORITHM = "AWS4-HMAC-SHA256"
+SERVICE = "s3"
+UNSIGNED_PAYLOAD = "UNSIGNED-PAYLOAD"
+PROBE_KEY = "probe"
+
+
+def encode(value: str, safe: str = "-_.~") -> str:
+    return quote(value, safe=safe)
+
+
+@lru_cache(maxsize=16)
+def signing_key(secret_key: str, date: str, region: str) -> bytes:
+    """The SigV4 key derived for a day and region, which every URL signed that day shares."""
+    key = ("AWS4" + secret_key).encode("utf-8")
+    for part in (date, region, SERVICE, "aws4_request"):
+        key = hmac.new(key, part.encode("utf-8"), hashlib.sha256).digest()
+    return key
+
+
+@dataclass
+class BatchPresigner:
+    """Presigns GET URLs for many keys with SigV4, producing what an `s3v4` botocore client would.
+
+    botocore is asked once per bucket for a URL, from which the endpoint and addressing style are reused, so
+    each further URL costs one SHA-256 and one HMAC.
+    """
+    s3_client: BaseClient
+    _endpoints: Dict[str, Tuple[str, str, str]] = field(default_factory=dict, repr=False)
+
+    def endpoint(self, bucket: str) -> Tuple[str, str, str]:
+        """Scheme, host and the path preceding the key of the bucket's URLs."""
+        if bucket not in self._endpoints:
+            url = urlsplit(self.s3_client.generate_presigned_url(
+                'get_object', Params={'Bucket': bucket, 'Key': PROBE_KEY}, ExpiresIn=1))
+            self._endpoints[bucket] = (url.scheme, url.netloc, url.path[:-len(PROBE_KEY)])
+        return self._endpoints[bucket]
+
+    def presign(self, bucket: str, keys: List[str], expires_in: int = 3600,
+                now: Optional[datetime] = None) -> List[str]:
+        scheme, host, path_prefix = self.endpoint(bucket)
+        # botocore has no public accessor for a client's credentials
+        credentials = self.s3_client._request_signer._credentials.get_frozen_credentials()
+        region = self.s3_client.meta.region_name
+        now = now or datetime.now(timezone.utc)
+        amz_date, date = now.strftime("%Y%m%dT%H%M%SZ"), now.strftime("%Y%m%d")
+        scope = f"{date}/{region}/{SERVICE}/aws4_request"
+        key = signing_key(credentials.secret_key, date, region)
+
+        query = (f"X-Amz-Algorithm={ALGORITHM}&X-Amz-Credential={encode(f'{credentials.access_key}/{scope}')}"
+                 f"&X-Amz-Date={amz_date}&X-Amz-Expires={expires_in}&X-Amz-SignedHeaders=host")
+        token = "" if credentials.token is None else f"&X-Amz-Security-Token={encode(credentials.token)}"
+        # the canonical query string sorts the token before X-Amz-SignedHeaders, the URL puts it after
+        canonical_query = query.replace("&X-Amz-SignedHeaders", token + "&X-Amz-SignedHeaders")
+        string_to_sign_prefix = f"{ALGORITHM}\n{amz_date}\n{scope}\n"
+        canonical_suffix = f"\n{canonical_query}\nhost:{host}\n\nhost\n{UNSIGNED_PAYLOAD}"
+
+        urls = []
+        for object_key in keys:
+            path = path_prefix + encode(object_key, safe="/~")
+            canonical_request = f"GET\n{path}{canonical_suffix}"
+            string_to_sign = string_to_sign_prefix + hashlib.sha256(canonical_request.encode("utf-8")).hexdigest()
+            signature = hmac.new(key, string_to_sign.encode("utf-8"), hashlib.sha256).hexdigest()
+            urls.append(f"{scheme}://{host}{path}?{query}{token}&X-Amz-Signature={signature}")
+        return urls
@@ -0,0 +1,110 @@
+import math
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+import numpy as np
+
+from chalicelib.services.solver import SolveResult, path_length, EPSILON
+
+MAX_EDIT_RATIO = 0.25
+QUALITY_TOLERANCE = 0.05
+REPAIR_RADIUS = 3
+
+
+@dataclass
+class Repair:
+    cities: np.ndarray
+    result: Optional[SolveResult]
+
+
+def distances(cities: np.ndarray, a, b) -> np.ndarray:
+    return np.linalg.norm(cities[a] - cities[b], axis=-1)
+
+
+def remove_cities(cities: np.ndarray, order: np.ndarray, removed: Iterable[int]):
+    """Drops `removed` cities, splicing their tour neighbours together, and renumbers the remaining ones.
+
+    Also returns the renumbered cities that now precede a splice.
+    """
+    keep = np.ones(len(cities), dtype=bool)
+    keep[list(removed)] = False
+    renumber = np.cumsum(keep) - 1
+    kept = order[keep[order]]
+    spliced = kept[~keep[np.roll(order, -1)][keep[order]]]
+    return cities[keep], renumber[kept], renumber[spliced]
+
+
+def insert_cities(cities: np.ndarray, order: np.ndarray, inserted: np.ndarray):
+    """Appends `inserted` cities and places each one on its cheapest tour edge."""
+    first = len(cities)
+    cities = np.concatenate([cities, inserted])
+    for city in range(first, len(cities)):
+        following = np.roll(order, -1)
+        costs = distances(cities, order, city) + distances(cities, city, following) - distances(cities, order, following)
+        at = int(np.argmin(costs)) + 1
+        order = np.insert(order, at, city)
+    return cities, order
+
+
+def edit_cities(cities: np.ndarray, inserted: np.ndarray, removed: Iterable[int]) -> np.ndarray:
+    keep = np.ones(len(cities), dtype=bool)
+    keep[list(removed)] = False
+    return np.concatenate([cities[keep], inserted])
+
+
+def local_two_opt(cities: np.ndarray, order: np.ndarray, positions: Iterable[int],
+                  window: Optional[int] = None) -> bool:
+    """2-opt restricted to edges starting at `positions`, with distances computed on the fly instead of a matrix.
+
+    `window` additionally limits the second edge to the next `window` edges along the tour.
+    """
+    n_cities = len(order)
+    improved = False
+    for i in sorted(set(positions)):
+        if i < 0 or i > n_cities - 3:
+            continue
+        end = n_cities if window is None else min(n_cities, i + 2 + window)
+        a, b = order[i], order[i + 1]
+        c = order[i + 2:end]
+        d = order[i + 3:end + 1] if end < n_cities else np.append(order[i + 3:], order[0])
+        gains = distances(cities, a, b) + distances(cities, c, d) - distances(cities, a, c) - distances(cities, b, d)
+        if i == 0 and end == n_cities:
+            gains[-1] = 0
+        j = int(np.argmax(gains))
+        if gains[j] > EPSILON:
+            j += i + 2
+            order[i + 1:j + 1] = order[i + 1:j + 1][::-1]
+            improved = True
+    return improved
+
+
+def repair_tour(cities: np.ndarray, order: np.ndarray, inserted: np.ndarray, removed: Iterable[int],
+                max_edit_ratio: float = MAX_EDIT_RATIO, tolerance: float = QUALITY_TOLERANCE) -> Repair:
+    """Applies a diff of inserted and removed cities to a solved tour.
+
+    `result` is None when the edit is too large or the repaired tour is longer than the previous one scaled by
+    sqrt(n_new / n_old) beyond `tolerance`, in which case the caller should re-solve `cities` from scratch.
+    """
+    removed = sorted(set(int(city) for city in removed))
+    previous_length = path_length(cities, order)
+    n_previous = len(cities)
+    cities, order, spliced = remove_cities(cities, order, removed)
+    cities, order = insert_cities(cities, order, inserted)
+    if len(removed) + len(inserted) > max_edit_ratio * n_previous or len(cities) < 4:
+        return Repair(cities=cities, result=None)
+
+    touched = set(range(n_previous - len(removed), len(cities))) | set(spliced.tolist())
+    for _ in range(REPAIR_RADIUS):
+        where = np.flatnonzero(np.isin(order, list(touched)))
+        positions = {(position + offset) % len(order) for position in where
+                     for offset in range(-REPAIR_RADIUS, REPAIR_RADIUS + 1)}
+        if not local_two_opt(cities, order, positions):
+            break
+        touched.update(order[sorted(positions)].tolist())
+
+    length = path_length(cities, order)
+    expected = previous_length * math.sqrt(len(cities) / n_previous)
+    if length > expected * (1 + tolerance):
+        return Repair(cities=cities, result=None)
+    order = np.roll(order, -int(np.argmin(order)))
+    return Repair(cities=cities, result=SolveResult(order=order, length=length, runs=0, completed=0))
@@ -0,0 +1,121 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Hashable, Iterable, Optional, Tuple
+from urllib.parse import urlsplit, parse_qs
+
+from aws_lambda_powertools import Logger
+
+logger = Logger()
+
+AMZ_DATE_FORMAT = "%Y%m%dT%H%M%SZ"
+
+
+def presign_expiry(url: str) -> Optional[Tuple[Optional[float], float]]:
+    """Returns when a presigned URL was signed, if known, and when it stops working, as epoch seconds."""
+    if "?" not in url:
+        return None
+    query = parse_qs(urlsplit(url).query)
+    try:
+        if "X-Amz-Expires" in query:
+            signed = datetime.strptime(query["X-Amz-Date"][0], AMZ_DATE_FORMAT).replace(tzinfo=timezone.utc)
+            return signed.timestamp(), signed.timestamp() + int(query["X-Amz-Expires"][0])
+        if "Expires" in query and "Signature" in query:
+            return None, float(query["Expires"][0])
+    except (KeyError, ValueError):
+        logger.warning("Could not read the expiry of a presigned URL.")
+    return None
+
+
+def strings(value: Any) -> Iterable[str]:
+    if isinstance(value, str):
+        yield value
+    elif isinstance(value, dict):
+        for item in value.values():
+            yield from strings(item)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            yield from strings(item)
+
+
+def fresh_until(body: Any, now: float, ttl: float, freshness: float) -> float:
+    """Expiry of a cached body: `ttl` from now, or earlier if it embeds presigned URLs.
+
+    A URL is only served for the first `freshness` share of its lifetime so clients still have time to use it.
+    """
+    until = now + ttl
+    for value in strings(body):
+        expiry = presign_expiry(value)
+        if expiry is None:
+            continue
+        signed, expires = expiry
+        lifetime = expires - (now if signed is None else signed)
+        until = min(until, expires - (1 - freshness) * lifetime)
+    return until
+
+
+@dataclass
+class CacheEntry:
+    value: Any
+    route: str
+    expires: float
+
+
+@dataclass
+class ResponseCache:
+    """Rendered responses of the cached routes, kept in this container's memory until their TTL.
+
+    Writes made through this API, such as `PUT /names`, clear it. Changes made straight to the bucket are only seen
+    once entries expire: the S3 event handler runs as a separate function and cannot reach this cache.
+    """
+    maxsize: int = 128
+    ttl: float = 300.0
+    freshness: float = 0.75
+    _entries: OrderedDict = field(default_factory=OrderedDict, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+    _hits: int = field(default=0, repr=False)
+    _misses: int = field(default=0, repr=False)
+    _stale: int = field(default=0, repr=False)
+    _evictions: int = field(default=0, repr=False)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            if entry.expires <= time.time():
+                del self._entries[key]
+                self._stale += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry.value
+
+    def put(self, key: Hashable, value: Any, route: str, body: Any = None):
+        now = time.time()
+        expires = fresh_until(value if body is None else body, now, self.ttl, self.freshness)
+        if expires <= now:
+            return
+        with self._lock:
+            self._entries[key] = CacheEntry(value=value, route=route, expires=expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def invalidate(self, *routes: str):
+        """Drops the cached responses of `routes`, or every cached response when none are given."""
+        with self._lock:
+            if not routes:
+                self._entries.clear()
+                return
+            for key in [key for key, entry in self._entries.items() if entry.route in routes]:
+                del self._entries[key]
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self._hits, "misses": self._misses, "stale": self._stale, "evictions": self._evictions,
+                    "size": len(self._entries)}
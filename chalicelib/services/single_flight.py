@@ -0,0 +1,67 @@
+import math
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from aws_lambda_powertools import Logger
+
+logger = Logger()
+
+
+class SingleFlightTimeout(TimeoutError):
+    pass
+
+
+@dataclass
+class Flight:
+    done: threading.Event = field(default_factory=threading.Event)
+    result: Any = None
+    error: Optional[BaseException] = None
+    followers: int = 0
+
+
+@dataclass
+class SingleFlight:
+    """Runs one call per key at a time: callers arriving while it is in flight wait for it and share its outcome.
+
+    Nothing is kept once the call returns, so later callers run it again. Results are shared between callers and
+    must not be mutated. A follower that waits longer than `timeout` raises `SingleFlightTimeout`, while the call
+    itself carries on for the others. A `timeout` of `math.inf` waits for as long as the call runs.
+    """
+    timeout: float = 60.0
+    _flights: Dict[Hashable, Flight] = field(default_factory=dict, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def do(self, key: Hashable, function: Callable[..., Any], *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = Flight()
+            else:
+                flight.followers += 1
+
+        if not leader:
+            wait = self.timeout if timeout is None else timeout
+            if not flight.done.wait(None if math.isinf(wait) else wait):
+                raise SingleFlightTimeout(f"Timed out waiting for {key}.")
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = function(*args, **kwargs)
+            return flight.result
+        except BaseException as error:
+            flight.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            if flight.followers:
+                logger.info(f"Shared {key} with {flight.followers} callers.")
+            flight.done.set()
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._flights)
@@ -0,0 +1,300 @@
+import os
+import random
+import subprocess
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional
+
+import numpy as np
+from aws_lambda_powertools import Logger
+
+logger = Logger()
+
+LINKERN = "./chalicelib/linkern"
+LINKERN_BACKEND = "linkern"
+NUMPY_BACKEND = "numpy"
+MULTISTART_BACKEND = "multistart"
+LARGE_BACKEND = "large"
+BACKENDS = (LINKERN_BACKEND, NUMPY_BACKEND, MULTISTART_BACKEND, LARGE_BACKEND)
+NUMPY_SOLVER_MAX_CITIES = int(os.getenv("NUMPY_SOLVER_MAX_CITIES", 200))
+LINKERN_MAX_CITIES = int(os.getenv("LINKERN_MAX_CITIES", 5000))
+EPSILON = 1e-9
+SNAPSHOT_INTERVAL = 0.5
+
+Progress = Callable[[np.ndarray], None]
+
+
+def execute(cmd):
+    logger.info(" ".join(cmd))
+    popen = subprocess.Popen(cmd, stdout=subprocess.PIPE, universal_newlines=True)
+    for stdout_line in iter(popen.stdout.readline, ""):
+        yield stdout_line
+    popen.stdout.close()
+    return_code = popen.wait()
+    if return_code:
+        raise subprocess.CalledProcessError(return_code, cmd)
+
+
+def write_instance(file_handle, cities: np.ndarray):
+    file_handle.write("%d\n" % len(cities))
+    np.savetxt(file_handle, cities, fmt="%.17g")
+    file_handle.write("EOF\n")
+
+
+def read_tour(tour_file) -> np.ndarray:
+    # the first row holds the node and edge counts, every other row is an edge "from to length"
+    return np.loadtxt(tour_file, skiprows=1, usecols=0, dtype=np.int64, ndmin=1)
+
+
+def read_cycle(cycle_file) -> Optional[np.ndarray]:
+    # linkern -S snapshots hold the node count followed by the visiting order, ten nodes per line
+    with open(cycle_file) as file_handle:
+        values = np.array(file_handle.read().split(), dtype=np.int64)
+    if len(values) == 0 or len(values) != values[0] + 1:
+        return None
+    return values[1:]
+
+
+def watch_snapshots(snapshot_file: str, progress: Progress, stop: threading.Event):
+    last_modified = None
+    while not stop.wait(SNAPSHOT_INTERVAL):
+        try:
+            modified = os.stat(snapshot_file).st_mtime_ns
+            if modified != last_modified:
+                order = read_cycle(snapshot_file)
+                if order is not None:
+                    last_modified = modified
+                    progress(order)
+        except (OSError, ValueError):
+            continue
+
+
+def distance_matrix(cities: np.ndarray) -> np.ndarray:
+    deltas = cities[:, np.newaxis, :] - cities[np.newaxis, :, :]
+    return np.sqrt((deltas ** 2).sum(axis=-1))
+
+
+def tour_length(dist: np.ndarray, order: np.ndarray) -> float:
+    return float(dist[order, np.roll(order, -1)].sum())
+
+
+def path_length(cities: np.ndarray, order: np.ndarray) -> float:
+    closed = cities[np.append(order, order[:1])]
+    return float(np.linalg.norm(np.diff(closed, axis=0), axis=1).sum())
+
+
+@dataclass
+class SolveResult:
+    order: np.ndarray
+    length: float
+    runs: int = 1
+    completed: int = 1
+    cached: bool = False
+    key: Optional[str] = None
+    timings: Optional[Dict[str, float]] = None
+
+
+class Solver(ABC):
+
+    @abstractmethod
+    def solve(self, cities: np.ndarray, progress: Optional[Progress] = None) -> np.ndarray:
+        """Returns the visiting order of the (N, dim) cities as an array of indices.
+
+        `progress`, when given, is called with intermediate orders as the solver improves them.
+        """
+
+    def solve_result(self, cities: np.ndarray, progress: Optional[Progress] = None) -> SolveResult:
+        order = self.solve(cities, progress=progress)
+        return SolveResult(order=order, length=path_length(cities, order))
+
+
+@dataclass
+class LinkernSolver(Solver):
+    binary: str = LINKERN
+    tmp_dir: str = "/tmp"
+
+    def run(self, tsp_file: str, tour_file: str, dim: int = 3, snapshot_file: Optional[str] = None):
+        cmd = [self.binary, "-o", tour_file, "-N", "%s" % dim, tsp_file]
+        if snapshot_file is not None:
+            cmd[1:1] = ["-S", snapshot_file]
+        for line in execute(cmd):
+            logger.info(line)
+
+    def solve(self, cities: np.ndarray, progress: Optional[Progress] = None) -> np.ndarray:
+        tsp_file = os.path.join(self.tmp_dir, "%s.tsp" % uuid.uuid4())
+        tour_file = os.path.join(self.tmp_dir, "%s.tour" % uuid.uuid4())
+        snapshot_file = os.path.join(self.tmp_dir, "%s.cycle" % uuid.uuid4()) if progress is not None else None
+        stop = threading.Event()
+        try:
+            with open(tsp_file, "w+") as file_handle:
+                write_instance(file_handle, cities)
+            if progress is not None:
+                threading.Thread(target=watch_snapshots, args=(snapshot_file, progress, stop), daemon=True).start()
+            self.run(tsp_file, tour_file, dim=cities.shape[1], snapshot_file=snapshot_file)
+            return read_tour(tour_file)
+        finally:
+            stop.set()
+            for filename in (tsp_file, tour_file, snapshot_file):
+                if filename is not None and os.path.exists(filename):
+                    os.remove(filename)
+
+
+@dataclass
+class MultiStartLinkernSolver(LinkernSolver):
+    runs: int = 4
+    time_budget: float = 10.0
+    seed: Optional[int] = None
+
+    def solve(self, cities: np.ndarray, progress: Optional[Progress] = None) -> np.ndarray:
+        return self.solve_result(cities, progress=progress).order
+
+    def solve_result(self, cities: np.ndarray, progress: Optional[Progress] = None) -> SolveResult:
+        runs = max(1, min(self.runs, os.cpu_count() or 1))
+        seed = self.seed if self.seed is not None else random.randrange(2 ** 30)
+        tsp_file = os.path.join(self.tmp_dir, "%s.tsp" % uuid.uuid4())
+        tour_files = [os.path.join(self.tmp_dir, "%s.tour" % uuid.uuid4()) for _ in range(runs)]
+        processes = []
+        try:
+            with open(tsp_file, "w+") as file_handle:
+                write_instance(file_handle, cities)
+            deadline = time.monotonic() + self.time_budget
+            # linkern stops kicking at -t and still writes its best tour, the deadline only catches stragglers
+            for run, tour_file in enumerate(tour_files):
+                processes.append(subprocess.Popen(
+                    [self.binary, "-Q", "-s", "%d" % (seed + run), "-t", "%s" % (self.time_budget * 0.9),
+                     "-o", tour_file, "-N", "%s" % cities.shape[1], tsp_file],
+                    stdout=subprocess.DEVNULL))
+            best = None
+            completed = 0
+            for process, tour_file in zip(processes, tour_files):
+                try:
+                    process.wait(timeout=max(0.0, deadline - time.monotonic()))
+                except subprocess.TimeoutExpired:
+                    process.kill()
+                    process.wait()
+                    continue
+                if process.returncode != 0 or not os.path.exists(tour_file):
+                    continue
+                completed += 1
+                order = read_tour(tour_file)
+                length = path_length(cities, order)
+                if best is None or length < best.length:
+                    best = SolveResult(order=order, length=length)
+                    if progress is not None:
+                        progress(order)
+            logger.info(f"{completed} of {runs} linkern runs finished within {self.time_budget}s.")
+            if best is None:
+                raise subprocess.TimeoutExpired(self.binary, self.time_budget)
+            return SolveResult(order=best.order, length=best.length, runs=runs, completed=completed)
+        finally:
+            # runs still going when reading a tour or reporting progress raised would otherwise be orphaned
+            for process in processes:
+                if process.poll() is None:
+                    process.kill()
+                    process.wait()
+            for filename in [tsp_file, *tour_files]:
+                if os.path.exists(filename):
+                    os.remove(filename)
+
+
+@dataclass
+class NumpySolver(Solver):
+    max_iterations: int = 50
+    max_segment: int = 3
+
+    def solve(self, cities: np.ndarray, progress: Optional[Progress] = None) -> np.ndarray:
+        if len(cities) < 4:
+            return np.arange(len(cities))
+        dist = distance_matrix(cities)
+        order = nearest_neighbor(dist)
+        for _ in range(self.max_iterations):
+            improved = two_opt(dist, order)
+            order, moved = or_opt(dist, order, self.max_segment)
+            if not (improved or moved):
+                break
+            if progress is not None:
+                progress(order.copy())
+        return np.roll(order, -int(np.argmin(order)))
+
+
+def nearest_neighbor(dist: np.ndarray) -> np.ndarray:
+    n_cities = len(dist)
+    visited = np.zeros(n_cities, dtype=bool)
+    order = np.empty(n_cities, dtype=np.int64)
+    current = 0
+    for position in range(n_cities):
+        order[position] = current
+        visited[current] = True
+        current = int(np.argmin(np.where(visited, np.inf, dist[current])))
+    return order
+
+
+def two_opt(dist: np.ndarray, order: np.ndarray, positions: Optional[np.ndarray] = None) -> bool:
+    """Applies the best 2-opt move for every edge starting at `positions`, reversing `order` in place."""
+    n_cities = len(order)
+    improved = False
+    for i in range(n_cities - 2) if positions is None else positions:
+        if i > n_cities - 3:
+            continue
+        a, b = order[i], order[i + 1]
+        c = order[i + 2:]
+        d = np.append(order[i + 3:], order[0])
+        gains = dist[a, b] + dist[c, d] - dist[a, c] - dist[b, d]
+        if i == 0:
+            # the last edge closes the cycle back into a
+            gains[-1] = 0
+        j = int(np.argmax(gains))
+        if gains[j] > EPSILON:
+            j += i + 2
+            order[i + 1:j + 1] = order[i + 1:j + 1][::-1]
+            improved = True
+    return improved
+
+
+def or_opt(dist: np.ndarray, order: np.ndarray, max_segment: int = 3):
+    """Moves segments of up to `max_segment` cities to their cheapest position, possibly reversed."""
+    n_cities = len(order)
+    moved = False
+    for length in range(1, max_segment + 1):
+        if n_cities < length + 3:
+            break
+        following = np.roll(order, -1)
+        edges = dist[order, following]
+        for i in range(n_cities):
+            positions = np.arange(i, i + length) % n_cities
+            segment = order[positions]
+            before, after = order[(i - 1) % n_cities], order[(i + length) % n_cities]
+            removal_gain = dist[before, segment[0]] + dist[segment[-1], after] - dist[before, after]
+            if removal_gain <= EPSILON:
+                continue
+            forward = dist[order, segment[0]] + dist[segment[-1], following] - edges
+            backward = dist[order, segment[-1]] + dist[segment[0], following] - edges
+            costs = np.minimum(forward, backward)
+            # edges touching the segment are not insertion points
+            costs[np.arange(i - 1, i + length) % n_cities] = np.inf
+            k = int(np.argmin(costs))
+            if removal_gain - costs[k] > EPSILON:
+                insert = segment if forward[k] <= backward[k] else segment[::-1]
+                rest = np.delete(order, positions)
+                at = int(np.flatnonzero(rest == order[k])[0]) + 1
+                order = np.concatenate([rest[:at], insert, rest[at:]])
+                following = np.roll(order, -1)
+                edges = dist[order, following]
+                moved = True
+    return order, moved
+
+
+def select_backend(n_cities: int, backend: Optional[str] = None) -> str:
+    if backend in (None, "", "auto"):
+        if n_cities <= NUMPY_SOLVER_MAX_CITIES:
+            return NUMPY_BACKEND
+        return LINKERN_BACKEND if n_cities <= LINKERN_MAX_CITIES else LARGE_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown solver backend: {backend}")
+    if backend == NUMPY_BACKEND and n_cities > NUMPY_SOLVER_MAX_CITIES:
+        # its distance matrix takes n_cities ** 2 * dimension floats
+        raise ValueError(f"The {NUMPY_BACKEND} solver takes at most {NUMPY_SOLVER_MAX_CITIES} cities.")
+    return backend
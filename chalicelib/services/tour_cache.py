@@ -0,0 +1,126 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Optional, Dict
+
+import numpy as np
+from aws_lambda_powertools import Logger
+from boto3.resources.base import ServiceResource
+from botocore.exceptions import ClientError
+
+logger = Logger()
+
+ORDER_DTYPE = "<i4"
+
+
+def tour_key(cities: np.ndarray) -> str:
+    # adding 0.0 folds -0.0 into 0.0 so equal coordinates always hash equally
+    normalized = np.ascontiguousarray(cities + 0.0, dtype="<f8")
+    digest = hashlib.sha256(b"%d:%d:" % normalized.shape)
+    digest.update(normalized.tobytes())
+    return digest.hexdigest()
+
+
+@dataclass
+class DirectoryStore:
+    path: str
+
+    def get(self, key: str) -> Optional[bytes]:
+        filename = os.path.join(self.path, key)
+        if not os.path.exists(filename):
+            return None
+        with open(filename, "rb") as file_handle:
+            return file_handle.read()
+
+    def put(self, key: str, data: bytes):
+        os.makedirs(self.path, exist_ok=True)
+        filename = os.path.join(self.path, key)
+        with open(filename + ".part", "wb") as file_handle:
+            file_handle.write(data)
+        os.replace(filename + ".part", filename)
+
+
+@dataclass
+class S3Store:
+    s3_resource: ServiceResource
+    bucket: str
+    prefix: str
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            return self.s3_resource.Object(self.bucket, f"{self.prefix}/{key}").get()['Body'].read()
+        except ClientError as error:
+            if error.response.get('Error', {}).get('Code') in ("NoSuchKey", "404"):
+                return None
+            raise
+
+    def put(self, key: str, data: bytes):
+        self.s3_resource.Object(self.bucket, f"{self.prefix}/{key}").put(Body=data)
+
+
+@dataclass
+class TourCache:
+    maxsize: int = 256
+    store: Optional[object] = None
+    hits: int = 0
+    store_hits: int = 0
+    misses: int = 0
+    _entries: OrderedDict = field(default_factory=OrderedDict, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+        data = self._read_store(key)
+        if data is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        order = np.frombuffer(data, dtype=ORDER_DTYPE).astype(np.int64)
+        with self._lock:
+            self.store_hits += 1
+            self._remember(key, order)
+        return order
+
+    def put(self, key: str, order: np.ndarray):
+        order = np.asarray(order, dtype=np.int64)
+        with self._lock:
+            self._remember(key, order)
+        if self.store is not None:
+            try:
+                self.store.put(key, order.astype(ORDER_DTYPE).tobytes())
+            except (OSError, ClientError):
+                logger.exception(f"Could not persist tour {key}.")
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "store_hits": self.store_hits, "misses": self.misses, "size": len(self._entries)}
+
+    def _remember(self, key: str, order: np.ndarray):
+        order.setflags(write=False)
+        self._entries[key] = order
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def _read_store(self, key: str) -> Optional[bytes]:
+        if self.store is None:
+            return None
+        try:
+            return self.store.get(key)
+        except (OSError, ClientError):
+            logger.exception(f"Could not read tour {key}.")
+            return None
+
+
+def create_store(s3_resource: ServiceResource):
+    if os.getenv("TOUR_CACHE_DIR"):
+        return DirectoryStore(path=os.getenv("TOUR_CACHE_DIR"))
+    if os.getenv("TOUR_CACHE_S3_PREFIX"):
+        return S3Store(s3_resource=s3_resource, bucket=os.getenv("S3_BUCKET_NAME"),
+                       prefix=os.getenv("TOUR_CACHE_S3_PREFIX"))
+    return None
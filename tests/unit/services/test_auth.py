@@ -0,0 +1,121 @@
+import time
+import unittest
+from unittest.mock import MagicMock
+
+import jwt
+
+from chalicelib.services.auth import SecretCache, TokenCache, TokenVerifier
+
+
+def secrets_client(*values):
+    client = MagicMock()
+    client.get_secret_value.side_effect = [{"SecretString": value} for value in values]
+    return client
+
+
+class TestAuth(unittest.TestCase):
+
+    def test_secret_cache_reuses_value_until_refresh(self):
+        # given
+        client = secrets_client("first", "second")
+        cache = SecretCache(client=client, ttl=60)
+
+        # when
+        values = [cache.get("jwt"), cache.get("jwt"), cache.get("jwt", refresh=True)]
+
+        # then
+        self.assertEqual(["first", "first", "second"], values)
+        self.assertEqual(2, client.get_secret_value.call_count)
+
+    def test_secret_cache_expires_after_ttl(self):
+        # given
+        client = secrets_client("first", "second")
+        cache = SecretCache(client=client, ttl=0)
+        cache.get("jwt")
+
+        # when
+        actual = cache.get("jwt")
+
+        # then
+        self.assertEqual("second", actual)
+
+    def test_secret_cache_limits_forced_refreshes(self):
+        # given
+        client = secrets_client("first", "second", "third")
+        cache = SecretCache(client=client, ttl=60, min_refresh_interval=30)
+        cache.get("jwt")
+
+        # when
+        values = [cache.get("jwt", refresh=True) for _ in range(3)]
+
+        # then
+        self.assertEqual(["second"] * 3, values)
+        self.assertEqual(2, client.get_secret_value.call_count)
+
+    def test_verifier_refreshes_once_for_many_bad_tokens(self):
+        # given
+        client = secrets_client(*["secret"] * 10)
+        verifier = TokenVerifier(secrets=SecretCache(client=client), tokens=TokenCache())
+        forged = [jwt.encode({"exp": time.time() + 60, "n": n}, "forged", algorithm="HS256") for n in range(20)]
+
+        # when
+        verified = [verifier.verify(token, "jwt") for token in forged]
+
+        # then
+        self.assertEqual([False] * 20, verified)
+        self.assertEqual(2, client.get_secret_value.call_count)
+
+    def test_token_cache_expires_and_evicts(self):
+        # given
+        cache = TokenCache(maxsize=2)
+        cache.put("expired", time.time() - 1)
+        cache.put("a", time.time() + 60)
+        cache.put("b", time.time() + 60)
+
+        # when
+        cache.put("c", time.time() + 60)
+
+        # then
+        self.assertFalse(cache.contains("expired"))
+        self.assertFalse(cache.contains("a"))
+        self.assertTrue(cache.contains("b"))
+        self.assertTrue(cache.contains("c"))
+
+    def test_verifier_skips_decoding_verified_tokens(self):
+        # given
+        client = secrets_client("secret")
+        verifier = TokenVerifier(secrets=SecretCache(client=client), tokens=TokenCache())
+        token = jwt.encode({"exp": time.time() + 60}, "secret", algorithm="HS256")
+
+        # when
+        verified = [verifier.verify(token, "jwt") for _ in range(3)]
+
+        # then
+        self.assertEqual([True] * 3, verified)
+        self.assertEqual(1, client.get_secret_value.call_count)
+
+    def test_verifier_refreshes_rotated_secret(self):
+        # given
+        client = secrets_client("old", "new")
+        verifier = TokenVerifier(secrets=SecretCache(client=client), tokens=TokenCache())
+        verifier.verify(jwt.encode({"exp": time.time() + 60}, "old", algorithm="HS256"), "jwt")
+
+        # when
+        actual = verifier.verify(jwt.encode({"exp": time.time() + 60}, "new", algorithm="HS256"), "jwt")
+
+        # then
+        self.assertTrue(actual)
+        self.assertEqual(2, client.get_secret_value.call_count)
+
+    def test_verifier_rejects_invalid_tokens(self):
+        # given
+        client = secrets_client("secret", "secret")
+        verifier = TokenVerifier(secrets=SecretCache(client=client), tokens=TokenCache())
+
+        # when
+        forged = verifier.verify(jwt.encode({"exp": time.time() + 60}, "forged", algorithm="HS256"), "jwt")
+        expired = verifier.verify(jwt.encode({"exp": time.time() - 60}, "secret", algorithm="HS256"), "jwt")
+
+        # then
+        self.assertFalse(forged)
+        self.assertFalse(expired)
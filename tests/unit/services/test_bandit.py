@@ -0,0 +1,86 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from chalicelib.services.bandit import BanditStatistics, FileCheckpoint, RunningStatistics, CheckpointConflict
+
+
+class TestBanditStatistics(unittest.TestCase):
+
+    def test_running_statistics_match_numpy(self):
+        # given
+        rewards = np.random.default_rng(3).normal(300, 40, size=200)
+        first, second = RunningStatistics(), RunningStatistics()
+
+        # when
+        for reward in rewards[:120]:
+            first.add(reward, now=0)
+        for reward in rewards[120:]:
+            second.add(reward, now=0)
+        first.merge(second, now=0)
+
+        # then
+        self.assertEqual(200, first.count)
+        self.assertAlmostEqual(rewards.mean(), first.mean)
+        self.assertAlmostEqual(rewards.var(), first.variance)
+
+    def test_decay_halves_weight_per_half_life(self):
+        # given
+        statistics = RunningStatistics()
+        statistics.add(100, now=0, half_life=60)
+        statistics.add(100, now=0, half_life=60)
+
+        # when
+        statistics.add(400, now=60, half_life=60)
+
+        # then
+        self.assertEqual(2, statistics.count)
+        self.assertEqual(250, statistics.mean)
+
+    def test_containers_merge_through_checkpoint(self):
+        with tempfile.TemporaryDirectory() as path:
+            # given
+            checkpoint = FileCheckpoint(path=os.path.join(path, "statistics.json"))
+            first, second = BanditStatistics(checkpoint=checkpoint), BanditStatistics(checkpoint=checkpoint)
+            first.update("PAGE_1", 100)
+            second.update("PAGE_1", 300)
+            second.update("PAGE_2", 50)
+
+            # when
+            first.sync()
+            second.sync()
+            first.sync()
+
+            # then
+            for statistics in (first, second):
+                page_1, page_2, page_3 = statistics.statistics(["PAGE_1", "PAGE_2", "PAGE_3"])
+                self.assertEqual((2, 200), (page_1.count, page_1.mean))
+                self.assertEqual((1, 50), (page_2.count, page_2.mean))
+                self.assertIsNone(page_3)
+
+    def test_conflicting_writes_are_retried(self):
+        # given
+        class RacingCheckpoint:
+            writes = 0
+
+            def read(self):
+                return None, None
+
+            def write(self, document, version):
+                self.writes += 1
+                if self.writes == 1:
+                    raise CheckpointConflict("statistics.json")
+
+        checkpoint = RacingCheckpoint()
+        statistics = BanditStatistics(checkpoint=checkpoint)
+        statistics.update("PAGE_1", 100)
+
+        # when
+        statistics.sync()
+
+        # then
+        self.assertEqual(2, checkpoint.writes)
+        self.assertEqual(100, statistics.mean("PAGE_1"))
+        self.assertFalse(statistics.due())
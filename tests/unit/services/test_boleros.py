@@ -0,0 +1,90 @@
+import os
+import random
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from chalicelib.services import boleros
+from markovify.chain import BEGIN, END
+
+from chalicelib.services.boleros import Boleros, SentenceEngine
+
+
+class TestBoleros(unittest.TestCase):
+
+    def test_models_are_loaded_lazily_once(self):
+        # given
+        service = Boleros()
+
+        with mock.patch("chalicelib.services.boleros.load_model", wraps=boleros.load_model) as load_model:
+            # when
+            first = service.model("en")
+            second = service.model("en")
+
+            # then
+            load_model.assert_called_once_with("en")
+            self.assertIs(first, second)
+            self.assertTrue(first.chain.compiled)
+
+    def test_compiled_model_round_trip(self):
+        with tempfile.TemporaryDirectory() as path:
+            compiled = os.path.join(path, "boleros_es.json")
+            with mock.patch("chalicelib.services.boleros.model_path", return_value=compiled):
+                # when
+                boleros.write_model("es")
+                actual = boleros.load_model("es")
+
+            # then
+            self.assertTrue(os.path.exists(compiled))
+            self.assertTrue(actual.chain.compiled)
+            self.assertIsNotNone(actual.make_short_sentence(100, tries=100))
+
+    def test_load_model_without_compiled_chain(self):
+        with mock.patch("chalicelib.services.boleros.model_path", return_value="/nonexistent/boleros_es.json"):
+            self.assertTrue(boleros.load_model("es").chain.compiled)
+
+
+class TestSentenceEngine(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.model = boleros.load_model("en")
+        cls.engine = SentenceEngine(cls.model)
+
+    def test_walk_follows_the_chain(self):
+        # given
+        rng = random.Random(3)
+        transitions = {state: set(words) for state, (words, _) in self.model.chain.model.items()}
+
+        # when
+        words = self.engine.walk(rng)
+
+        # then
+        state = (BEGIN, BEGIN)
+        for word in words:
+            self.assertIn(word, transitions[state])
+            state = state[1:] + (word,)
+        self.assertIn(END, transitions[state])
+
+    def test_sentence_is_never_none(self):
+        for seed in range(50):
+            sentence = self.engine.sentence(random.Random(seed))
+            self.assertIsInstance(sentence, str)
+            self.assertLessEqual(len(sentence), 100)
+            self.assertEqual(sentence, sentence.lower())
+
+    def test_sentences_refill_the_pool(self):
+        # given
+        service = Boleros(pool_size=8)
+
+        # when
+        actual = service.sentences("en", 3)
+        for _ in range(200):
+            if len(service._pools["en"]) == 8:
+                break
+            time.sleep(0.01)
+
+        # then
+        self.assertEqual(3, len(actual))
+        self.assertEqual(8, len(service._pools["en"]))
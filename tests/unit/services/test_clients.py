@@ -0,0 +1,59 @@
+import threading
+import unittest
+from unittest.mock import MagicMock
+
+from chalicelib.services.clients import ClientPool, client_config
+
+
+class TestClientPool(unittest.TestCase):
+
+    def test_client_config(self):
+        # when
+        config = client_config(max_pool_connections=64, max_attempts=5)
+
+        # then
+        assert config.max_pool_connections == 64
+        assert config.tcp_keepalive is True
+        assert config.retries == {"mode": "standard", "max_attempts": 5}
+
+    def test_client_merges_settings(self):
+        # given
+        session = MagicMock()
+        pool = ClientPool(config=client_config(), session=session)
+
+        # when
+        pool.client("s3", signature_version="s3v4")
+        pool.client("secretsmanager", region_name="us-east-1")
+
+        # then
+        s3_call, secrets_call = session.client.call_args_list
+        assert s3_call.args == ("s3",)
+        assert s3_call.kwargs["config"].signature_version == "s3v4"
+        assert s3_call.kwargs["config"].max_pool_connections == 50
+        assert secrets_call.kwargs["region_name"] == "us-east-1"
+        assert secrets_call.kwargs["config"] is pool.config
+
+    def test_constructions_are_serialized(self):
+        # given
+        active, overlaps = [], []
+        session = MagicMock()
+
+        def client(*args, **kwargs):
+            overlaps.append(len(active))
+            active.append(args)
+            threading.Event().wait(0.01)
+            active.pop()
+
+        session.client.side_effect = client
+        pool = ClientPool(session=session)
+
+        # when
+        threads = [threading.Thread(target=pool.client, args=("s3",)) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # then
+        assert overlaps == [0, 0, 0, 0]
+
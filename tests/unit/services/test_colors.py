@@ -0,0 +1,60 @@
+import io
+import json
+import unittest
+from unittest.mock import MagicMock
+
+from botocore.exceptions import ClientError
+
+from chalicelib.services.colors import Colors
+
+
+def s3_client(pages, configs):
+    client = MagicMock()
+    client.get_paginator.return_value.paginate.return_value = pages
+    client.generate_presigned_url.side_effect = lambda method, Params, ExpiresIn: f"signed/{Params['Key']}"
+
+    def get_object(Bucket, Key):
+        if Key not in configs:
+            raise ClientError({"Error": {"Code": "NoSuchKey"}}, "GetObject")
+        return {"Body": io.BytesIO(json.dumps(configs[Key]).encode())}
+
+    client.get_object.side_effect = get_object
+    return client
+
+
+class TestColors(unittest.TestCase):
+
+    def test_get_colors(self):
+        # given
+        pages = [
+            {"Contents": [{"Key": "colors/"}, {"Key": "colors/red/config.json"}, {"Key": "colors/red/1k/cube.png"}]},
+            {"Contents": [{"Key": "colors/red/1k/square.png"}, {"Key": "colors/blue/2k/square.png"}]},
+        ]
+        client = s3_client(pages, {"colors/red/config.json": {"default": "1k", "description": "Red"}})
+        colors_service = Colors(s3_client=client, max_workers=2)
+
+        # when
+        actual = colors_service.get_colors(bucket="shenanigans")
+
+        # then
+        client.get_paginator.return_value.paginate.assert_called_once_with(Bucket="shenanigans", Prefix="colors/")
+        client.get_object.assert_called_once_with(Bucket="shenanigans", Key="colors/red/config.json")
+        self.assertEqual([
+            {"slug": "red", "default": "1k", "description": "Red", "resolutions": [
+                {"resolution": "1k", "cube": "signed/colors/red/1k/cube.png",
+                 "square": "signed/colors/red/1k/square.png"}]},
+            {"slug": "blue", "default": None, "description": None, "resolutions": [
+                {"resolution": "2k", "cube": None, "square": "signed/colors/blue/2k/square.png"}]},
+        ], actual)
+
+    def test_unreadable_config(self):
+        # given
+        pages = [{"Contents": [{"Key": "colors/red/config.json"}, {"Key": "colors/red/1k/cube.png"}]}]
+        colors_service = Colors(s3_client=s3_client(pages, {}))
+
+        # when
+        actual = colors_service.get_colors(bucket="shenanigans")
+
+        # then
+        self.assertIsNone(actual[0]["default"])
+        self.assertIsNone(actual[0]["resolutions"][0]["square"])
@@ -0,0 +1,136 @@
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock, patch
+
+from botocore.exceptions import ClientError
+
+from chalicelib.services.documents import DocumentCache, parse_text
+from chalicelib.services.response_cache import ResponseCache
+from chalicelib.services.single_flight import SingleFlight
+
+NOT_MODIFIED = ClientError({"Error": {"Code": "304", "Message": "Not Modified"},
+                            "ResponseMetadata": {"HTTPStatusCode": 304}}, "GetObject")
+
+
+def s3_object(body: bytes, etag: str):
+    return {"Body": MagicMock(read=lambda: body), "ETag": etag}
+
+
+class TestDocumentCache(unittest.TestCase):
+
+    def test_fresh_documents_are_not_fetched(self):
+        # given
+        s3_client = MagicMock()
+        s3_client.get_object.return_value = s3_object(b'{"a": 1}', '"1"')
+        documents = DocumentCache(s3_client=s3_client, freshness=60)
+
+        # when
+        values = [documents.get("bucket", "names.json") for _ in range(3)]
+
+        # then
+        assert values == [{"a": 1}] * 3
+        s3_client.get_object.assert_called_once_with(Bucket="bucket", Key="names.json")
+
+    def test_stale_documents_are_revalidated(self):
+        # given
+        s3_client = MagicMock()
+        s3_client.get_object.side_effect = [s3_object(b'{"a": 1}', '"1"'), NOT_MODIFIED,
+                                            s3_object(b'{"a": 2}', '"2"')]
+        documents = DocumentCache(s3_client=s3_client, freshness=60)
+
+        # when
+        with patch("chalicelib.services.documents.time") as clock:
+            clock.monotonic.side_effect = [0, 100, 200]
+            values = [documents.get("bucket", "names.json") for _ in range(3)]
+
+        # then
+        assert values == [{"a": 1}, {"a": 1}, {"a": 2}]
+        assert [call.kwargs.get("IfNoneMatch") for call in s3_client.get_object.call_args_list] == \
+            [None, '"1"', '"1"']
+
+    def test_missing_documents_raise(self):
+        # given
+        s3_client = MagicMock()
+        s3_client.get_object.side_effect = ClientError({"Error": {"Code": "NoSuchKey"}}, "GetObject")
+        documents = DocumentCache(s3_client=s3_client)
+
+        # then
+        with self.assertRaises(ClientError):
+            documents.get("bucket", "names.json")
+
+    def test_documents_are_kept_per_parser(self):
+        # given
+        s3_client = MagicMock()
+        s3_client.get_object.side_effect = lambda **_: s3_object(b'{"a": 1}', '"1"')
+        documents = DocumentCache(s3_client=s3_client)
+
+        # when
+        parsed, text = documents.get("bucket", "doc.json"), documents.get("bucket", "doc.json", parse=parse_text)
+
+        # then
+        assert parsed == {"a": 1}
+        assert text == '{"a": 1}'
+
+    def test_put_replaces_cached_documents(self):
+        # given
+        s3_client = MagicMock()
+        s3_client.get_object.side_effect = lambda **_: s3_object(b'{"a": 1}', '"1"')
+        s3_client.put_object.return_value = {"ETag": '"2"'}
+        documents = DocumentCache(s3_client=s3_client)
+        documents.get("bucket", "names.json")
+        documents.get("bucket", "names.json", parse=parse_text)
+
+        # when
+        documents.put("bucket", "names.json", body=b'{"a": 2}', value={"a": 2})
+
+        # then
+        assert documents.get("bucket", "names.json") == {"a": 2}
+        assert documents.get("bucket", "names.json", parse=parse_text) == '{"a": 1}'
+        assert s3_client.get_object.call_count == 3
+
+    def test_put_clears_cached_responses(self):
+        # given
+        s3_client = MagicMock()
+        response_cache = ResponseCache()
+        response_cache.put(("codes",), {"menu": "https://example.com/menu"}, route="codes")
+        documents = DocumentCache(s3_client=s3_client, response_cache=response_cache)
+
+        # when
+        documents.put("bucket", "qr/mappings.json", body=b'{}')
+
+        # then
+        assert response_cache.get(("codes",)) is None
+
+    def test_least_recently_used_documents_are_evicted(self):
+        # given
+        s3_client = MagicMock()
+        s3_client.get_object.side_effect = lambda **kwargs: s3_object(b'{}', kwargs["Key"])
+        documents = DocumentCache(s3_client=s3_client, maxsize=2)
+
+        # when
+        for key in ("a", "b", "a", "c", "a", "b"):
+            documents.get("bucket", key)
+
+        # then
+        assert [call.kwargs["Key"] for call in s3_client.get_object.call_args_list] == ["a", "b", "c", "b"]
+
+    def test_concurrent_misses_share_one_fetch(self):
+        # given
+        release = threading.Event()
+        s3_client = MagicMock()
+        s3_client.get_object.side_effect = lambda **_: release.wait(5) and s3_object(b'{"a": 1}', '"1"')
+        single_flight = SingleFlight()
+        documents = DocumentCache(s3_client=s3_client, single_flight=single_flight)
+
+        # when
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            futures = [executor.submit(documents.get, "bucket", "flyer.json") for _ in range(4)]
+            while sum(flight.followers for flight in list(single_flight._flights.values())) < 3:
+                threading.Event().wait(0.01)
+            release.set()
+            values = [future.result() for future in futures]
+
+        # then
+        assert values == [{"a": 1}] * 4
+        assert s3_client.get_object.call_count == 1
@@ -0,0 +1,64 @@
+import tempfile
+import time
+import unittest
+
+import numpy as np
+
+from chalicelib.services.jobs import JobRunner, InMemoryJobStore, FileJobStore, Job, DONE, FAILED
+from chalicelib.services.solver import NumpySolver
+
+
+def wait_for(store, job_id, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = store.get(job_id)
+        if job.status in (DONE, FAILED):
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"Job {job_id} did not finish.")
+
+
+class TestJobRunner(unittest.TestCase):
+
+    def test_submit_reports_improving_tours(self):
+        # given
+        store = InMemoryJobStore()
+        runner = JobRunner(store=store)
+        cities = np.random.default_rng(2).random((120, 2))
+
+        # when
+        job = runner.submit(cities, lambda job_cities, progress: NumpySolver().solve_result(job_cities, progress))
+        actual = wait_for(store, job.id)
+
+        # then
+        self.assertEqual(DONE, actual.status)
+        self.assertGreater(actual.improvements, 1)
+        self.assertEqual(list(range(120)), sorted(actual.order))
+        self.assertEqual((120 + 1) * 2, len(actual.tour))
+        self.assertGreaterEqual(actual.elapsed(), 0)
+
+    def test_submit_records_failures(self):
+        # given
+        store = InMemoryJobStore()
+
+        def fail(cities, progress):
+            raise RuntimeError("linkern exploded")
+
+        # when
+        job = JobRunner(store=store).submit(np.zeros((3, 2)), fail)
+        actual = wait_for(store, job.id)
+
+        # then
+        self.assertEqual(FAILED, actual.status)
+        self.assertEqual("linkern exploded", actual.error)
+
+
+class TestFileJobStore(unittest.TestCase):
+
+    def test_round_trip(self):
+        with tempfile.TemporaryDirectory() as path:
+            store = FileJobStore(path=path)
+            store.save(Job(id="abc", n_cities=3, dimension=2, order=[0, 2, 1]))
+
+            self.assertEqual([0, 2, 1], store.get("abc").order)
+            self.assertIsNone(store.get("missing"))
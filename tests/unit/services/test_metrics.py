@@ -0,0 +1,114 @@
+import contextlib
+import io
+import json
+import unittest
+from unittest.mock import MagicMock
+
+from botocore.exceptions import ClientError, ParamValidationError
+
+from chalicelib.services.metrics import RewardMetrics, EMF_MODE, MAX_DATUMS_PER_CALL
+
+
+class TestRewardMetrics(unittest.TestCase):
+
+    def test_flush_sends_statistic_sets(self):
+        # given
+        client = MagicMock()
+        metrics = RewardMetrics(client_factory=lambda: client, max_pending=3)
+        metrics.record("ca", 10)
+        metrics.record("ca", 10)
+        self.assertFalse(metrics.due())
+
+        # when
+        metrics.record("ny", 20)
+        metrics.flush_if_due()
+
+        # then
+        client.put_metric_data.assert_called_once()
+        data = client.put_metric_data.call_args.kwargs["MetricData"]
+        self.assertEqual([("ca", "10", 2), ("ny", "20", 1)],
+                         [(datum["MetricName"], datum["Dimensions"][1]["Value"], datum["StatisticValues"]["Sum"])
+                          for datum in data])
+        self.assertFalse(metrics.due())
+
+    def test_flush_after_max_age(self):
+        metrics = RewardMetrics(client_factory=MagicMock(), max_pending=100, max_age=0)
+        metrics.record("ca", 10)
+        self.assertTrue(metrics.due())
+
+    def test_failed_flush_keeps_rewards(self):
+        # given
+        client = MagicMock()
+        client.put_metric_data.side_effect = ClientError({"Error": {"Code": "Throttling"}}, "PutMetricData")
+        metrics = RewardMetrics(client_factory=lambda: client)
+        metrics.record("ca", 10)
+
+        # when
+        metrics.flush()
+        client.put_metric_data.side_effect = None
+        metrics.flush()
+
+        # then
+        self.assertEqual(2, client.put_metric_data.call_count)
+        self.assertEqual(1, client.put_metric_data.call_args.kwargs["MetricData"][0]["StatisticValues"]["SampleCount"])
+
+    def test_rejected_rewards_are_dropped(self):
+        # given
+        client = MagicMock()
+        client.put_metric_data.side_effect = ParamValidationError(report="Invalid length for parameter")
+        metrics = RewardMetrics(client_factory=lambda: client)
+        metrics.record("ca", 10)
+
+        # when
+        metrics.flush()
+
+        # then
+        self.assertFalse(metrics.due())
+        client.put_metric_data.side_effect = None
+        metrics.record("ny", 10)
+        metrics.flush()
+        self.assertEqual("ny", client.put_metric_data.call_args.kwargs["MetricData"][0]["MetricName"])
+
+    def test_transient_failure_keeps_only_unsent_calls(self):
+        # given
+        client = MagicMock()
+        client.put_metric_data.side_effect = [None, ClientError({"Error": {"Code": "InternalFailure"},
+                                                                "ResponseMetadata": {"HTTPStatusCode": 500}},
+                                                               "PutMetricData")]
+        metrics = RewardMetrics(client_factory=lambda: client)
+        for state in range(MAX_DATUMS_PER_CALL + 1):
+            metrics.record(f"state-{state}", 10)
+
+        # when
+        metrics.flush()
+        client.put_metric_data.side_effect = None
+        metrics.flush()
+
+        # then
+        self.assertEqual(3, client.put_metric_data.call_count)
+        self.assertEqual(1, len(client.put_metric_data.call_args.kwargs["MetricData"]))
+
+    def test_invalid_states_are_refused(self):
+        metrics = RewardMetrics(client_factory=MagicMock())
+        for state in (None, "", "x" * 256, 7):
+            with self.assertRaises(ValueError):
+                metrics.record(state, 700)
+        self.assertFalse(metrics.due())
+
+    def test_emf_mode_writes_log_lines(self):
+        # given
+        factory = MagicMock()
+        metrics = RewardMetrics(client_factory=factory, mode=EMF_MODE)
+        metrics.record("ca", 10)
+        metrics.record("ca", 10)
+        output = io.StringIO()
+
+        # when
+        with contextlib.redirect_stdout(output):
+            metrics.flush_if_due()
+
+        # then
+        line = json.loads(output.getvalue().splitlines()[0])
+        self.assertEqual("MultiArmedBandit", line["_aws"]["CloudWatchMetrics"][0]["Namespace"])
+        self.assertEqual(("dev", "10", [2.0]), (line["Stage"], line["RetentionLowerBound"], line["ca"]))
+        factory.assert_not_called()
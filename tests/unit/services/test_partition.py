@@ -0,0 +1,51 @@
+import unittest
+
+import numpy as np
+
+from chalicelib.services.partition import PartitionSolver, hilbert_keys, partition, open_cycle
+from chalicelib.services.solver import NumpySolver, path_length
+
+
+class TestPartition(unittest.TestCase):
+
+    def test_hilbert_keys_visit_grid_in_unit_steps(self):
+        for dims in (2, 3):
+            # given
+            grid = np.stack(np.meshgrid(*[np.arange(8.0)] * dims, indexing="ij"), axis=-1).reshape(-1, dims)
+
+            # when
+            keys = hilbert_keys(grid, bits=3)
+
+            # then
+            self.assertEqual(len(grid), len(set(keys.tolist())))
+            steps = np.abs(np.diff(grid[np.argsort(keys)], axis=0)).sum(axis=1)
+            np.testing.assert_array_equal(np.ones(len(grid) - 1), steps)
+
+    def test_partition_sizes(self):
+        parts = partition(np.random.default_rng(0).random((1001, 2)), partition_size=250)
+        self.assertEqual(5, len(parts))
+        self.assertEqual(list(range(1001)), sorted(np.concatenate(parts).tolist()))
+
+    def test_open_cycle_connects_entry_to_target(self):
+        # given
+        cities = np.array([[0.0, 0.0], [1.0, 0.0], [1.0, 1.0], [0.0, 1.0]])
+
+        # when
+        actual = open_cycle(cities, np.array([0, 1, 2, 3]), entry=np.array([-1.0, 1.0]), target=np.array([-1.0, 0.0]))
+
+        # then
+        np.testing.assert_array_equal([3, 2, 1, 0], actual)
+
+    def test_solve_result(self):
+        # given
+        cities = np.random.default_rng(3).random((1200, 2))
+        whole = NumpySolver().solve(cities)
+
+        # when
+        actual = PartitionSolver(partition_solver=NumpySolver(), partition_size=300).solve_result(cities)
+
+        # then
+        self.assertEqual(list(range(1200)), sorted(actual.order.tolist()))
+        self.assertEqual(4, actual.completed)
+        self.assertEqual({"partition", "solve", "stitch", "repair"}, set(actual.timings))
+        self.assertLess(actual.length, 1.1 * path_length(cities, whole))
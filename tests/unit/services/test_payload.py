@@ -0,0 +1,72 @@
+import base64
+import unittest
+
+import numpy as np
+
+from chalicelib.services.payload import decode_cities, encode_tour, INDICES
+
+
+class TestPayload(unittest.TestCase):
+
+    def test_decode_raw_float32(self):
+        # given
+        expected = np.array([[0.5, 1.5], [2.5, 3.5], [4.5, 5.5]], dtype="<f4")
+
+        # when
+        actual = decode_cities(expected.tobytes(), dimension=2, dtype="float32", count=3)
+
+        # then
+        np.testing.assert_array_equal(expected, actual)
+
+    def test_decode_base64_float64(self):
+        # given
+        expected = np.arange(9, dtype="<f8").reshape(3, 3)
+
+        # when
+        actual = decode_cities(base64.b64encode(expected.tobytes()), dimension=3, encoded=True)
+
+        # then
+        np.testing.assert_array_equal(expected, actual)
+
+    def test_decode_rejects_bad_input(self):
+        data = np.arange(6, dtype="<f8").tobytes()
+        with self.assertRaises(ValueError):
+            decode_cities(data[:-1], dimension=2)
+        with self.assertRaises(ValueError):
+            decode_cities(data, dimension=2, count=4)
+        with self.assertRaises(ValueError):
+            decode_cities(data, dimension=4)
+        with self.assertRaises(ValueError):
+            decode_cities(data, dimension=2, dtype="int8")
+        with self.assertRaises(ValueError):
+            decode_cities(b"not base64!", dimension=2, encoded=True)
+        with self.assertRaises(ValueError):
+            decode_cities(np.array([np.nan, 0.0], dtype="<f8").tobytes(), dimension=2)
+
+    def test_encode_tour_coordinates(self):
+        # given
+        cities = np.array([[0.0, 0.0], [1.0, 0.0], [1.0, 1.0]])
+        order = np.array([0, 2, 1])
+
+        # when
+        actual = np.frombuffer(encode_tour(cities, order), dtype="<f4").reshape(-1, 2)
+
+        # then
+        np.testing.assert_array_equal([[0, 0], [1, 1], [1, 0], [0, 0]], actual)
+
+    def test_encode_tour_delta_round_trip(self):
+        # given
+        cities = np.random.default_rng(0).random((50, 3))
+        order = np.random.default_rng(1).permutation(50)
+
+        # when
+        indices = np.frombuffer(encode_tour(cities, order, fmt=INDICES, delta=True), dtype="<i4")
+        coordinates = np.frombuffer(encode_tour(cities, order, delta=True), dtype="<f4").reshape(-1, 3)
+
+        # then
+        np.testing.assert_array_equal(order, np.cumsum(indices))
+        np.testing.assert_allclose(cities[np.append(order, order[0])], np.cumsum(coordinates, axis=0), atol=1e-5)
+
+    def test_encode_tour_unknown_format(self):
+        with self.assertRaises(ValueError):
+            encode_tour(np.zeros((3, 2)), np.arange(3), fmt="svg")
@@ -0,0 +1,157 @@
+import json
+import unittest
+
+from chalicelib.services.photo import Photo
+from chalicelib.services.photo_counts import PhotoCounts, counts_key
+from chalicelib.services.prefix_index import PrefixIndex, manifest_key
+from tests.unit.services.test_prefix_index import FakeS3
+
+KEYS = [
+    "calendar/ana/2022/12/31/0.jpg",
+    "calendar/ana/2023/01/23/0.jpg",
+    "calendar/ana/2023/01/23/1.jpg",
+    "calendar/ana/2023/02/01/0.jpg",
+]
+
+
+def photo_counts_with_index(s3):
+    index = PrefixIndex(s3_client=s3)
+    index.list_keys("bucket", "calendar/ana")
+    return index, PhotoCounts(s3_client=s3, prefix_index=index)
+
+
+def upload(s3, index, photo_counts, key):
+    s3.objects[key] = b""
+    notify(index, photo_counts, key, "ObjectCreated:Put")
+
+
+def delete(s3, index, photo_counts, key):
+    s3.objects.pop(key, None)
+    notify(index, photo_counts, key, "ObjectRemoved:Delete")
+
+
+def notify(index, photo_counts, key, event_name):
+    changed = index.apply_event("bucket", key, event_name)
+    photo_counts.apply_event("bucket", key, event_name, changed=changed)
+
+
+class TestPhotoCounts(unittest.TestCase):
+
+    def test_build_lists_years_in_parallel(self):
+        # given
+        s3 = FakeS3(KEYS)
+        photo_counts = PhotoCounts(s3_client=s3, max_workers=2)
+
+        # when
+        actual = photo_counts.counts("bucket", "calendar/ana")
+
+        # then
+        self.assertEqual({"2022/12/31": 1, "2023/01/23": 2, "2023/02/01": 1}, actual)
+        self.assertEqual(3, s3.list_calls)
+        self.assertEqual(KEYS[-1], json.loads(s3.objects[counts_key("calendar/ana")])["high_water"])
+
+    def test_catch_up_lists_only_new_keys(self):
+        # given
+        s3 = FakeS3(KEYS)
+        photo_counts = PhotoCounts(s3_client=s3)
+        photo_counts.counts("bucket", "calendar/ana")
+        s3.objects["calendar/ana/2023/02/01/1.jpg"] = b""
+        s3.objects["calendar/ana/2023/03/05/0.jpg"] = b""
+
+        # when
+        actual = photo_counts.counts("bucket", "calendar/ana")
+
+        # then
+        self.assertEqual({"2022/12/31": 1, "2023/01/23": 2, "2023/02/01": 2, "2023/03/05": 1}, actual)
+        self.assertEqual("calendar/ana/2023/03/05/0.jpg",
+                         json.loads(s3.objects[counts_key("calendar/ana")])["high_water"])
+
+    def test_events_apply_backdated_uploads_and_deletions_once(self):
+        # given
+        s3 = FakeS3(KEYS)
+        index, photo_counts = photo_counts_with_index(s3)
+        photo_counts.counts("bucket", "calendar/ana")
+        s3.objects["calendar/ana/2023/03/05/0.jpg"] = b""
+        photo_counts.counts("bucket", "calendar/ana")
+
+        # when
+        upload(s3, index, photo_counts, "calendar/ana/2023/01/02/0.jpg")
+        notify(index, photo_counts, "calendar/ana/2023/03/05/0.jpg", "ObjectCreated:Put")
+        delete(s3, index, photo_counts, "calendar/ana/2022/12/31/0.jpg")
+        upload(s3, index, photo_counts, "calendar/ana/2024/01/01/0.jpg")
+
+        # then
+        self.assertEqual({"2023/01/02": 1, "2023/01/23": 2, "2023/02/01": 1, "2023/03/05": 1, "2024/01/01": 1},
+                         photo_counts.counts("bucket", "calendar/ana"))
+        self.assertEqual({"built", "high_water", "counts"},
+                         set(json.loads(s3.objects[counts_key("calendar/ana")])))
+
+    def test_overwrites_are_not_counted(self):
+        # given
+        s3 = FakeS3(KEYS)
+        index, photo_counts = photo_counts_with_index(s3)
+        photo_counts.counts("bucket", "calendar/ana")
+
+        # when
+        upload(s3, index, photo_counts, "calendar/ana/2023/01/23/0.jpg")
+        upload(s3, index, photo_counts, "calendar/ana/2023/01/23/0.jpg")
+
+        # then
+        self.assertEqual({"2022/12/31": 1, "2023/01/23": 2, "2023/02/01": 1},
+                         photo_counts.counts("bucket", "calendar/ana"))
+
+    def test_late_events_after_several_catch_ups_are_not_counted(self):
+        # given
+        s3 = FakeS3(KEYS)
+        index, photo_counts = photo_counts_with_index(s3)
+        photo_counts.counts("bucket", "calendar/ana")
+        s3.objects["calendar/ana/2023/03/01/0.jpg"] = b""
+        photo_counts.counts("bucket", "calendar/ana")
+        s3.objects["calendar/ana/2023/04/01/0.jpg"] = b""
+        photo_counts.counts("bucket", "calendar/ana")
+
+        # when
+        notify(index, photo_counts, "calendar/ana/2023/03/01/0.jpg", "ObjectCreated:Put")
+        notify(index, photo_counts, "calendar/ana/2023/02/01/1.jpg", "ObjectRemoved:Delete")
+
+        # then
+        self.assertEqual({"2022/12/31": 1, "2023/01/23": 2, "2023/02/01": 1, "2023/03/01": 1, "2023/04/01": 1},
+                         photo_counts.counts("bucket", "calendar/ana"))
+
+    def test_event_builds_missing_counts(self):
+        # given
+        s3 = FakeS3(KEYS)
+        index, photo_counts = photo_counts_with_index(s3)
+
+        # when
+        upload(s3, index, photo_counts, "calendar/ana/2023/01/02/0.jpg")
+
+        # then
+        document = json.loads(s3.objects[counts_key("calendar/ana")])
+        self.assertEqual({"2022/12/31": 1, "2023/01/02": 1, "2023/01/23": 2, "2023/02/01": 1}, document["counts"])
+
+    def test_counts_are_rebuilt_when_the_manifest_was(self):
+        # given
+        s3 = FakeS3(KEYS)
+        index, photo_counts = photo_counts_with_index(s3)
+        photo_counts.counts("bucket", "calendar/ana")
+        del s3.objects[manifest_key("calendar/ana/")]
+
+        # when
+        upload(s3, index, photo_counts, "calendar/ana/2023/01/02/0.jpg")
+        upload(s3, index, photo_counts, "calendar/ana/2023/01/02/0.jpg")
+
+        # then
+        self.assertEqual({"2022/12/31": 1, "2023/01/02": 1, "2023/01/23": 2, "2023/02/01": 1},
+                         photo_counts.counts("bucket", "calendar/ana"))
+
+    def test_photo_filters_date_range(self):
+        # given
+        photo_service = Photo(s3_resource=None, counts=PhotoCounts(s3_client=FakeS3(KEYS)))
+
+        # when
+        actual = photo_service.get_photo_counts_by_date(prefix="calendar/ana", bucket="bucket",
+                                                        start="2023/01/01", end="2023/01/31")
+
+        # then
+        self.assertEqual([["2023/01/23", 2]], actual)
@@ -0,0 +1,61 @@
+import math
+import unittest
+
+import numpy as np
+
+from chalicelib.services.point_set import generate_point_set, from_moebius_coords, from_sphere_coords, \
+    from_torus_coords, from_trefoil_coords, from_helix_coords, POINT_SETS
+
+
+class TestPointSet(unittest.TestCase):
+
+    def test_generate_point_set_shape(self):
+        for point_set in POINT_SETS:
+            # when
+            actual = generate_point_set(point_set, 17, seed=1)
+
+            # then
+            self.assertEqual((17, 3), actual.shape)
+
+    def test_generate_point_set_is_reproducible_with_seed(self):
+        # when
+        first = generate_point_set("torus", 50, seed=42)
+        second = generate_point_set("torus", 50, seed=42)
+
+        # then
+        np.testing.assert_array_equal(first, second)
+
+    def test_generate_point_set_unknown(self):
+        with self.assertRaises(ValueError):
+            generate_point_set("klein_bottle", 10)
+
+    def test_coords_match_scalar_formulas(self):
+        # given
+        s, theta, phi, u, v = 0.3, 1.1, 2.2, 0.7, 4.1
+
+        # then
+        np.testing.assert_allclose(from_moebius_coords(2.0, s, theta), [
+            (2.0 + s * math.cos(theta / 2)) * math.cos(theta),
+            (2.0 + s * math.cos(theta / 2)) * math.sin(theta),
+            s * math.sin(theta / 2)])
+        np.testing.assert_allclose(from_sphere_coords(1.0, theta, phi), [
+            math.cos(theta) * math.sin(phi),
+            math.sin(theta) * math.sin(phi),
+            math.cos(phi)])
+        np.testing.assert_allclose(from_torus_coords(2.0, 1.0, u, v), [
+            (2.0 * math.cos(v)) * math.cos(u),
+            (2.0 * math.cos(v)) * math.sin(u),
+            2.0 * math.sin(u)])
+        np.testing.assert_allclose(from_trefoil_coords(u), [
+            math.sin(u) + 2.0 * math.sin(2.0 * u),
+            math.cos(u) - 2.0 * math.cos(2.0 * u),
+            - math.sin(3.0 * u)])
+        np.testing.assert_allclose(from_helix_coords(u, 2.0), [2.0 * math.cos(u), 2.0 * math.sin(u), u])
+
+    def test_plane_is_flat(self):
+        # when
+        actual = generate_point_set("plane", 100, seed=3)
+
+        # then
+        np.testing.assert_array_equal(actual[:, 2], np.zeros(100))
+        self.assertTrue(np.all(np.abs(actual[:, :2]) <= 1))
@@ -0,0 +1,62 @@
+import unittest
+import warnings
+
+import numpy as np
+
+from chalicelib.services.bandit import RunningStatistics
+from chalicelib.services.policies import ArmStatistics, POLICIES, order_states, epsilon_greedy, ucb1, thompson
+
+
+def arms(means, counts, variances=None):
+    return ArmStatistics(means=np.array(means, dtype=float), counts=np.array(counts, dtype=float),
+                         variances=np.array(variances if variances is not None else [1.0] * len(means)))
+
+
+class TestPolicies(unittest.TestCase):
+
+    def test_policies_return_permutations(self):
+        statistics = arms(np.arange(50), [0, 1, 5] * 16 + [2, 2])
+        for name, policy in POLICIES.items():
+            with self.subTest(policy=name):
+                order = policy(statistics, np.random.default_rng(1))
+                self.assertEqual(list(range(50)), sorted(order.tolist()))
+
+    def test_greedy_without_exploration(self):
+        order = epsilon_greedy(arms([3, 9, 1, 5], [1, 1, 1, 1]), np.random.default_rng(1), epsilon=0)
+        self.assertEqual([1, 3, 0, 2], order.tolist())
+
+    def test_ucb1_tries_unseen_states_first(self):
+        order = ucb1(arms([3, 9, 1, 5], [10, 10, 0, 10]), np.random.default_rng(1))
+        self.assertEqual(2, order[0])
+        self.assertEqual([1, 3, 0], order[1:].tolist())
+
+    def test_ucb1_without_any_rewards(self):
+        # when
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            actual = ucb1(arms([0, 0, 0], [0, 0, 0]), np.random.default_rng(0))
+
+        # then
+        self.assertEqual([0, 1, 2], sorted(actual.tolist()))
+
+    def test_thompson_follows_confident_means(self):
+        order = thompson(arms([100, 900, 500], [1000, 1000, 1000], [10, 10, 10]), np.random.default_rng(1))
+        self.assertEqual([1, 2, 0], order.tolist())
+
+    def test_from_lookup_prefers_online_statistics(self):
+        # given
+        online = RunningStatistics()
+        online.add(400, now=0)
+        online.add(600, now=0)
+
+        # when
+        statistics = ArmStatistics.from_lookup([online, None, None], [5, 7, None])
+
+        # then
+        self.assertEqual([500, 7, 0], statistics.means.tolist())
+        self.assertEqual([2, 1, 0], statistics.counts.tolist())
+        self.assertEqual([10000, 0, 0], statistics.variances.tolist())
+
+    def test_unknown_policy(self):
+        with self.assertRaises(ValueError):
+            order_states("softmax", arms([1], [1]))
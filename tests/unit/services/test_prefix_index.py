@@ -0,0 +1,220 @@
+import io
+import json
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock
+
+from botocore.exceptions import ClientError, ParamValidationError
+
+from chalicelib.services.prefix_index import PrefixIndex, index_root, manifest_key, encode_cursor, decode_cursor
+from chalicelib.services.single_flight import SingleFlight
+
+
+class FakeS3:
+    """Just enough of an S3 client for manifests: conditional puts and single-page listings."""
+
+    def __init__(self, keys):
+        self.objects = {key: b"" for key in keys}
+        self.etags = {}
+        self.list_calls = 0
+        self.get_paginator = MagicMock(return_value=MagicMock(paginate=self.paginate))
+
+    def paginate(self, Bucket, Prefix, Delimiter=None, StartAfter=""):
+        self.list_calls += 1
+        keys = [key for key in sorted(self.objects) if key.startswith(Prefix) and key > StartAfter]
+        if Delimiter is None:
+            return [{"Contents": [{"Key": key} for key in keys]}]
+        common_prefixes = sorted({Prefix + key[len(Prefix):].split(Delimiter)[0] + Delimiter for key in keys
+                                  if Delimiter in key[len(Prefix):]})
+        return [{"Contents": [{"Key": key} for key in keys if Delimiter not in key[len(Prefix):]],
+                 "CommonPrefixes": [{"Prefix": common_prefix} for common_prefix in common_prefixes]}]
+
+    def get_object(self, Bucket, Key):
+        if Key not in self.objects:
+            raise ClientError({"Error": {"Code": "NoSuchKey"}}, "GetObject")
+        return {"Body": io.BytesIO(self.objects[Key]), "ETag": self.etags.get(Key)}
+
+    def put_object(self, Bucket, Key, Body, ContentType=None, IfMatch=None, IfNoneMatch=None):
+        if (IfNoneMatch and Key in self.objects) or (IfMatch and self.etags.get(Key) != IfMatch):
+            raise ClientError({"Error": {"Code": "PreconditionFailed"}}, "PutObject")
+        self.objects[Key] = Body
+        self.etags[Key] = str(len(self.etags) + 1)
+
+    def delete_object(self, Bucket, Key):
+        self.objects.pop(Key, None)
+
+
+class TestPrefixIndex(unittest.TestCase):
+
+    def test_index_root(self):
+        self.assertEqual("photography/", index_root("photography"))
+        self.assertEqual("colors/", index_root("colors/red/1k/cube.png"))
+        self.assertEqual("calendar/ana/", index_root("calendar/ana"))
+        self.assertIsNone(index_root("calendar/"))
+        self.assertIsNone(index_root("qr/mappings.json"))
+
+    def test_list_keys_builds_manifest_once(self):
+        # given
+        s3 = FakeS3(["blog/a.md", "blog/b.md", "photography/1.jpg"])
+        index = PrefixIndex(s3_client=s3)
+
+        # when
+        first = index.list_keys("bucket", "blog")
+        second = index.list_keys("bucket", "blog")
+
+        # then
+        self.assertEqual(["blog/a.md", "blog/b.md"], first)
+        self.assertEqual(first, second)
+        self.assertEqual(1, s3.list_calls)
+        self.assertEqual(["a.md", "b.md"], json.loads(s3.objects[manifest_key("blog/")])["keys"])
+
+    def test_concurrent_listings_share_one_manifest_read(self):
+        # given
+        s3 = FakeS3(["blog/a.md", "blog/b.md"])
+        index = PrefixIndex(s3_client=s3, single_flight=SingleFlight())
+        index.list_keys("bucket", "blog")
+        release, reads = threading.Event(), []
+        get_object = s3.get_object
+
+        def blocking_get_object(**kwargs):
+            reads.append(kwargs["Key"])
+            release.wait(5)
+            return get_object(**kwargs)
+
+        s3.get_object = blocking_get_object
+
+        # when
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            futures = [executor.submit(index.list_keys, "bucket", "blog") for _ in range(4)]
+            while sum(flight.followers for flight in list(index.single_flight._flights.values())) < 3:
+                threading.Event().wait(0.01)
+            release.set()
+            listings = [future.result() for future in futures]
+
+        # then
+        self.assertEqual([["blog/a.md", "blog/b.md"]] * 4, listings)
+        self.assertEqual([manifest_key("blog/")], reads)
+
+    def test_listing_works_without_conditional_writes(self):
+        # given
+        s3 = FakeS3(["blog/a.md", "blog/b.md"])
+        s3.put_object = MagicMock(side_effect=ParamValidationError(report="Unknown parameter: IfNoneMatch"))
+        index = PrefixIndex(s3_client=s3)
+
+        # when
+        actual = index.list_keys("bucket", "blog")
+
+        # then
+        self.assertEqual(["blog/a.md", "blog/b.md"], actual)
+
+    def test_events_drop_the_manifest_without_conditional_writes(self):
+        # given
+        s3 = FakeS3(["blog/a.md"])
+        index = PrefixIndex(s3_client=s3)
+        index.list_keys("bucket", "blog")
+        s3.put_object = MagicMock(side_effect=ParamValidationError(report="Unknown parameter: IfMatch"))
+
+        # when
+        index.apply_event("bucket", "blog/b.md", "ObjectCreated:Put")
+
+        # then
+        self.assertNotIn(manifest_key("blog/"), s3.objects)
+        s3.put_object.assert_called_once()
+
+    def test_stale_manifest_is_rebuilt(self):
+        # given
+        s3 = FakeS3(["blog/a.md"])
+        index = PrefixIndex(s3_client=s3, max_age=-1)
+        index.list_keys("bucket", "blog")
+        s3.objects["blog/b.md"] = b""
+
+        # when
+        actual = index.list_keys("bucket", "blog")
+
+        # then
+        self.assertEqual(["blog/a.md", "blog/b.md"], actual)
+        self.assertEqual(2, s3.list_calls)
+
+    def test_apply_event(self):
+        # given
+        s3 = FakeS3(["calendar/ana/2023/01/23/0.jpg", "calendar/ana/2023/01/23/1.jpg"])
+        index = PrefixIndex(s3_client=s3)
+        index.list_keys("bucket", "calendar/ana")
+
+        # when
+        index.apply_event("bucket", "calendar/ana/2023/02/01/0.jpg", "ObjectCreated:Put")
+        index.apply_event("bucket", "calendar/ana/2023/01/23/0.jpg", "ObjectRemoved:Delete")
+
+        # then
+        self.assertEqual(["calendar/ana/2023/01/23/1.jpg", "calendar/ana/2023/02/01/0.jpg"],
+                         index.list_keys("bucket", "calendar/ana/2023"))
+        self.assertEqual(1, s3.list_calls)
+
+    def test_event_builds_a_missing_manifest(self):
+        # given
+        s3 = FakeS3(["calendar/bob/2023/01/01/0.jpg"])
+        index = PrefixIndex(s3_client=s3)
+
+        # when
+        index.apply_event("bucket", "calendar/bob/2023/01/01/0.jpg", "ObjectCreated:Put")
+
+        # then
+        self.assertEqual(["2023/01/01/0.jpg"], json.loads(s3.objects[manifest_key("calendar/bob/")])["keys"])
+
+    def test_event_is_applied_to_a_rebuild_that_listed_before_it(self):
+        # given
+        s3 = FakeS3(["blog/a.md"])
+        index = PrefixIndex(s3_client=s3)
+        listed_before_event = index.live_keys("bucket", "blog/")
+        s3.objects["blog/b.md"] = b""
+        put_object = s3.put_object
+
+        def rebuild_wins(**kwargs):
+            s3.put_object = put_object
+            index.write_manifest("bucket", "blog/", listed_before_event, built=time.time())
+            return put_object(**kwargs)
+
+        s3.put_object = rebuild_wins
+
+        # when
+        index.apply_event("bucket", "blog/b.md", "ObjectCreated:Put")
+
+        # then
+        self.assertEqual(["a.md", "b.md"], json.loads(s3.objects[manifest_key("blog/")])["keys"])
+
+    def test_rebuild_that_listed_before_an_event_does_not_overwrite_it(self):
+        # given
+        s3 = FakeS3(["blog/a.md"])
+        index = PrefixIndex(s3_client=s3)
+        live_keys = index.live_keys
+
+        def event_wins(bucket, prefix):
+            keys = live_keys(bucket, prefix)
+            index.live_keys = live_keys
+            s3.objects["blog/b.md"] = b""
+            index.apply_event("bucket", "blog/b.md", "ObjectCreated:Put")
+            return keys
+
+        index.live_keys = event_wins
+
+        # when
+        index.list_keys("bucket", "blog")
+
+        # then
+        self.assertEqual(["a.md", "b.md"], json.loads(s3.objects[manifest_key("blog/")])["keys"])
+
+    def test_list_page(self):
+        # given
+        index = PrefixIndex(s3_client=FakeS3([f"photography/{i}.jpg" for i in range(5)]))
+
+        # when
+        first, after = index.list_page("bucket", "photography", limit=2)
+        second, _ = index.list_page("bucket", "photography", limit=2, start_after=decode_cursor(encode_cursor(after)))
+        last, end = index.list_page("bucket", "photography", limit=2, start_after="photography/3.jpg")
+
+        # then
+        self.assertEqual(["photography/0.jpg", "photography/1.jpg"], first)
+        self.assertEqual(["photography/2.jpg", "photography/3.jpg"], second)
+        self.assertEqual((["photography/4.jpg"], None), (last, end))
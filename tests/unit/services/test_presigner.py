@@ -0,0 +1,54 @@
+import unittest
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+import boto3
+from botocore.config import Config
+
+from chalicelib.services.presigner import BatchPresigner
+
+NOW = datetime(2023, 1, 23, 6, 52, 30, tzinfo=timezone.utc)
+KEYS = [
+    "photography/1.jpg",
+    "calendar/ana/2023/01/23/a b+c~ñ!*().jpg",
+    "colors/über/1k/square.png",
+    "blog/'quote&amp=?#.md",
+]
+
+
+def s3_client(region, token=None):
+    return boto3.client("s3", region_name=region, aws_access_key_id="AKIDEXAMPLE", aws_secret_access_key="secret",
+                        aws_session_token=token, config=Config(signature_version="s3v4"))
+
+
+class TestPresigner(unittest.TestCase):
+
+    def test_matches_botocore(self):
+        for region in ("us-east-1", "eu-west-1"):
+            for token in (None, "session/token+="):
+                for bucket in ("shenanigans", "dotted.bucket"):
+                    with self.subTest(region=region, token=token, bucket=bucket):
+                        # given
+                        client = s3_client(region, token)
+                        with patch("botocore.auth.get_current_datetime", return_value=NOW.replace(tzinfo=None)):
+                            expected = [client.generate_presigned_url(
+                                'get_object', Params={'Bucket': bucket, 'Key': key}, ExpiresIn=60) for key in KEYS]
+
+                        # when
+                        actual = BatchPresigner(s3_client=client).presign(bucket, KEYS, expires_in=60, now=NOW)
+
+                        # then
+                        self.assertEqual(expected, actual)
+
+    def test_endpoint_is_probed_once_per_bucket(self):
+        # given
+        client = s3_client("us-east-1")
+        presigner = BatchPresigner(s3_client=client)
+
+        # when
+        with patch.object(client, "generate_presigned_url", wraps=client.generate_presigned_url) as botocore:
+            presigner.presign("shenanigans", KEYS)
+            presigner.presign("shenanigans", KEYS)
+
+        # then
+        self.assertEqual(1, botocore.call_count)
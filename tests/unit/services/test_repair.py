@@ -0,0 +1,53 @@
+import unittest
+
+import numpy as np
+
+from chalicelib.services.repair import repair_tour, remove_cities, insert_cities, edit_cities
+from chalicelib.services.solver import NumpySolver, path_length
+
+
+class TestRepair(unittest.TestCase):
+
+    def setUp(self):
+        self.cities = np.random.default_rng(8).random((150, 2)) * 100
+        self.order = NumpySolver().solve(self.cities)
+
+    def test_remove_cities_splices_neighbours(self):
+        # given
+        cities = np.arange(12.0).reshape(6, 2)
+
+        # when
+        actual_cities, actual_order, spliced = remove_cities(cities, np.array([0, 1, 2, 3, 4, 5]), [2, 3])
+
+        # then
+        np.testing.assert_array_equal(cities[[0, 1, 4, 5]], actual_cities)
+        np.testing.assert_array_equal([0, 1, 2, 3], actual_order)
+        np.testing.assert_array_equal([1], spliced)
+
+    def test_insert_cities_uses_cheapest_edge(self):
+        # given
+        cities = np.array([[0.0, 0.0], [10.0, 0.0], [10.0, 10.0], [0.0, 10.0]])
+
+        # when
+        actual_cities, actual_order = insert_cities(cities, np.array([0, 1, 2, 3]), np.array([[5.0, -1.0]]))
+
+        # then
+        self.assertEqual(5, len(actual_cities))
+        np.testing.assert_array_equal([0, 4, 1, 2, 3], actual_order)
+
+    def test_repair_tour(self):
+        # given
+        inserted = np.array([[50.0, 50.0], [10.0, 90.0]])
+
+        # when
+        actual = repair_tour(self.cities, self.order, inserted, removed=[4, 99])
+
+        # then
+        np.testing.assert_array_equal(edit_cities(self.cities, inserted, [4, 99]), actual.cities)
+        self.assertEqual(list(range(150)), sorted(actual.result.order.tolist()))
+        self.assertAlmostEqual(path_length(actual.cities, actual.result.order), actual.result.length)
+
+    def test_repair_tour_falls_back_on_large_edits(self):
+        actual = repair_tour(self.cities, self.order, np.zeros((0, 2)), removed=range(50))
+        self.assertIsNone(actual.result)
+        self.assertEqual(100, len(actual.cities))
@@ -0,0 +1,68 @@
+import time
+import unittest
+from datetime import datetime, timezone
+
+from chalicelib.services.response_cache import ResponseCache, presign_expiry, AMZ_DATE_FORMAT
+
+
+def presigned_url(signed: float, expires_in: int) -> str:
+    amz_date = datetime.fromtimestamp(signed, tz=timezone.utc).strftime(AMZ_DATE_FORMAT)
+    return ("https://bucket.s3.amazonaws.com/photography/a.jpg?X-Amz-Algorithm=AWS4-HMAC-SHA256"
+            f"&X-Amz-Date={amz_date}&X-Amz-Expires={expires_in}&X-Amz-SignedHeaders=host&X-Amz-Signature=abc")
+
+
+class TestResponseCache(unittest.TestCase):
+
+    def test_presign_expiry(self):
+        self.assertEqual((1700000000, 1700000060), presign_expiry(presigned_url(1700000000, 60)))
+        self.assertEqual((None, 1700000060),
+                         presign_expiry("https://b.s3.amazonaws.com/k?AWSAccessKeyId=a&Signature=s&Expires=1700000060"))
+        self.assertIsNone(presign_expiry("https://example.com/post.md"))
+
+    def test_ttl_follows_shortest_presigned_url(self):
+        # given
+        cache = ResponseCache(ttl=3600, freshness=0.75)
+        now = int(time.time())
+        body = {"images": [{"url": presigned_url(now, 86400)}, {"url": presigned_url(now, 60)}]}
+
+        # when
+        cache.put("photography", body, route="photography")
+
+        # then
+        entry = cache._entries["photography"]
+        self.assertAlmostEqual(now + 45, entry.expires, delta=1)
+
+    def test_stale_entries_are_not_served(self):
+        # given
+        cache = ResponseCache()
+        cache.put("photography", {"url": presigned_url(time.time(), 60)}, route="photography")
+        cache._entries["photography"].expires = time.time() - 1
+
+        # when
+        actual = cache.get("photography")
+
+        # then
+        self.assertIsNone(actual)
+        self.assertEqual({"hits": 0, "misses": 0, "stale": 1, "evictions": 0, "size": 0}, cache.stats())
+
+    def test_expired_urls_are_not_cached(self):
+        cache = ResponseCache()
+        cache.put("photography", {"url": presigned_url(time.time() - 120, 60)}, route="photography")
+        self.assertIsNone(cache.get("photography"))
+
+    def test_lru_eviction_and_invalidation(self):
+        # given
+        cache = ResponseCache(maxsize=2)
+        cache.put(("posts",), {"posts": ["a.md"]}, route="posts")
+        cache.put(("codes",), {"codes": []}, route="codes")
+        cache.get(("posts",))
+
+        # when
+        cache.put(("post", "a.md"), {"markdown": "# a"}, route="post")
+        cache.invalidate("post")
+
+        # then
+        self.assertEqual({"posts": ["a.md"]}, cache.get(("posts",)))
+        self.assertIsNone(cache.get(("codes",)))
+        self.assertIsNone(cache.get(("post", "a.md")))
+        self.assertEqual({"hits": 2, "misses": 2, "stale": 0, "evictions": 1, "size": 1}, cache.stats())
@@ -0,0 +1,125 @@
+import math
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from chalicelib.services.single_flight import SingleFlight, SingleFlightTimeout
+
+
+def blocking(release: threading.Event, calls: list, result=None, error=None):
+    def function():
+        calls.append(threading.get_ident())
+        release.wait(5)
+        if error is not None:
+            raise error
+        return result
+    return function
+
+
+def wait_for_followers(single_flight: SingleFlight, key, followers: int):
+    for _ in range(500):
+        with single_flight._lock:
+            flight = single_flight._flights.get(key)
+            if flight is not None and flight.followers == followers:
+                return
+        threading.Event().wait(0.01)
+    raise AssertionError("Followers never joined.")
+
+
+class TestSingleFlight(unittest.TestCase):
+
+    def test_concurrent_callers_share_one_call(self):
+        # given
+        single_flight = SingleFlight()
+        release, calls = threading.Event(), []
+        function = blocking(release, calls, result=["a"])
+
+        # when
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            futures = [executor.submit(single_flight.do, "key", function) for _ in range(4)]
+            wait_for_followers(single_flight, "key", 3)
+            release.set()
+            results = [future.result() for future in futures]
+
+        # then
+        assert len(calls) == 1
+        assert results == [["a"]] * 4
+        assert single_flight.in_flight() == 0
+
+    def test_errors_reach_every_caller(self):
+        # given
+        single_flight = SingleFlight()
+        release, calls = threading.Event(), []
+        function = blocking(release, calls, error=ValueError("broken"))
+
+        # when
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            futures = [executor.submit(single_flight.do, "key", function) for _ in range(3)]
+            wait_for_followers(single_flight, "key", 2)
+            release.set()
+            errors = [future.exception() for future in futures]
+
+        # then
+        assert len(calls) == 1
+        assert all(isinstance(error, ValueError) for error in errors)
+
+    def test_followers_time_out(self):
+        # given
+        single_flight = SingleFlight(timeout=0.05)
+        release, calls = threading.Event(), []
+        function = blocking(release, calls, result=1)
+
+        # when
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            leader = executor.submit(single_flight.do, "key", function)
+            while not calls:
+                threading.Event().wait(0.01)
+            follower = executor.submit(single_flight.do, "key", function)
+            error = follower.exception()
+            release.set()
+
+        # then
+        assert isinstance(error, SingleFlightTimeout)
+        assert leader.result() == 1
+
+    def test_followers_wait_forever_with_an_infinite_timeout(self):
+        # given
+        single_flight = SingleFlight(timeout=0.01)
+        release, calls = threading.Event(), []
+        function = blocking(release, calls, result=1)
+
+        # when
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            leader = executor.submit(single_flight.do, "key", function)
+            while not calls:
+                threading.Event().wait(0.01)
+            follower = executor.submit(single_flight.do, "key", function, timeout=math.inf)
+            wait_for_followers(single_flight, "key", 1)
+            threading.Event().wait(0.05)
+            release.set()
+
+        # then
+        assert (leader.result(), follower.result()) == (1, 1)
+        assert len(calls) == 1
+
+    def test_calls_are_not_cached(self):
+        # given
+        single_flight = SingleFlight()
+        calls = []
+
+        # when
+        results = [single_flight.do(("key", 1), lambda value: calls.append(value) or len(calls), 7) for _ in range(2)]
+
+        # then
+        assert results == [1, 2]
+        assert calls == [7, 7]
+
+    def test_keys_run_independently(self):
+        # given
+        single_flight = SingleFlight()
+
+        # when
+        results = [single_flight.do(key, lambda key=key: key * 2) for key in (1, 2)]
+
+        # then
+        assert results == [2, 4]
@@ -0,0 +1,127 @@
+import io
+import math
+import os
+import subprocess
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+from chalicelib.services.solver import NumpySolver, LinkernSolver, MultiStartLinkernSolver, path_length, select_backend, read_tour, write_instance, \
+    distance_matrix, tour_length, NUMPY_BACKEND, LINKERN_BACKEND, LARGE_BACKEND, \
+    NUMPY_SOLVER_MAX_CITIES, LINKERN_MAX_CITIES
+
+
+def circle(n_cities, seed=0):
+    angles = np.random.default_rng(seed).permutation(n_cities) * 2 * math.pi / n_cities
+    return np.stack([np.cos(angles), np.sin(angles)], axis=-1) * 100
+
+
+class TestNumpySolver(unittest.TestCase):
+
+    def test_solve_returns_permutation_starting_at_zero(self):
+        # given
+        cities = np.random.default_rng(1).random((60, 3))
+
+        # when
+        actual = NumpySolver().solve(cities)
+
+        # then
+        self.assertEqual(0, actual[0])
+        self.assertEqual(list(range(60)), sorted(actual.tolist()))
+
+    def test_solve_finds_optimal_tour_on_circle(self):
+        # given
+        cities = circle(40)
+        dist = distance_matrix(cities)
+        expected = 40 * 2 * 100 * math.sin(math.pi / 40)
+
+        # when
+        actual = NumpySolver().solve(cities)
+
+        # then
+        self.assertAlmostEqual(expected, tour_length(dist, actual), places=6)
+
+    def test_solve_tiny_instance(self):
+        np.testing.assert_array_equal([0, 1], NumpySolver().solve(np.zeros((2, 2))))
+
+
+class TestLinkernSolver(unittest.TestCase):
+
+    def test_solve(self):
+        # given
+        cities = circle(30)
+
+        # when
+        actual = LinkernSolver().solve(cities)
+
+        # then
+        self.assertEqual(list(range(30)), sorted(actual.tolist()))
+
+    def test_write_and_read(self):
+        # given
+        buffer = io.StringIO()
+
+        # when
+        write_instance(buffer, np.array([[0.5, 1.0], [2.0, 3.25]]))
+
+        # then
+        self.assertEqual("2\n0.5 1\n2 3.25\nEOF\n", buffer.getvalue())
+        np.testing.assert_array_equal([0, 2, 1], read_tour(io.StringIO("3 3\n0 2 1\n2 1 1\n1 0 1\n")))
+
+
+class TestMultiStartLinkernSolver(unittest.TestCase):
+
+    def test_solve_result_picks_shortest_run(self):
+        # given
+        cities = np.random.default_rng(5).random((80, 2)) * 1000
+
+        # when
+        actual = MultiStartLinkernSolver(runs=2, time_budget=5, seed=1).solve_result(cities)
+
+        # then
+        self.assertEqual(list(range(80)), sorted(actual.order.tolist()))
+        self.assertEqual(min(2, os.cpu_count()), actual.runs)
+        self.assertEqual(actual.runs, actual.completed)
+        self.assertAlmostEqual(path_length(cities, actual.order), actual.length)
+
+    def test_runs_are_stopped_when_reading_a_tour_fails(self):
+        # given
+        cities = np.random.default_rng(5).random((200, 2)) * 1000
+        processes = []
+        popen = subprocess.Popen
+
+        def tracked_popen(command, **kwargs):
+            # the second run never finishes by itself
+            processes.append(popen(command if not processes else ["sleep", "30"], **kwargs))
+            return processes[-1]
+
+        def failing_progress(order):
+            raise RuntimeError("progress")
+
+        # when
+        with patch("chalicelib.services.solver.subprocess.Popen", side_effect=tracked_popen), \
+                patch("chalicelib.services.solver.os.cpu_count", return_value=2), self.assertRaises(RuntimeError):
+            MultiStartLinkernSolver(runs=2, time_budget=2, seed=1).solve_result(cities, progress=failing_progress)
+
+        # then
+        self.assertEqual(2, len(processes))
+        self.assertTrue(all(process.poll() is not None for process in processes))
+
+    def test_solve_result_without_finished_runs(self):
+        with self.assertRaises(subprocess.TimeoutExpired):
+            MultiStartLinkernSolver(runs=1, time_budget=0).solve_result(np.random.default_rng(5).random((500, 2)))
+
+
+class TestSelectBackend(unittest.TestCase):
+
+    def test_select_backend(self):
+        self.assertEqual(NUMPY_BACKEND, select_backend(NUMPY_SOLVER_MAX_CITIES))
+        self.assertEqual(LINKERN_BACKEND, select_backend(NUMPY_SOLVER_MAX_CITIES + 1))
+        self.assertEqual(LARGE_BACKEND, select_backend(LINKERN_MAX_CITIES + 1))
+        self.assertEqual(LINKERN_BACKEND, select_backend(10, LINKERN_BACKEND))
+        self.assertEqual(NUMPY_BACKEND, select_backend(NUMPY_SOLVER_MAX_CITIES, NUMPY_BACKEND))
+        with self.assertRaises(ValueError):
+            select_backend(NUMPY_SOLVER_MAX_CITIES + 1, NUMPY_BACKEND)
+        with self.assertRaises(ValueError):
+            select_backend(10, "concorde")
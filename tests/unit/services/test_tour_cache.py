@@ -0,0 +1,44 @@
+import tempfile
+import unittest
+
+import numpy as np
+
+from chalicelib.services.tour_cache import TourCache, DirectoryStore, tour_key
+
+
+class TestTourCache(unittest.TestCase):
+
+    def test_tour_key(self):
+        cities = np.array([[0.0, 1.0], [2.0, 3.0]])
+        self.assertEqual(tour_key(cities), tour_key(np.array([[-0.0, 1], [2, 3]])))
+        self.assertNotEqual(tour_key(cities), tour_key(cities.reshape(1, 4)))
+        self.assertNotEqual(tour_key(cities), tour_key(cities[::-1]))
+
+    def test_lru_eviction(self):
+        # given
+        cache = TourCache(maxsize=2)
+        cache.put("a", np.array([0, 1, 2]))
+        cache.put("b", np.array([0, 2, 1]))
+        cache.get("a")
+
+        # when
+        cache.put("c", np.array([1, 0, 2]))
+
+        # then
+        self.assertIsNone(cache.get("b"))
+        np.testing.assert_array_equal([0, 1, 2], cache.get("a"))
+        self.assertEqual({"hits": 2, "store_hits": 0, "misses": 1, "size": 2}, cache.stats())
+
+    def test_directory_store_survives_new_cache(self):
+        with tempfile.TemporaryDirectory() as path:
+            # given
+            TourCache(store=DirectoryStore(path=path)).put("tour", np.array([0, 3, 1, 2]))
+            cache = TourCache(store=DirectoryStore(path=path))
+
+            # when
+            actual = cache.get("tour")
+
+            # then
+            np.testing.assert_array_equal([0, 3, 1, 2], actual)
+            self.assertEqual(1, cache.stats()["store_hits"])
+            self.assertIsNone(cache.get("missing"))
@@ -1,11 +1,33 @@
+import base64
+import gzip
 import json
 import logging
+import os
+import threading
+import time
 import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch, MagicMock
 
+import boto3
+import botocore.config
+import numpy as np
 from chalice.config import Config
 from chalice.local import LocalGateway
 
+import app as app_module
 from app import app
+from dependency_injector import providers
+
+from chalicelib.modules.container import container
+from chalicelib.services.clients import ClientPool
+from chalicelib.services.documents import DocumentCache
+from chalicelib.services.metrics import RewardMetrics
+from chalicelib.services.prefix_index import PrefixIndex
+from chalicelib.services.presigner import BatchPresigner
+from chalicelib.services.single_flight import SingleFlight
+from chalicelib.services.solver import LinkernSolver, MultiStartLinkernSolver, NumpySolver, NUMPY_SOLVER_MAX_CITIES
+from tests.unit.services.test_prefix_index import FakeS3
 
 class TestApp(unittest.TestCase):
     def setUp(self):
@@ -14,6 +36,435 @@ class TestApp(unittest.TestCase):
     def test_dummy(self):
         assert True
 
+    def test_index(self):
+        # given
+        body = {"point_set": "sphere", "n_cities": 25, "seed": 7, "solver": "numpy"}
+
+        # when
+        response = self.gateway.handle_request(method='POST',
+                                               path='/',
+                                               headers={'Content-Type': 'application/json'},
+                                               body=json.dumps(body))
+
+        # then
+        tour = json.loads(response['body'])
+        assert response['statusCode'] == 200
+        assert len(tour) == (25 + 1) * 3
+        assert tour[:3] == tour[-3:]
+
+    def test_index_unknown_point_set(self):
+        body = {"point_set": "klein_bottle", "n_cities": 25}
+        response = self.gateway.handle_request(method='POST',
+                                               path='/',
+                                               headers={'Content-Type': 'application/json'},
+                                               body=json.dumps(body))
+        assert response['statusCode'] == 400
+
+    def test_solve(self):
+        # given
+        cities = [0, 0, 0, 10, 10, 10, 10, 0, 5, 5]
+
+        # when
+        response = self.gateway.handle_request(method='GET',
+                                               path=f'/solve?dimension=2&solver=numpy&cities={json.dumps(cities)}',
+                                               headers={},
+                                               body='')
+
+        # then
+        tour = json.loads(response['body'])
+        assert response['statusCode'] == 200
+        assert len(tour) == (5 + 1) * 2
+        assert sorted(zip(tour[:-2:2], tour[1:-2:2])) == sorted(zip(cities[::2], cities[1::2]))
+
+    def test_identical_solve_waits_past_the_single_flight_timeout(self):
+        # given
+        cities = np.random.default_rng().random((12, 2))
+        single_flight = SingleFlight(timeout=0.01)
+        started, release = threading.Event(), threading.Event()
+
+        def slow_solve(cities, progress=None):
+            started.set()
+            release.wait(5)
+            return app_module.SolveResult(order=np.arange(12), length=1.0)
+
+        # when
+        with container.single_flight.override(providers.Object(single_flight)), \
+                patch.object(NumpySolver, "solve_result", side_effect=slow_solve) as solve, \
+                ThreadPoolExecutor(max_workers=2) as executor:
+            leader = executor.submit(app_module.solve_cities, cities, backend="numpy")
+            started.wait(5)
+            follower = executor.submit(app_module.solve_cities, cities, backend="numpy")
+            while sum(flight.followers for flight in list(single_flight._flights.values())) < 1:
+                time.sleep(0.01)
+            time.sleep(0.05)
+            release.set()
+            results = [leader.result(), follower.result()]
+
+        # then
+        assert solve.call_count == 1
+        assert [list(result.order) for result in results] == [list(range(12))] * 2
+
+    def test_multistart_solve_bypasses_tour_cache(self):
+        # given
+        cities = np.random.default_rng().random((12, 2))
+        app_module.solve_cities(cities, backend="numpy")
+        multistart = app_module.SolveResult(order=np.arange(12), length=0.0, runs=4, completed=4)
+
+        # when
+        with patch.object(MultiStartLinkernSolver, "solve_result", return_value=multistart):
+            result = app_module.solve_cities(cities, backend="multistart", runs=4)
+            cached = app_module.solve_cities(cities, backend="numpy")
+            with_options = app_module.solve_cities(cities, backend="numpy", runs=4)
+
+        # then
+        assert not result.cached
+        assert result.runs == 4
+        assert cached.cached
+        assert with_options.cached
+        assert list(cached.order) == list(range(12))
+
+    def test_linkern_failure_falls_back_to_numpy_partitions(self):
+        # given
+        cities = np.random.default_rng().random((500, 2))
+
+        # when
+        with patch.object(LinkernSolver, "solve_result", side_effect=OSError("linkern")), \
+                patch.object(NumpySolver, "solve_result", side_effect=AssertionError("unpartitioned")):
+            result = app_module.solve_cities(cities, backend="linkern")
+
+        # then
+        assert sorted(result.order) == list(range(500))
+        assert result.runs == 3
+
+    def test_oversized_numpy_solve(self):
+        # given
+        cities = np.random.default_rng().random((NUMPY_SOLVER_MAX_CITIES + 1, 2))
+
+        # when
+        with patch.object(NumpySolver, "solve_result") as solve_result:
+            response = self.gateway.handle_request(method='POST', path='/solve?solver=numpy',
+                                                   headers={'Content-Type': 'application/octet-stream',
+                                                            'X-Dimension': '2'},
+                                                   body=cities.astype("<f8").tobytes())
+
+        # then
+        assert response['statusCode'] == 400
+        solve_result.assert_not_called()
+
+    def test_solve_binary_body(self):
+        # given
+        cities = np.array([[0, 0], [0, 10], [10, 10], [10, 0], [5, 5]], dtype="<f4")
+
+        # when
+        response = self.gateway.handle_request(method='POST',
+                                               path='/solve?solver=numpy',
+                                               headers={'Content-Type': 'application/octet-stream',
+                                                        'X-Dimension': '2',
+                                                        'X-Dtype': 'float32'},
+                                               body=cities.tobytes())
+
+        # then
+        tour = json.loads(response['body'])
+        assert response['statusCode'] == 200
+        assert len(tour) == (5 + 1) * 2
+
+    def test_solve_json_envelope(self):
+        # given
+        cities = np.array([[0, 0, 0], [0, 10, 1], [10, 10, 2], [10, 0, 3]], dtype="<f8")
+        body = {"dimension": 3, "count": 4, "data": base64.b64encode(cities.tobytes()).decode()}
+
+        # when
+        response = self.gateway.handle_request(method='POST',
+                                               path='/solve',
+                                               headers={'Content-Type': 'application/json'},
+                                               body=json.dumps(body))
+
+        # then
+        tour = json.loads(response['body'])
+        assert response['statusCode'] == 200
+        assert len(tour) == (4 + 1) * 3
+
+    def test_solve_binary_body_bad_length(self):
+        response = self.gateway.handle_request(method='POST',
+                                               path='/solve',
+                                               headers={'Content-Type': 'application/octet-stream',
+                                                        'X-Dimension': '3'},
+                                               body=b'\x00' * 20)
+        assert response['statusCode'] == 400
+
+    def test_solve_packed_response(self):
+        # given
+        cities = [0, 0, 0, 10, 10, 10, 10, 0]
+
+        # when
+        response = self.gateway.handle_request(method='GET',
+                                               path=f'/solve?solver=numpy&format=indices&cities={json.dumps(cities)}',
+                                               headers={'Accept': 'application/octet-stream',
+                                                        'Accept-Encoding': 'gzip'},
+                                               body='')
+
+        # then
+        assert response['statusCode'] == 200
+        assert response['headers']['Content-Encoding'] == 'gzip'
+        order = np.frombuffer(gzip.decompress(base64.b64decode(response['body'])), dtype='<i4')
+        assert sorted(order.tolist()) == [0, 1, 2, 3]
+
+    def test_solve_job(self):
+        # given
+        cities = np.random.default_rng(4).random((30, 2)).ravel().tolist()
+        body = {"dimension": 2, "cities": cities}
+
+        # when
+        response = self.gateway.handle_request(method='POST',
+                                               path='/solve/jobs?solver=numpy',
+                                               headers={'Content-Type': 'application/json'},
+                                               body=json.dumps(body))
+        job_id = json.loads(response['body'])['id']
+        for _ in range(500):
+            job = json.loads(self.gateway.handle_request(method='GET', path=f'/solve/jobs/{job_id}',
+                                                         headers={}, body='')['body'])
+            if job['status'] == 'done':
+                break
+            time.sleep(0.01)
+
+        # then
+        assert response['statusCode'] == 202
+        assert job['status'] == 'done'
+        assert len(job['tour']) == (30 + 1) * 2
+
+    def test_solve_job_unknown(self):
+        response = self.gateway.handle_request(method='GET', path='/solve/jobs/nope', headers={}, body='')
+        assert response['statusCode'] == 404
+
+    def test_solve_job_not_run_in_lambda(self):
+        # when
+        with patch.dict(os.environ, {"AWS_LAMBDA_FUNCTION_NAME": "tsp-solver"}):
+            response = self.gateway.handle_request(method='POST', path='/solve/jobs',
+                                                   headers={'Content-Type': 'application/json'},
+                                                   body=json.dumps({"dimension": 2, "cities": [0, 0, 1, 1, 2, 0]}))
+
+        # then
+        assert response['statusCode'] == 501
+
+    def test_solve_repair(self):
+        # given
+        cities = np.random.default_rng(6).random((40, 2))
+        solved = self.gateway.handle_request(method='POST',
+                                             path='/solve?solver=numpy',
+                                             headers={'Content-Type': 'application/octet-stream'},
+                                             body=cities.astype('<f8').tobytes())
+        body = {"cities": cities.ravel().tolist(), "dimension": 2, "key": solved['headers']['X-Tour-Key'],
+                "insert": [0.5, 0.5], "remove": [0, 1]}
+
+        # when
+        response = self.gateway.handle_request(method='POST',
+                                               path='/solve/repair',
+                                               headers={'Content-Type': 'application/json'},
+                                               body=json.dumps(body))
+
+        # then
+        tour = json.loads(response['body'])
+        assert response['statusCode'] == 200
+        assert response['headers']['X-Tour-Repaired'] == 'true'
+        assert len(tour) == (39 + 1) * 2
+
+    def test_solve_repair_refuses_the_key_of_other_cities(self):
+        # given
+        cities = np.random.default_rng(6).random((40, 2))
+        solved = self.gateway.handle_request(method='POST',
+                                             path='/solve?solver=numpy',
+                                             headers={'Content-Type': 'application/octet-stream'},
+                                             body=cities.astype('<f8').tobytes())
+        body = {"cities": (cities[::-1]).ravel().tolist(), "dimension": 2, "key": solved['headers']['X-Tour-Key'],
+                "remove": [0]}
+
+        # when
+        response = self.gateway.handle_request(method='POST',
+                                               path='/solve/repair',
+                                               headers={'Content-Type': 'application/json'},
+                                               body=json.dumps(body))
+
+        # then
+        assert response['statusCode'] == 400
+
+    def test_boleros_count(self):
+        response = self.gateway.handle_request(method='GET', path='/boleros/es?count=3', headers={}, body='')
+        assert response['statusCode'] == 200
+        assert len(json.loads(response['body'])['sentences']) == 3
+
+    def test_boleros_count_out_of_range(self):
+        response = self.gateway.handle_request(method='GET', path='/boleros/en?count=0', headers={}, body='')
+        assert response['statusCode'] == 400
+
+    def test_codes_served_from_response_cache(self):
+        # given
+        container.response_cache().invalidate("codes")
+        s3_client = MagicMock()
+        s3_client.get_object.return_value = {"Body": MagicMock(read=lambda: b'{"menu": "https://example.com/menu"}'),
+                                             "ETag": '"1"'}
+
+        # when
+        with container.documents.override(providers.Object(DocumentCache(s3_client=s3_client))):
+            responses = [self.gateway.handle_request(method='GET', path='/codes', headers={}, body='')
+                         for _ in range(2)]
+
+        # then
+        assert [response['statusCode'] for response in responses] == [200, 200]
+        assert responses[0]['body'] == responses[1]['body']
+        assert s3_client.get_object.call_count == 1
+
+    def test_put_names_clears_cached_responses(self):
+        # given
+        container.response_cache().invalidate()
+        s3_client = MagicMock()
+        s3_client.get_object.return_value = {"Body": MagicMock(read=lambda: b'{"menu": "https://example.com/menu"}'),
+                                             "ETag": '"1"'}
+        s3_client.put_object.return_value = {"ETag": '"2"'}
+        documents = DocumentCache(s3_client=s3_client, response_cache=container.response_cache())
+
+        # when
+        with container.documents.override(providers.Object(documents)):
+            self.gateway.handle_request(method='GET', path='/codes', headers={}, body='')
+            self.gateway.handle_request(method='PUT', path='/names?names=%7B%7D', headers={}, body='')
+            # so a response rendered again shows up as a second fetch
+            documents.invalidate(os.getenv("S3_BUCKET_NAME"), 'qr/mappings.json')
+            response = self.gateway.handle_request(method='GET', path='/codes', headers={}, body='')
+
+        # then
+        assert response['statusCode'] == 200
+        assert s3_client.get_object.call_count == 2
+
+    def test_flyer_per_country(self):
+        # given
+        s3_client = MagicMock()
+        s3_client.get_object.return_value = {
+            "Body": MagicMock(read=lambda: b'{"US": {"title": "flyer"}, "MX": {"title": "volante"}}'), "ETag": '"1"'}
+
+        # when
+        with container.documents.override(providers.Object(DocumentCache(s3_client=s3_client))):
+            responses = [self.gateway.handle_request(method='GET', path='/flyer', headers=headers, body='')
+                         for headers in ({}, {'cloudfront-viewer-country': 'MX'}, {'cloudfront-viewer-country': 'FR'})]
+
+        # then
+        assert [json.loads(response['body'])['title'] for response in responses] == ['flyer', 'volante', 'flyer']
+        assert s3_client.get_object.call_count == 1
+
+    def test_clients_constructed_once_per_container(self):
+        # given
+        session = MagicMock()
+        session.client.return_value.get_object.side_effect = \
+            lambda **_: {"Body": MagicMock(read=lambda: b'{"US": {"title": "flyer"}, "MX": {"title": "volante"}}'),
+                         "ETag": '"1"'}
+        container.reset_singletons()
+        responses = []
+
+        # when
+        try:
+            with container.client_pool.override(providers.Object(ClientPool(session=session))):
+                for _ in range(3):
+                    for path in ('/flyer', '/names', '/codes'):
+                        responses.append(self.gateway.handle_request(method='GET', path=path, headers={}, body=''))
+                    responses.append(self.gateway.handle_request(method='PUT', path='/names?names=%7B%7D',
+                                                                 headers={}, body=''))
+                    container.cloudwatch_client()
+                    container.secretsmanager_client()
+        finally:
+            container.reset_singletons()
+
+        # then
+        assert {response['statusCode'] for response in responses} == {200}
+        services = [call.args[0] for call in session.client.call_args_list]
+        assert sorted(services) == ["cloudwatch", "s3", "secretsmanager"]
+
+    def test_photography_pages(self):
+        # given
+        container.response_cache().invalidate("photography")
+        index = PrefixIndex(s3_client=FakeS3([f"photography/{i}.jpg" for i in range(5)]))
+        s3_client = boto3.client("s3", region_name="us-east-1", aws_access_key_id="AKIDEXAMPLE",
+                                 aws_secret_access_key="secret", config=botocore.config.Config(signature_version="s3v4"))
+        pages = []
+
+        # when
+        with container.prefix_index.override(providers.Object(index)), \
+                container.presigner.override(providers.Object(BatchPresigner(s3_client=s3_client))), \
+                patch.dict(os.environ, {"S3_BUCKET_NAME": "shenanigans"}):
+            path = '/photography?limit=2'
+            while path:
+                response = self.gateway.handle_request(method='GET', path=path, headers={}, body='')
+                pages.append(json.loads(response['body']))
+                path = pages[-1]['next'] and f"/photography?limit=2&token={pages[-1]['next']}"
+
+        # then
+        assert [len(page['images']) for page in pages] == [2, 2, 1]
+        assert [image['url'].split('?')[0] for page in pages for image in page['images']] == \
+            [f"https://shenanigans.s3.amazonaws.com/photography/{i}.jpg" for i in range(5)]
+
+    def test_photography_bad_limit(self):
+        response = self.gateway.handle_request(method='GET', path='/photography?limit=0', headers={}, body='')
+        assert response['statusCode'] == 400
+
+    def test_metric_rewards_are_batched(self):
+        # given
+        cloudwatch = MagicMock()
+        metrics = RewardMetrics(client_factory=lambda: cloudwatch, max_pending=3)
+
+        # when
+        with container.reward_metrics.override(providers.Object(metrics)):
+            for state in ("ca", "ca", "ny"):
+                response = self.gateway.handle_request(method='POST', path='/metric',
+                                                       headers={'Content-Type': 'application/json'},
+                                                       body=json.dumps({"state": state, "reward": 10}))
+                assert response['statusCode'] == 200
+
+        # then
+        cloudwatch.put_metric_data.assert_called_once()
+        assert len(cloudwatch.put_metric_data.call_args.kwargs["MetricData"]) == 2
+
+    def test_metric_rejects_bad_rewards(self):
+        # given
+        metrics = MagicMock()
+        bodies = [{"reward": 10}, {"state": "", "reward": 10}, {"state": "ca"}, {"state": "ca", "reward": "soon"},
+                  {"state": "ca", "reward": True}]
+
+        # when
+        with container.reward_metrics.override(providers.Object(RewardMetrics(client_factory=metrics))):
+            responses = [self.gateway.handle_request(method='POST', path='/metric',
+                                                     headers={'Content-Type': 'application/json'},
+                                                     body=json.dumps(body)) for body in bodies]
+
+        # then
+        assert [response['statusCode'] for response in responses] == [400] * len(bodies)
+        metrics.assert_not_called()
+
+    def test_other_routes_never_flush_rewards(self):
+        # given
+        metrics = MagicMock()
+
+        # when
+        with container.reward_metrics.override(providers.Object(metrics)):
+            response = self.gateway.handle_request(method='GET', path='/boleros/en', headers={}, body='')
+
+        # then
+        assert response['statusCode'] == 200
+        metrics.flush_if_due.assert_not_called()
+
+    @patch("app.RankStatistics._load", return_value={"PAGE_1": 5, "PAGE_2": 9})
+    def test_order_policies(self, _):
+        app_module.RankStatistics._instance = None
+        states = [["PAGE_1"], ["PAGE_2"], ["PAGE_3"]]
+        for policy in ("epsilon_greedy", "ucb1", "thompson"):
+            response = self.gateway.handle_request(method='POST', path='/order',
+                                                   headers={'Content-Type': 'application/json'},
+                                                   body=json.dumps({"states": states, "policy": policy}))
+            assert response['statusCode'] == 200
+            assert sorted(json.loads(response['body'])['order']) == states
+
+        response = self.gateway.handle_request(method='POST', path='/order',
+                                               headers={'Content-Type': 'application/json'},
+                                               body=json.dumps({"states": states, "policy": "softmax"}))
+        assert response['statusCode'] == 400
+        app_module.RankStatistics._instance = None
+
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file